@@ -103,6 +103,8 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "AISummarizer.wsgi.application"
 
+ASGI_APPLICATION = "AISummarizer.asgi.application"
+
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
@@ -154,3 +156,253 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# Website fetching
+# Timeouts are in seconds, POOL_PER_HOST caps concurrent connections to one host
+# and requests wait at most POOL_TIMEOUT for a free connection
+# and downloads larger than MAX_BYTES (MAX_PDF_BYTES for PDFs) are aborted
+
+SUMMARY_FETCHER = {
+    "CONNECT_TIMEOUT": float(os.getenv("SUMMARY_FETCHER_CONNECT_TIMEOUT", 5)),
+    "READ_TIMEOUT": float(os.getenv("SUMMARY_FETCHER_READ_TIMEOUT", 10)),
+    "TOTAL_TIMEOUT": float(os.getenv("SUMMARY_FETCHER_TOTAL_TIMEOUT", 30)),
+    "MAX_BYTES": int(os.getenv("SUMMARY_FETCHER_MAX_BYTES", 5 * 1024 * 1024)),
+    "MAX_PDF_BYTES": int(os.getenv("SUMMARY_FETCHER_MAX_PDF_BYTES", 25 * 1024 * 1024)),
+    "CHUNK_SIZE": int(os.getenv("SUMMARY_FETCHER_CHUNK_SIZE", 64 * 1024)),
+    "POOL_HOSTS": int(os.getenv("SUMMARY_FETCHER_POOL_HOSTS", 32)),
+    "POOL_PER_HOST": int(os.getenv("SUMMARY_FETCHER_POOL_PER_HOST", 4)),
+    "POOL_TIMEOUT": float(os.getenv("SUMMARY_FETCHER_POOL_TIMEOUT", 10)),
+    "DNS_CACHE": os.getenv("SUMMARY_FETCHER_DNS_CACHE", "false").lower() == "true",
+    "DNS_CACHE_TTL": float(os.getenv("SUMMARY_FETCHER_DNS_CACHE_TTL", 300)),
+    "MAX_TRACKED_HOSTS": int(os.getenv("SUMMARY_FETCHER_MAX_TRACKED_HOSTS", 200)),
+    "USER_AGENT": os.getenv(
+        "SUMMARY_FETCHER_USER_AGENT",
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    ),
+}
+
+
+# HTTP disk cache for fetched pages
+# Honors Cache-Control, ETag and Last-Modified, pages are stored gzip compressed
+# and the least recently used ones are evicted above MAX_BYTES
+
+SUMMARY_HTTP_CACHE = {
+    "ENABLED": os.getenv("SUMMARY_HTTP_CACHE_ENABLED", "true").lower() == "true",
+    "DIR": os.getenv("SUMMARY_HTTP_CACHE_DIR", ""),
+    "MAX_BYTES": int(os.getenv("SUMMARY_HTTP_CACHE_MAX_BYTES", 512 * 1024 * 1024)),
+    "EVICT_EVERY": int(os.getenv("SUMMARY_HTTP_CACHE_EVICT_EVERY", 50)),
+}
+
+
+# Website text extraction
+# "full" keeps all body text, "main" keeps only the main article content
+
+SUMMARY_EXTRACTION = {
+    "MODE": os.getenv("SUMMARY_EXTRACTION_MODE", "full"),
+}
+
+
+# Site crawl summaries
+# DEPTH and PAGES are the defaults, requests can ask for up to MAX_DEPTH and
+# MAX_PAGES. Each host gets at most PER_HOST_CONCURRENCY requests at a time and
+# DELAY seconds between request starts
+
+SUMMARY_CRAWL = {
+    "DEPTH": int(os.getenv("SUMMARY_CRAWL_DEPTH", 1)),
+    "MAX_DEPTH": int(os.getenv("SUMMARY_CRAWL_MAX_DEPTH", 3)),
+    "PAGES": int(os.getenv("SUMMARY_CRAWL_PAGES", 10)),
+    "MAX_PAGES": int(os.getenv("SUMMARY_CRAWL_MAX_PAGES", 50)),
+    "MAX_WORKERS": int(os.getenv("SUMMARY_CRAWL_MAX_WORKERS", 8)),
+    "PER_HOST_CONCURRENCY": int(os.getenv("SUMMARY_CRAWL_PER_HOST_CONCURRENCY", 2)),
+    "DELAY": float(os.getenv("SUMMARY_CRAWL_DELAY", 0.25)),
+    "RESPECT_ROBOTS": os.getenv("SUMMARY_CRAWL_RESPECT_ROBOTS", "true").lower()
+    == "true",
+    "TOKEN_BUDGET": int(os.getenv("SUMMARY_CRAWL_TOKEN_BUDGET", 120_000)),
+    "MIN_PAGE_TOKENS": int(os.getenv("SUMMARY_CRAWL_MIN_PAGE_TOKENS", 1000)),
+}
+
+
+# PDF text extraction
+# Documents with at least PARALLEL_MIN_PAGES pages are split into page ranges and
+# extracted in a pool of WORKERS processes, capped at the CPUs the process may use
+# Fewer than 2 workers extracts in the request
+# Objects the reader resolved are dropped every CACHE_CLEAR_EVERY pages, 0 keeps them
+
+SUMMARY_PDF = {
+    "WORKERS": int(os.getenv("SUMMARY_PDF_WORKERS", 4)),
+    "PARALLEL_MIN_PAGES": int(os.getenv("SUMMARY_PDF_PARALLEL_MIN_PAGES", 50)),
+    "MIN_PAGES_PER_TASK": int(os.getenv("SUMMARY_PDF_MIN_PAGES_PER_TASK", 10)),
+    "START_METHOD": os.getenv("SUMMARY_PDF_START_METHOD", "spawn"),
+    "CACHE_CLEAR_EVERY": int(os.getenv("SUMMARY_PDF_CACHE_CLEAR_EVERY", 50)),
+}
+
+
+# Uploaded document text store
+# Extracted PDF pages are stored by the SHA-256 of the upload so repeated uploads
+# skip parsing, the least recently used documents above MAX_DOCUMENTS are evicted
+
+SUMMARY_DOCUMENTS = {
+    "ENABLED": os.getenv("SUMMARY_DOCUMENTS_ENABLED", "true").lower() == "true",
+    "MAX_DOCUMENTS": int(os.getenv("SUMMARY_DOCUMENTS_MAX_DOCUMENTS", 10_000)),
+    "EVICT_EVERY": int(os.getenv("SUMMARY_DOCUMENTS_EVICT_EVERY", 50)),
+}
+
+
+# PDF uploads
+# Files are validated and hashed chunk by chunk as they arrive, uploads up to
+# MEMORY_BYTES are staged in memory and larger ones in a temporary file
+# Uploads for async jobs are kept in JOBS_DIR until the job finishes, it must be
+# on the same host as the workers, and on the upload temp dir's filesystem to
+# link instead of copy
+
+SUMMARY_UPLOADS = {
+    "MAX_BYTES": int(os.getenv("SUMMARY_UPLOADS_MAX_BYTES", 50 * 1024 * 1024)),
+    "MEMORY_BYTES": int(os.getenv("SUMMARY_UPLOADS_MEMORY_BYTES", 2_621_440)),
+    "JOBS_DIR": os.getenv("SUMMARY_UPLOADS_JOBS_DIR", ""),
+}
+
+
+# Summary cache
+# Responses are keyed by a hash of the normalized content, prompt and model
+
+SUMMARY_CACHE = {
+    "ENABLED": os.getenv("SUMMARY_CACHE_ENABLED", "true").lower() == "true",
+    "MEMORY_ENTRIES": int(os.getenv("SUMMARY_CACHE_MEMORY_ENTRIES", 512)),
+    "TTL": int(os.getenv("SUMMARY_CACHE_TTL", 60 * 60 * 24 * 7)),
+    "DB_MAX_ENTRIES": int(os.getenv("SUMMARY_CACHE_DB_MAX_ENTRIES", 50_000)),
+    "DB_MAX_BYTES": int(os.getenv("SUMMARY_CACHE_DB_MAX_BYTES", 256 * 1024 * 1024)),
+    "EVICT_EVERY": int(os.getenv("SUMMARY_CACHE_EVICT_EVERY", 100)),
+}
+
+
+# Near-duplicate detection, MinHash signatures split into LSH bands
+# NUM_HASHES must be a multiple of BANDS, signatures older than TTL or above
+# MAX_ENTRIES are evicted every EVICT_EVERY writes
+
+SUMMARY_DEDUP = {
+    "ENABLED": os.getenv("SUMMARY_DEDUP_ENABLED", "true").lower() == "true",
+    "THRESHOLD": float(os.getenv("SUMMARY_DEDUP_THRESHOLD", 0.9)),
+    "NUM_HASHES": int(os.getenv("SUMMARY_DEDUP_NUM_HASHES", 64)),
+    "BANDS": int(os.getenv("SUMMARY_DEDUP_BANDS", 16)),
+    "SHINGLE_SIZE": int(os.getenv("SUMMARY_DEDUP_SHINGLE_SIZE", 5)),
+    "MIN_SHINGLES": int(os.getenv("SUMMARY_DEDUP_MIN_SHINGLES", 50)),
+    "MAX_CANDIDATES": int(os.getenv("SUMMARY_DEDUP_MAX_CANDIDATES", 5)),
+    "TTL": int(os.getenv("SUMMARY_DEDUP_TTL", 60 * 60 * 24 * 7)),
+    "MAX_ENTRIES": int(os.getenv("SUMMARY_DEDUP_MAX_ENTRIES", 50_000)),
+    "EVICT_EVERY": int(os.getenv("SUMMARY_DEDUP_EVICT_EVERY", 100)),
+}
+
+
+# Incremental website summaries
+# Pages are diffed paragraph by paragraph against the last summarized text, only
+# changed sections are sent to the model unless more than MAX_CHANGED_RATIO of
+# the page changed, snapshots older than TTL or above MAX_SNAPSHOTS are evicted
+
+SUMMARY_INCREMENTAL = {
+    "ENABLED": os.getenv("SUMMARY_INCREMENTAL_ENABLED", "true").lower() == "true",
+    "MAX_CHANGED_RATIO": float(os.getenv("SUMMARY_INCREMENTAL_MAX_CHANGED_RATIO", 0.5)),
+    "TTL": int(os.getenv("SUMMARY_INCREMENTAL_TTL", 60 * 60 * 24 * 30)),
+    "MAX_SNAPSHOTS": int(os.getenv("SUMMARY_INCREMENTAL_MAX_SNAPSHOTS", 10_000)),
+    "EVICT_EVERY": int(os.getenv("SUMMARY_INCREMENTAL_EVICT_EVERY", 50)),
+}
+
+
+# Chunked (map-reduce) summarization
+# Sizes are in characters, AUTO_THRESHOLD enables chunking for long content
+
+SUMMARY_CHUNKING = {
+    "CHUNK_SIZE": int(os.getenv("SUMMARY_CHUNK_SIZE", 12_000)),
+    "CHUNK_OVERLAP": int(os.getenv("SUMMARY_CHUNK_OVERLAP", 500)),
+    "MAX_WORKERS": int(os.getenv("SUMMARY_CHUNK_MAX_WORKERS", 4)),
+    "AUTO_THRESHOLD": int(os.getenv("SUMMARY_CHUNK_AUTO_THRESHOLD", 60_000)),
+}
+
+
+# Background summary jobs
+# Jobs are stored in the database and run by `python manage.py run_summary_workers`
+# AUTOSTART also runs workers inside the ASGI or WSGI server processes
+# Running jobs without a progress update for TIMEOUT seconds are requeued
+
+SUMMARY_JOBS = {
+    "WORKERS": int(os.getenv("SUMMARY_JOBS_WORKERS", 4)),
+    "POLL_INTERVAL": float(os.getenv("SUMMARY_JOBS_POLL_INTERVAL", 2)),
+    "TIMEOUT": int(os.getenv("SUMMARY_JOBS_TIMEOUT", 10 * 60)),
+    "MAX_ATTEMPTS": int(os.getenv("SUMMARY_JOBS_MAX_ATTEMPTS", 2)),
+    "AUTOSTART": os.getenv("SUMMARY_JOBS_AUTOSTART", "false").lower() == "true",
+}
+
+
+# Website content compaction
+# TOKEN_BUDGET is the estimated number of input tokens sent to the model
+
+SUMMARY_COMPACTION = {
+    "ENABLED": os.getenv("SUMMARY_COMPACTION_ENABLED", "true").lower() == "true",
+    "TOKEN_BUDGET": int(os.getenv("SUMMARY_COMPACTION_TOKEN_BUDGET", 30_000)),
+}
+
+
+# Summary LLM backend
+# BACKEND is one of gemini, openai, local or a dotted path to an LLMBackend subclass
+# The local backend returns deterministic fake summaries for load tests
+
+SUMMARY_LLM = {
+    "BACKEND": os.getenv("SUMMARY_LLM_BACKEND", "gemini"),
+    "MODEL": os.getenv("SUMMARY_LLM_MODEL", "gemini-2.0-flash"),
+    "VIDEO_MODEL": os.getenv("SUMMARY_LLM_VIDEO_MODEL", "gemini-2.5-pro-exp-03-25"),
+    "LOCAL_LATENCY": float(os.getenv("SUMMARY_LLM_LOCAL_LATENCY", 0.5)),
+    "LOCAL_OUTPUT_WORDS": int(os.getenv("SUMMARY_LLM_LOCAL_OUTPUT_WORDS", 200)),
+    "TIMEOUT": float(os.getenv("SUMMARY_LLM_TIMEOUT", 120)),
+    "EXPECTED_OUTPUT_TOKENS": int(
+        os.getenv("SUMMARY_LLM_EXPECTED_OUTPUT_TOKENS", 1500)
+    ),
+}
+
+
+# Single-flight deduplication of concurrent identical website and video requests
+# Processes coordinate through a Postgres advisory lock per request, RESULT_DIR
+# holds results shared between them and defaults to the temp dir
+
+SUMMARY_SINGLE_FLIGHT = {
+    "ENABLED": os.getenv("SUMMARY_SINGLE_FLIGHT_ENABLED", "true").lower() == "true",
+    "RESULT_DIR": os.getenv("SUMMARY_SINGLE_FLIGHT_RESULT_DIR", ""),
+    "RESULT_TTL": float(os.getenv("SUMMARY_SINGLE_FLIGHT_RESULT_TTL", 30)),
+    "WAIT_TIMEOUT": float(os.getenv("SUMMARY_SINGLE_FLIGHT_WAIT_TIMEOUT", 180)),
+}
+
+
+# Batch summarization
+
+SUMMARY_BATCH = {
+    "MAX_ITEMS": int(os.getenv("SUMMARY_BATCH_MAX_ITEMS", 100)),
+    "MAX_WORKERS": int(os.getenv("SUMMARY_BATCH_MAX_WORKERS", 16)),
+}
+
+
+# LLM call scheduler
+# Limits apply per process, divide the provider quota by the number of processes
+# A per-minute limit of 0 disables that limit
+
+SUMMARY_SCHEDULER = {
+    "REQUESTS_PER_MINUTE": float(os.getenv("SUMMARY_SCHEDULER_RPM", 1000)),
+    "TOKENS_PER_MINUTE": float(os.getenv("SUMMARY_SCHEDULER_TPM", 1_000_000)),
+    "INITIAL_CONCURRENCY": int(os.getenv("SUMMARY_SCHEDULER_INITIAL_CONCURRENCY", 8)),
+    "MIN_CONCURRENCY": int(os.getenv("SUMMARY_SCHEDULER_MIN_CONCURRENCY", 1)),
+    "MAX_CONCURRENCY": int(os.getenv("SUMMARY_SCHEDULER_MAX_CONCURRENCY", 32)),
+    "TARGET_LATENCY": float(os.getenv("SUMMARY_SCHEDULER_TARGET_LATENCY", 30)),
+    "MAX_RETRIES": int(os.getenv("SUMMARY_SCHEDULER_MAX_RETRIES", 4)),
+    "BACKOFF_BASE": float(os.getenv("SUMMARY_SCHEDULER_BACKOFF_BASE", 1)),
+    "BACKOFF_MAX": float(os.getenv("SUMMARY_SCHEDULER_BACKOFF_MAX", 30)),
+}
+
+
+# Local category and tag classifier
+# MODE is "off", "fallback" (fix invalid LLM categories) or "prepass" (the LLM
+# writes only title and content, category and tags come from the classifier)
+
+SUMMARY_CLASSIFIER = {
+    "MODE": os.getenv("SUMMARY_CLASSIFIER_MODE", "fallback"),
+    "MODEL_PATH": os.getenv(
+        "SUMMARY_CLASSIFIER_MODEL_PATH", str(BASE_DIR / "data" / "classifier.json")
+    ),
+}
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'AISummarizer.settings')
 
 application = get_wsgi_application()
+
+# Job workers run in server processes only when SUMMARY_JOBS_AUTOSTART is set
+from Summary import jobs  # noqa: E402
+
+jobs.autostart()
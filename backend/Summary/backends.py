@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import typing
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+from google import genai
+from google.genai import types
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from . import prompts
+
+
+def get_api_key(model: str = "GEMINI"):
+    match model.upper():
+        case "GEMINI":
+            return os.environ.get("GEMINI_API_KEY")
+        case "OPENAI":
+            return os.environ.get("OPENAI_API_KEY")
+
+
+class LLMBackend:
+    name = ""
+    supports_video = False
+
+    def __init__(self, config: typing.Dict[str, typing.Any]):
+        self.config = config
+
+    def create_chat_model(self, model_name: str) -> BaseChatModel:
+        raise NotImplementedError
+
+    def generate_video(self, youtube_url: str, prompt_text: str, model_name: str) -> str:
+        raise NotImplementedError(
+            f"The {self.name} backend does not support video summaries"
+        )
+
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+    supports_video = True
+
+    def __init__(self, config: typing.Dict[str, typing.Any]):
+        super().__init__(config)
+        self._lock = threading.Lock()
+        self._client = None
+
+    def create_chat_model(self, model_name: str) -> BaseChatModel:
+        return ChatGoogleGenerativeAI(
+            api_key=get_api_key("GEMINI"),  # type: ignore
+            model=model_name,
+            temperature=0,
+            max_tokens=None,
+            timeout=self.config["TIMEOUT"],
+            max_retries=0,
+        )
+
+    def get_client(self) -> genai.Client:
+        if self._client is not None:
+            return self._client
+
+        with self._lock:
+            if self._client is None:
+                self._client = genai.Client(api_key=get_api_key("GEMINI"))
+
+        return self._client
+
+    def generate_video(self, youtube_url: str, prompt_text: str, model_name: str) -> str:
+        contents = [
+            types.Content(
+                role="user",
+                parts=[
+                    types.Part.from_uri(
+                        file_uri=youtube_url,
+                        mime_type="video/*",
+                    ),
+                    types.Part.from_text(text=prompt_text),
+                ],
+            ),
+        ]
+
+        config = types.GenerateContentConfig(
+            response_mime_type="application/json",
+            response_schema=prompts.BotResponse,
+        )
+
+        response = self.get_client().models.generate_content(model=model_name, contents=contents, config=config)  # type: ignore
+
+        return str(response.candidates[0].content.parts[0].text)  # type: ignore
+
+
+class OpenAIBackend(LLMBackend):
+    name = "openai"
+
+    def create_chat_model(self, model_name: str) -> BaseChatModel:
+        try:
+            from langchain_openai import ChatOpenAI
+        except ImportError:
+            raise ImproperlyConfigured(
+                "The openai backend requires the langchain-openai package"
+            )
+
+        return ChatOpenAI(
+            api_key=get_api_key("OPENAI"),  # type: ignore
+            model=model_name,
+            temperature=0,
+            timeout=self.config["TIMEOUT"],
+            max_retries=0,
+        )
+
+
+lorem_words = (
+    "summary content model local backend deterministic response token latency "
+    "request benchmark article section paragraph result value data text page "
+    "document information detail example process system user service output"
+).split()
+
+
+def local_response(prompt_text: str, output_words: int) -> dict:
+    seed = int(hashlib.sha256(prompt_text.encode("utf-8")).hexdigest()[:16], 16)
+    generator = random.Random(seed)
+
+    words = [generator.choice(lorem_words) for _ in range(output_words)]
+    sentences = [
+        " ".join(words[start : start + 12]).capitalize() + "."
+        for start in range(0, len(words), 12)
+    ]
+
+    return {
+        "title": " ".join(words[:4]).title() or "Local summary",
+        "content": "".join(f"<p>{sentence}</p>" for sentence in sentences),
+        "tags": sorted(set(words[:5])),
+        "category": prompts.categories[seed % len(prompts.categories)],
+    }
+
+
+class LocalChatModel(BaseChatModel):
+    latency: float = 0.0
+    output_words: int = 200
+    stream_chunk_size: int = 32
+
+    @property
+    def _llm_type(self) -> str:
+        return "summarizzler-local"
+
+    def _render(self, messages: typing.List[BaseMessage]) -> str:
+        prompt_text = "\n".join(str(message.content) for message in messages)
+
+        return json.dumps(local_response(prompt_text, self.output_words))
+
+    def _generate(
+        self,
+        messages: typing.List[BaseMessage],
+        stop: typing.Optional[typing.List[str]] = None,
+        run_manager: typing.Any = None,
+        **kwargs: typing.Any,
+    ) -> ChatResult:
+        time.sleep(self.latency)
+        message = AIMessage(content=self._render(messages))
+
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: typing.List[BaseMessage],
+        stop: typing.Optional[typing.List[str]] = None,
+        run_manager: typing.Any = None,
+        **kwargs: typing.Any,
+    ) -> typing.Iterator[ChatGenerationChunk]:
+        text = self._render(messages)
+        pieces = range(0, len(text), self.stream_chunk_size)
+        delay = self.latency / max(len(pieces), 1)
+
+        for start in pieces:
+            time.sleep(delay)
+            content = text[start : start + self.stream_chunk_size]
+            chunk = AIMessageChunk(content=content)
+
+            if run_manager is not None:
+                run_manager.on_llm_new_token(content, chunk=chunk)
+
+            yield ChatGenerationChunk(message=chunk)
+
+
+class LocalBackend(LLMBackend):
+    name = "local"
+    supports_video = True
+
+    def create_chat_model(self, model_name: str) -> BaseChatModel:
+        return LocalChatModel(
+            latency=self.config["LOCAL_LATENCY"],
+            output_words=self.config["LOCAL_OUTPUT_WORDS"],
+        )
+
+    def generate_video(self, youtube_url: str, prompt_text: str, model_name: str) -> str:
+        time.sleep(self.config["LOCAL_LATENCY"])
+
+        return json.dumps(
+            local_response(
+                f"{youtube_url}\n{prompt_text}", self.config["LOCAL_OUTPUT_WORDS"]
+            )
+        )
+
+
+backends: typing.Dict[str, typing.Type[LLMBackend]] = {
+    GeminiBackend.name: GeminiBackend,
+    OpenAIBackend.name: OpenAIBackend,
+    LocalBackend.name: LocalBackend,
+}
+
+
+def create_backend(
+    config: typing.Optional[typing.Dict[str, typing.Any]] = None,
+) -> LLMBackend:
+    config = config if config is not None else settings.SUMMARY_LLM
+    backend_name = config["BACKEND"]
+
+    if backend_name in backends:
+        return backends[backend_name](config)
+
+    if "." in backend_name:
+        return import_string(backend_name)(config)
+
+    raise ImproperlyConfigured(f"Unknown summary LLM backend: {backend_name}")
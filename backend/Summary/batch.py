@@ -0,0 +1,165 @@
+import concurrent.futures
+import logging
+import time
+import typing
+
+from django.conf import settings
+from django.db import connection
+
+from . import crawl, functions, metrics, models, pipeline, serializers
+
+logger = logging.getLogger(__name__)
+
+required_item_fields = {
+    functions.Website.content_type: ["url", "prompt"],
+    functions.Text.content_type: ["text", "prompt"],
+    functions.Video.content_type: ["url", "prompt"],
+}
+
+
+def validate_item(item: typing.Any) -> typing.Optional[str]:
+    if not isinstance(item, dict):
+        return "Item must be an object"
+
+    content_type = item.get("type", None)
+    if not isinstance(content_type, str) or content_type not in required_item_fields:
+        return f"Invalid type. Supported types: {', '.join(required_item_fields)}"
+
+    missing_fields = functions.check_required_fields(
+        item, required_item_fields[content_type]
+    )
+    if len(missing_fields):
+        return f"Missing fields: {', '.join(missing_fields)}"
+
+    invalid_fields = [
+        field
+        for field in required_item_fields[content_type]
+        if not isinstance(item[field], str) or not item[field].strip()
+    ]
+    if len(invalid_fields):
+        return f"Fields must be non-empty strings: {', '.join(invalid_fields)}"
+
+    if content_type == functions.Website.content_type and functions.parse_bool(
+        item.get("crawl", False)
+    ):
+        try:
+            crawl.parse_limits(item.get("depth", None), item.get("pages", None))
+        except ValueError as e:
+            return str(e)
+
+    youtube_url = "https://www.youtube.com/watch?v="
+    if content_type == functions.Video.content_type and youtube_url not in item["url"]:
+        return "Invalid URL. Only YouTube videos are supported."
+
+    return None
+
+
+def summarize_item(item: typing.Dict[str, typing.Any]) -> pipeline.PipelineResult:
+    try:
+        match item["type"]:
+            case functions.Website.content_type if functions.parse_bool(
+                item.get("crawl", False)
+            ):
+                depth, pages = crawl.parse_limits(
+                    item.get("depth", None), item.get("pages", None)
+                )
+
+                return crawl.summarize_site(
+                    item["url"],
+                    item["prompt"],
+                    depth,
+                    pages,
+                    item.get("extraction", None),
+                )
+            case functions.Website.content_type:
+                return pipeline.summarize_website(
+                    item["url"],
+                    item["prompt"],
+                    extraction_mode=item.get("extraction", None),
+                )
+            case functions.Text.content_type:
+                return pipeline.summarize_text(
+                    item["text"], item["prompt"], item.get("chunked", None)
+                )
+            case _:
+                return pipeline.summarize_video(item["url"], item["prompt"])
+
+    finally:
+        connection.close()
+
+
+def summarize_batch(
+    items: typing.List[typing.Any], author: typing.Any, is_private: typing.Any
+) -> typing.List[typing.Dict[str, typing.Any]]:
+    results: typing.List[typing.Dict[str, typing.Any]] = [
+        {"index": index} for index in range(len(items))
+    ]
+    futures: typing.Dict[concurrent.futures.Future, int] = {}
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=settings.SUMMARY_BATCH["MAX_WORKERS"]
+    ) as executor:
+        for index, item in enumerate(items):
+            if (error := validate_item(item)) is not None:
+                results[index].update(status="error", message=error)
+                continue
+
+            futures[executor.submit(summarize_item, item)] = index
+
+        pending_summaries: typing.List[typing.Tuple[int, models.Summary]] = []
+
+        for future in concurrent.futures.as_completed(futures):
+            index = futures[future]
+
+            try:
+                data, report = future.result()
+            except pipeline.PipelineError as e:
+                results[index].update(status="error", message=e.message)
+                continue
+            except Exception as e:
+                logger.exception("Batch item %s failed", index)
+                results[index].update(status="error", message=str(e))
+                continue
+
+            data["is_private"] = items[index].get("private", is_private)
+            serializer = serializers.SummarySerializer(data=data)
+
+            if not serializer.is_valid():
+                error_message = ", ".join(
+                    [error_detail[0].__str__() for error_detail in serializer.errors.values()]  # type: ignore
+                )
+                results[index].update(status="error", message=error_message)
+                continue
+
+            summary = models.Summary(author=author, **serializer.validated_data)
+            pending_summaries.append((index, summary))
+
+            if report:
+                results[index]["report"] = report
+
+    models.Summary.objects.bulk_create([summary for _, summary in pending_summaries])
+
+    for index, summary in pending_summaries:
+        results[index].update(status="ok", id=str(summary.id))
+
+    metrics.increment("batch.items", len(items))
+    metrics.increment("batch.summaries", len(pending_summaries))
+
+    return results
+
+
+def run_batch(
+    items: typing.List[typing.Any], author: typing.Any, is_private: typing.Any
+) -> typing.Dict[str, typing.Any]:
+    started_at = time.perf_counter()
+    results = summarize_batch(items, author, is_private)
+    seconds = time.perf_counter() - started_at
+
+    metrics.observe("batch.seconds", seconds)
+
+    return {
+        "results": results,
+        "succeeded": sum(1 for result in results if result["status"] == "ok"),
+        "failed": sum(1 for result in results if result["status"] == "error"),
+        "seconds": round(seconds, 3),
+    }
@@ -0,0 +1,203 @@
+import collections
+import copy
+import datetime
+import hashlib
+import json
+import re
+import threading
+import time
+import typing
+import unicodedata
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from . import metrics, models
+
+
+def normalize_content(content: str) -> str:
+    content = unicodedata.normalize("NFC", content)
+
+    return re.sub(r"\s+", " ", content).strip()
+
+
+def normalize_prompt(user_prompt: str) -> str:
+    return normalize_content(user_prompt).lower()
+
+
+def make_key(content: str, user_prompt: str, model: str) -> str:
+    digest = hashlib.sha256()
+    for part in (normalize_content(content), normalize_prompt(user_prompt), model):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+
+    return digest.hexdigest()
+
+
+class SummaryCache:
+    def __init__(self, config: typing.Optional[typing.Dict[str, typing.Any]] = None):
+        config = config if config is not None else settings.SUMMARY_CACHE
+
+        self.enabled: bool = config["ENABLED"]
+        self.memory_entries: int = config["MEMORY_ENTRIES"]
+        self.ttl: int = config["TTL"]
+        self.db_max_entries: int = config["DB_MAX_ENTRIES"]
+        self.db_max_bytes: int = config["DB_MAX_BYTES"]
+        self.evict_every: int = config["EVICT_EVERY"]
+
+        self._lock = threading.Lock()
+        self._memory: collections.OrderedDict[str, typing.Tuple[float, dict]] = (
+            collections.OrderedDict()
+        )
+        self._writes = 0
+
+    def get(self, key: str) -> typing.Optional[dict]:
+        if not self.enabled:
+            return None
+
+        if (response := self._memory_get(key)) is not None:
+            metrics.increment("cache.memory.hits")
+            return copy.deepcopy(response)
+
+        if (response := self._db_get(key)) is not None:
+            metrics.increment("cache.db.hits")
+            self._memory_set(key, response)
+            return copy.deepcopy(response)
+
+        metrics.increment("cache.misses")
+
+        return None
+
+    def set(self, key: str, response: dict, model: str = "") -> None:
+        if not self.enabled:
+            return
+
+        response = copy.deepcopy(response)
+        self._memory_set(key, response)
+        self._db_set(key, response, model)
+
+    def clear_memory(self) -> None:
+        with self._lock:
+            self._memory.clear()
+
+    def _memory_get(self, key: str) -> typing.Optional[dict]:
+        with self._lock:
+            if (entry := self._memory.get(key)) is None:
+                return None
+
+            expires_at, response = entry
+            if expires_at < time.monotonic():
+                del self._memory[key]
+                return None
+
+            self._memory.move_to_end(key)
+
+            return response
+
+    def _memory_set(self, key: str, response: dict) -> None:
+        with self._lock:
+            self._memory[key] = (time.monotonic() + self.ttl, response)
+            self._memory.move_to_end(key)
+
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _db_get(self, key: str) -> typing.Optional[dict]:
+        now = timezone.now()
+
+        try:
+            entry = models.CachedResponse.objects.get(key=key)
+        except models.CachedResponse.DoesNotExist:
+            return None
+
+        if entry.created_at < now - datetime.timedelta(seconds=self.ttl):
+            entry.delete()
+            return None
+
+        models.CachedResponse.objects.filter(key=key).update(last_accessed_at=now)
+
+        return entry.response
+
+    def _db_set(self, key: str, response: dict, model: str) -> None:
+        models.CachedResponse.objects.update_or_create(
+            key=key,
+            defaults={
+                "model": model,
+                "response": response,
+                "size": len(json.dumps(response)),
+                "created_at": timezone.now(),
+                "last_accessed_at": timezone.now(),
+            },
+        )
+
+        with self._lock:
+            self._writes += 1
+            should_evict = self._writes % self.evict_every == 0
+
+        if should_evict:
+            self.evict()
+
+    def evict(self) -> int:
+        expired_before = timezone.now() - datetime.timedelta(seconds=self.ttl)
+        deleted, _ = models.CachedResponse.objects.filter(
+            created_at__lt=expired_before
+        ).delete()
+
+        entries = models.CachedResponse.objects.order_by("-last_accessed_at")
+
+        overflow_keys = list(
+            entries.values_list("key", flat=True)[self.db_max_entries :]
+        )
+        if overflow_keys:
+            deleted += models.CachedResponse.objects.filter(
+                key__in=overflow_keys
+            ).delete()[0]
+
+        total_size = entries.aggregate(total=Sum("size"))["total"] or 0
+        if total_size > self.db_max_bytes:
+            oldest_keys = []
+            for key, size in entries.reverse().values_list("key", "size").iterator():
+                if total_size <= self.db_max_bytes:
+                    break
+
+                oldest_keys.append(key)
+                total_size -= size
+
+            deleted += models.CachedResponse.objects.filter(
+                key__in=oldest_keys
+            ).delete()[0]
+
+        metrics.increment("cache.db.evictions", deleted)
+
+        return deleted
+
+
+_cache: typing.Optional[SummaryCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> SummaryCache:
+    global _cache
+
+    if _cache is not None:
+        return _cache
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = SummaryCache()
+
+    return _cache
+
+
+def get_stats() -> typing.Dict[str, typing.Any]:
+    hits = metrics.get("cache.memory.hits") + metrics.get("cache.db.hits")
+    misses = metrics.get("cache.misses")
+
+    return {
+        "memory_hits": metrics.get("cache.memory.hits"),
+        "db_hits": metrics.get("cache.db.hits"),
+        "misses": misses,
+        "evictions": metrics.get("cache.db.evictions"),
+        "hit_rate": hits / (hits + misses) if hits + misses else None,
+    }
@@ -0,0 +1,320 @@
+import concurrent.futures
+import json
+import re
+import time
+import typing
+
+from django.conf import settings
+
+from . import cache, dedup, engine
+
+heading_pattern = re.compile(
+    r"^(#{1,6}\s|[A-Z0-9][A-Z0-9 \-:]{3,80}$|\d+(\.\d+)*\.?\s+[A-Z])"
+)
+sentence_pattern = re.compile(r"(?<=[.!?])\s+")
+
+
+def split_blocks(text: str) -> typing.List[str]:
+    blocks: typing.List[str] = []
+    current: typing.List[str] = []
+
+    for line in text.splitlines():
+        stripped = line.strip()
+
+        if not stripped or heading_pattern.match(stripped):
+            if current:
+                blocks.append("\n".join(current))
+                current = []
+
+        if stripped:
+            current.append(stripped)
+
+    if current:
+        blocks.append("\n".join(current))
+
+    return blocks
+
+
+def split_oversized(block: str, chunk_size: int) -> typing.List[str]:
+    if len(block) <= chunk_size:
+        return [block]
+
+    pieces: typing.List[str] = []
+    current = ""
+
+    for sentence in sentence_pattern.split(block):
+        while len(sentence) > chunk_size:
+            if current:
+                pieces.append(current)
+                current = ""
+
+            pieces.append(sentence[:chunk_size])
+            sentence = sentence[chunk_size:]
+
+        if current and len(current) + len(sentence) + 1 > chunk_size:
+            pieces.append(current)
+            current = ""
+
+        current = f"{current} {sentence}" if current else sentence
+
+    if current:
+        pieces.append(current)
+
+    return pieces
+
+
+def split_into_chunks(
+    text: str,
+    chunk_size: typing.Optional[int] = None,
+    overlap: typing.Optional[int] = None,
+) -> typing.List[str]:
+    config = settings.SUMMARY_CHUNKING
+    chunk_size = chunk_size if chunk_size is not None else config["CHUNK_SIZE"]
+    overlap = overlap if overlap is not None else config["CHUNK_OVERLAP"]
+    overlap = min(overlap, chunk_size // 2)
+
+    blocks = [
+        piece
+        for block in split_blocks(text)
+        for piece in split_oversized(block, chunk_size)
+    ]
+
+    chunks: typing.List[str] = []
+    current: typing.List[str] = []
+    current_size = 0
+
+    for block in blocks:
+        if current and current_size + len(block) + 2 > chunk_size:
+            chunks.append("\n\n".join(current))
+
+            carried: typing.List[str] = []
+            carried_size = 0
+            for previous in reversed(current):
+                if carried_size + len(previous) > overlap:
+                    break
+
+                carried.insert(0, previous)
+                carried_size += len(previous) + 2
+
+            if carried_size + len(block) + 2 > chunk_size:
+                carried = []
+                carried_size = 0
+
+            current = carried
+            current_size = carried_size
+
+        current.append(block)
+        current_size += len(block) + 2
+
+    if current:
+        chunks.append("\n\n".join(current))
+
+    return chunks
+
+
+def should_chunk(content: str, chunked: typing.Any = None) -> bool:
+    if chunked is None or str(chunked).lower() == "auto":
+        return len(content) > settings.SUMMARY_CHUNKING["AUTO_THRESHOLD"]
+
+    return str(chunked).lower() in ("true", "1")
+
+
+def summarize_chunk(
+    chunk: str, index: int, count: int, user_prompt: str, model_name: str
+) -> typing.Tuple[dict, typing.Dict[str, typing.Any]]:
+    started_at = time.perf_counter()
+
+    summarization_engine = engine.get_engine()
+    chain = summarization_engine.get_chain("chunk", model_name)
+    response = summarization_engine.invoke_chain(
+        chain,
+        {
+            "dom_content": chunk,
+            "user_prompt": user_prompt,
+            "chunk_index": index + 1,
+            "chunk_count": count,
+        },
+    )
+
+    report = {
+        "index": index,
+        "characters": len(chunk),
+        "seconds": round(time.perf_counter() - started_at, 3),
+    }
+
+    return response, report
+
+
+def to_partial_summaries(
+    responses: typing.List[typing.Optional[dict]],
+) -> typing.List[typing.Dict[str, typing.Any]]:
+    return [
+        {
+            "part": index + 1,
+            "title": response.get("title", ""),
+            "content": response.get("content", ""),
+            "tags": response.get("tags", []),
+            "category": response.get("category", ""),
+        }
+        for index, response in enumerate(responses)
+        if response is not None and response.get("content")
+    ]
+
+
+def batch_partial_summaries(
+    partial_summaries: typing.List[typing.Dict[str, typing.Any]], chunk_size: int
+) -> typing.List[typing.List[typing.Dict[str, typing.Any]]]:
+    batches: typing.List[typing.List[typing.Dict[str, typing.Any]]] = []
+    batch_size = 0
+
+    for partial in partial_summaries:
+        size = len(json.dumps(partial, ensure_ascii=False)) + 2
+
+        if not batches or batch_size + size > chunk_size:
+            batches.append([])
+            batch_size = 0
+
+        batches[-1].append(partial)
+        batch_size += size
+
+    return batches
+
+
+def reduce_partial_summaries(
+    partial_summaries: typing.List[typing.Dict[str, typing.Any]],
+    user_prompt: str,
+    model_name: str,
+    executor: concurrent.futures.Executor,
+    chunk_size: int,
+) -> typing.Tuple[typing.List[typing.Dict[str, typing.Any]], int]:
+    # Partials that do not fit one reduce prompt are merged in batches, level
+    # by level, until they do
+    summarization_engine = engine.get_engine()
+    chain = summarization_engine.get_chain("reduce", model_name)
+    levels = 0
+
+    while (
+        len(json.dumps(partial_summaries, ensure_ascii=False)) > chunk_size
+        and len(partial_summaries) > 1
+    ):
+        batches = batch_partial_summaries(partial_summaries, chunk_size)
+
+        # Every partial is already larger than a chunk, merging cannot shrink them
+        if len(batches) == len(partial_summaries):
+            break
+
+        responses = executor.map(
+            lambda batch: summarization_engine.invoke_chain(
+                chain,
+                {
+                    "partial_summaries": json.dumps(batch, ensure_ascii=False),
+                    "user_prompt": user_prompt,
+                },
+            ),
+            batches,
+        )
+        partial_summaries = to_partial_summaries(list(responses))
+        levels += 1
+
+    return partial_summaries, levels
+
+
+def summarize_chunked(
+    content: str,
+    user_prompt: str,
+    model_name: typing.Optional[str] = None,
+    chunk_size: typing.Optional[int] = None,
+    overlap: typing.Optional[int] = None,
+    max_workers: typing.Optional[int] = None,
+    on_token: typing.Optional[engine.TokenCallback] = None,
+) -> typing.Tuple[dict, typing.Dict[str, typing.Any]]:
+    started_at = time.perf_counter()
+    config = settings.SUMMARY_CHUNKING
+    chunk_size = chunk_size if chunk_size is not None else config["CHUNK_SIZE"]
+    max_workers = max_workers if max_workers is not None else config["MAX_WORKERS"]
+
+    summarization_engine = engine.get_engine()
+    model_name = model_name or summarization_engine.default_model
+    cache_model = f"{summarization_engine.cache_model_key(model_name)}:chunked"
+
+    summary_cache = cache.get_cache()
+    cache_key = cache.make_key(content, user_prompt, cache_model)
+    if (cached_response := summary_cache.get(cache_key)) is not None:
+        if on_token is not None:
+            on_token(cached_response["content"])
+
+        return cached_response, {"cached": True, "chunks": []}
+
+    near_duplicates = dedup.get_index()
+    if (match := near_duplicates.find(content, user_prompt, cache_model)) is not None:
+        response, similarity = match
+        summary_cache.set(cache_key, response, cache_model)
+
+        if on_token is not None:
+            on_token(response["content"])
+
+        return response, {
+            "cached": True,
+            "near_duplicate_similarity": round(similarity, 3),
+            "chunks": [],
+        }
+
+    chunks = split_into_chunks(content, chunk_size, overlap)
+    if len(chunks) == 1:
+        response = summarization_engine.summarize(
+            content, user_prompt, model_name, on_token
+        )
+
+        return response, {"cached": False, "chunks": []}
+
+    partial_responses: typing.List[typing.Optional[dict]] = [None] * len(chunks)
+    chunk_reports: typing.List[typing.Optional[dict]] = [None] * len(chunks)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(
+                summarize_chunk, chunk, index, len(chunks), user_prompt, model_name
+            ): index
+            for index, chunk in enumerate(chunks)
+        }
+
+        for future in concurrent.futures.as_completed(futures):
+            index = futures[future]
+            partial_responses[index], chunk_reports[index] = future.result()
+
+        map_seconds = time.perf_counter() - started_at
+
+        reduce_started_at = time.perf_counter()
+        partial_summaries, reduce_levels = reduce_partial_summaries(
+            to_partial_summaries(partial_responses),
+            user_prompt,
+            model_name,
+            executor,
+            chunk_size,
+        )
+
+    chain = summarization_engine.get_chain("reduce", model_name)
+    response = summarization_engine.invoke_chain(
+        chain,
+        {
+            "partial_summaries": json.dumps(partial_summaries, ensure_ascii=False),
+            "user_prompt": user_prompt,
+        },
+        on_token,
+    )
+    response = engine.normalize_category(response, content)
+    reduce_seconds = time.perf_counter() - reduce_started_at
+
+    summary_cache.set(cache_key, response, cache_model)
+    near_duplicates.add(content, user_prompt, cache_model, response)
+
+    report = {
+        "cached": False,
+        "chunks": chunk_reports,
+        "map_seconds": round(map_seconds, 3),
+        "reduce_seconds": round(reduce_seconds, 3),
+        "reduce_levels": reduce_levels,
+        "total_seconds": round(time.perf_counter() - started_at, 3),
+    }
+
+    return response, report
@@ -0,0 +1,231 @@
+import collections
+import json
+import math
+import os
+import re
+import threading
+import typing
+
+from django.conf import settings
+
+from . import prompts
+
+html_tag_pattern = re.compile(r"<[^>]*>")
+word_pattern = re.compile(r"[^\W\d_]{3,}", re.UNICODE)
+
+stopwords = set(
+    "about above after again against all also and any are because been before being "
+    "below between both but can could did does doing down during each few for from "
+    "further had has have having her here hers herself him himself his how into its "
+    "itself just more most must myself nor not now off once only other our ours "
+    "ourselves out over own same she should some such than that the their theirs "
+    "them themselves then there these they this those through too under until very "
+    "was were what when where which while who whom why will with would you your "
+    "yours yourself yourselves one two new may many much use used using like get "
+    "also well way make made first last year years time".split()
+)
+
+Vector = typing.Dict[str, float]
+
+
+def tokenize(text: str) -> typing.List[str]:
+    text = html_tag_pattern.sub(" ", text).lower()
+
+    return [word for word in word_pattern.findall(text) if word not in stopwords]
+
+
+def normalize(vector: Vector) -> Vector:
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    if not norm:
+        return vector
+
+    return {term: value / norm for term, value in vector.items()}
+
+
+def top_terms(vector: Vector, limit: int) -> Vector:
+    return dict(
+        sorted(vector.items(), key=lambda item: item[1], reverse=True)[:limit]
+    )
+
+
+def cosine(vector: Vector, centroid: Vector) -> float:
+    if len(vector) > len(centroid):
+        vector, centroid = centroid, vector
+
+    return sum(value * centroid.get(term, 0.0) for term, value in vector.items())
+
+
+class Classifier:
+    def __init__(self, model: typing.Dict[str, typing.Any]):
+        self.idf: typing.Dict[str, float] = model["idf"]
+        self.default_idf: float = model["default_idf"]
+        self.categories: typing.Dict[str, Vector] = model["categories"]
+        self.tags: typing.Dict[str, Vector] = model["tags"]
+
+    def vectorize(self, text: str, max_characters: int = 20_000) -> Vector:
+        counts = collections.Counter(tokenize(text[:max_characters]))
+
+        return normalize(
+            {
+                term: (1 + math.log(count)) * self.idf.get(term, self.default_idf)
+                for term, count in counts.items()
+            }
+        )
+
+    def predict_category(
+        self, text: str, vector: typing.Optional[Vector] = None
+    ) -> typing.Tuple[str, float]:
+        vector = vector if vector is not None else self.vectorize(text)
+        scores = {
+            category: cosine(vector, centroid)
+            for category, centroid in self.categories.items()
+        }
+
+        if not scores or max(scores.values()) <= 0:
+            return "other", 0.0
+
+        category = max(scores, key=lambda name: scores[name])
+
+        return category, scores[category]
+
+    def predict_tags(
+        self,
+        text: str,
+        limit: int = 5,
+        min_score: float = 0.05,
+        vector: typing.Optional[Vector] = None,
+    ) -> typing.List[str]:
+        vector = vector if vector is not None else self.vectorize(text)
+        scores = sorted(
+            ((cosine(vector, centroid), tag) for tag, centroid in self.tags.items()),
+            reverse=True,
+        )
+        tags = [tag for score, tag in scores[:limit] if score >= min_score]
+
+        for term in top_terms(vector, limit * 2):
+            if len(tags) >= limit:
+                break
+
+            if term not in tags:
+                tags.append(term)
+
+        return tags[:limit]
+
+    def predict(self, text: str) -> typing.Dict[str, typing.Any]:
+        vector = self.vectorize(text)
+        category, _ = self.predict_category(text, vector)
+
+        return {"category": category, "tags": self.predict_tags(text, vector=vector)}
+
+
+def train(
+    documents: typing.Iterable[typing.Tuple[str, str, typing.List[str]]],
+    terms_per_centroid: int = 300,
+    min_tag_count: int = 3,
+) -> typing.Dict[str, typing.Any]:
+    tokenized: typing.List[typing.Tuple[collections.Counter, str, typing.List[str]]] = []
+    document_frequency: collections.Counter = collections.Counter()
+
+    for text, category, tags in documents:
+        counts = collections.Counter(tokenize(text))
+        if not counts:
+            continue
+
+        document_frequency.update(counts.keys())
+        tokenized.append((counts, category, [tag.lower() for tag in tags]))
+
+    document_count = len(tokenized)
+    idf = {
+        term: math.log((1 + document_count) / (1 + frequency)) + 1
+        for term, frequency in document_frequency.items()
+    }
+    default_idf = math.log(1 + document_count) + 1
+
+    category_sums: typing.Dict[str, Vector] = collections.defaultdict(dict)
+    tag_sums: typing.Dict[str, Vector] = collections.defaultdict(dict)
+    tag_counts: collections.Counter = collections.Counter()
+
+    for counts, category, tags in tokenized:
+        vector = normalize(
+            {
+                term: (1 + math.log(count)) * idf[term]
+                for term, count in counts.items()
+            }
+        )
+
+        targets = [category_sums[category]] if category in prompts.categories else []
+        for tag in tags:
+            tag_counts[tag] += 1
+            targets.append(tag_sums[tag])
+
+        for target in targets:
+            for term, value in vector.items():
+                target[term] = target.get(term, 0.0) + value
+
+    return {
+        "idf": {term: round(value, 4) for term, value in idf.items()},
+        "default_idf": default_idf,
+        "documents": document_count,
+        "categories": {
+            category: normalize(top_terms(vector, terms_per_centroid))
+            for category, vector in category_sums.items()
+        },
+        "tags": {
+            tag: normalize(top_terms(vector, terms_per_centroid // 3))
+            for tag, vector in tag_sums.items()
+            if tag_counts[tag] >= min_tag_count
+        },
+    }
+
+
+def summary_documents(
+    summaries: typing.Iterable[typing.Any],
+) -> typing.Iterator[typing.Tuple[str, str, typing.List[str]]]:
+    for summary in summaries:
+        text = f"{summary.title}\n{summary.summary}\n{summary.raw_text[:20_000]}"
+
+        yield text, summary.category, list(summary.tags)
+
+
+def save_model(model: typing.Dict[str, typing.Any], path: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temporary_path = f"{path}.tmp"
+
+    with open(temporary_path, "w", encoding="utf-8") as model_file:
+        json.dump(model, model_file)
+
+    os.replace(temporary_path, path)
+
+    reset_classifier()
+
+
+_classifier: typing.Optional[Classifier] = None
+_classifier_loaded = False
+_classifier_lock = threading.Lock()
+
+
+def get_classifier() -> typing.Optional[Classifier]:
+    global _classifier, _classifier_loaded
+
+    if _classifier_loaded:
+        return _classifier
+
+    with _classifier_lock:
+        if not _classifier_loaded:
+            path = settings.SUMMARY_CLASSIFIER["MODEL_PATH"]
+
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as model_file:
+                    _classifier = Classifier(json.load(model_file))
+
+            _classifier_loaded = True
+
+    return _classifier
+
+
+def reset_classifier() -> None:
+    global _classifier, _classifier_loaded
+
+    with _classifier_lock:
+        _classifier = None
+        _classifier_loaded = False
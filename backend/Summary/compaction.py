@@ -0,0 +1,200 @@
+import collections
+import re
+import time
+import typing
+
+from django.conf import settings
+
+from . import metrics
+
+whitespace_pattern = re.compile(r"\s+")
+word_pattern = re.compile(r"\w+", re.UNICODE)
+boilerplate_pattern = re.compile(
+    r"\b(cookies?|accept all|reject all|privacy policy|terms of (use|service)|"
+    r"sign in|sign up|log in|register|subscribe|newsletter|all rights reserved|"
+    r"skip to (main )?content|share (on|this)|follow us|advertisement|"
+    r"read more|load more|back to top|menu)\b",
+    re.IGNORECASE,
+)
+# Bare URLs and navigation trails such as "Home | News | Sport"
+link_pattern = re.compile(r"^(https?://|www\.)\S+$|\s[|»›·/]\s", re.IGNORECASE)
+
+stopwords = set(
+    "a about all an and are as at be by for from give how in is it make me of on "
+    "or please summarize summary that the this to what with write".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+
+    return max(1, round(len(text) / 4))
+
+
+def get_terms(text: str) -> typing.Set[str]:
+    return {
+        word
+        for word in word_pattern.findall(text.lower())
+        if len(word) > 2 and word not in stopwords
+    }
+
+
+def looks_like_link(line: str, words: typing.List[str]) -> bool:
+    return bool(link_pattern.search(line)) or (
+        len(words) <= 3 and line[-1] not in ".!?"
+    )
+
+
+def is_low_information(line: str, repeated: bool = False) -> bool:
+    # Prices, scores, years and table rows carry few letters but real content
+    has_digits = any(character.isdigit() for character in line)
+    letters = sum(character.isalpha() for character in line)
+    if letters < 3 and not has_digits:
+        return True
+
+    words = line.split()
+    if (
+        len(words) <= 8
+        and (repeated or looks_like_link(line, words))
+        and boilerplate_pattern.search(line)
+    ):
+        return True
+
+    return len(words) == 1 and len(line) < 4 and not has_digits
+
+
+def is_heading(line: str) -> bool:
+    words = line.split()
+
+    return 0 < len(words) <= 10 and line[-1] not in ".,;:!?" and line[0].isupper()
+
+
+def clean_lines(text: str) -> typing.Tuple[typing.List[str], int]:
+    normalized = [
+        line
+        for raw_line in text.splitlines()
+        if (line := whitespace_pattern.sub(" ", raw_line).strip())
+    ]
+    counts = collections.Counter(line.lower() for line in normalized)
+
+    seen: typing.Set[str] = set()
+    lines: typing.List[str] = []
+    removed = 0
+
+    for line in normalized:
+        key = line.lower()
+        if key in seen or is_low_information(line, counts[key] > 1):
+            removed += 1
+            continue
+
+        seen.add(key)
+        lines.append(line)
+
+    return lines, removed
+
+
+def split_sections(lines: typing.List[str]) -> typing.List[typing.List[str]]:
+    sections: typing.List[typing.List[str]] = []
+
+    for index, line in enumerate(lines):
+        next_line = lines[index + 1] if index + 1 < len(lines) else ""
+        starts_section = is_heading(line) and len(next_line.split()) > 10
+
+        if not sections or starts_section:
+            sections.append([])
+
+        sections[-1].append(line)
+
+    return sections
+
+
+def score_section(
+    section: typing.List[str], index: int, count: int, prompt_terms: typing.Set[str]
+) -> float:
+    text = " ".join(section)
+    words = text.split()
+    section_terms = get_terms(text)
+
+    relevance = 0.0
+    if prompt_terms:
+        relevance = len(prompt_terms & section_terms) / len(prompt_terms)
+
+    density = min(len(words) / len(section), 40) / 40
+    position = 1 - index / count
+
+    return 3 * relevance + 2 * density + position
+
+
+def trim_to_budget(
+    sections: typing.List[typing.List[str]], user_prompt: str, token_budget: int
+) -> typing.List[typing.List[str]]:
+    prompt_terms = get_terms(user_prompt)
+    ranked = sorted(
+        range(len(sections)),
+        key=lambda index: score_section(
+            sections[index], index, len(sections), prompt_terms
+        ),
+        reverse=True,
+    )
+
+    selected: typing.Dict[int, typing.List[str]] = {}
+    remaining = token_budget
+
+    for index in ranked:
+        if remaining <= 0:
+            break
+
+        kept_lines: typing.List[str] = []
+        for line in sections[index]:
+            line_tokens = estimate_tokens(line)
+            if line_tokens > remaining:
+                break
+
+            kept_lines.append(line)
+            remaining -= line_tokens
+
+        if kept_lines:
+            selected[index] = kept_lines
+
+    return [selected[index] for index in sorted(selected)]
+
+
+def compact(
+    text: str, user_prompt: str = "", token_budget: typing.Optional[int] = None
+) -> typing.Tuple[str, typing.Dict[str, typing.Any]]:
+    started_at = time.perf_counter()
+    config = settings.SUMMARY_COMPACTION
+    if token_budget is None:
+        token_budget = config["TOKEN_BUDGET"]
+
+    tokens_before = estimate_tokens(text)
+
+    if not config["ENABLED"]:
+        return text, {
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_before,
+            "tokens_saved": 0,
+        }
+
+    # Every page is cleaned, the budget only decides whether sections are trimmed
+    lines, removed_lines = clean_lines(text)
+    sections = split_sections(lines)
+
+    if sum(estimate_tokens(line) for line in lines) > token_budget:
+        sections = trim_to_budget(sections, user_prompt, token_budget)
+
+    compacted = "\n\n".join("\n".join(section) for section in sections)
+    tokens_after = estimate_tokens(compacted)
+
+    metrics.increment("compaction.tokens_saved", tokens_before - tokens_after)
+
+    report = {
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": tokens_before - tokens_after,
+        "lines_removed": removed_lines,
+        "seconds": round(time.perf_counter() - started_at, 4),
+    }
+
+    return compacted, report
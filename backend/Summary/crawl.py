@@ -0,0 +1,385 @@
+import concurrent.futures
+import contextlib
+import threading
+import time
+import typing
+import urllib.parse
+import urllib.robotparser
+import xml.etree.ElementTree as ElementTree
+
+import requests
+from django.conf import settings
+
+from . import (
+    chunking,
+    compaction,
+    engine,
+    extraction,
+    fetcher,
+    functions,
+    metrics,
+    pipeline,
+    singleflight,
+)
+
+sitemap_content_types = {"application/xml", "text/xml", "text/plain"}
+skipped_extensions = tuple(
+    ".pdf .zip .gz .tar .png .jpg .jpeg .gif .svg .webp .ico .css .js .json .xml "
+    ".mp3 .mp4 .avi .mov .woff .woff2 .ttf .exe .dmg".split()
+)
+
+
+def get_host(url: str) -> str:
+    host = urllib.parse.urlsplit(url).netloc.lower()
+
+    return host[4:] if host.startswith("www.") else host
+
+
+def normalize_link(base_url: str, link: str) -> typing.Optional[str]:
+    url, _ = urllib.parse.urldefrag(urllib.parse.urljoin(base_url, link.strip()))
+    parts = urllib.parse.urlsplit(url)
+
+    if parts.scheme not in ("http", "https"):
+        return None
+
+    if parts.path.lower().endswith(skipped_extensions):
+        return None
+
+    return url
+
+
+def is_sitemap(url: str) -> bool:
+    path = urllib.parse.urlsplit(url).path.lower()
+
+    return path.endswith(".xml") or "sitemap" in path
+
+
+def parse_sitemap(content: str) -> typing.Tuple[typing.List[str], typing.List[str]]:
+    # Returns page urls and nested sitemap urls of a sitemap or sitemap index
+    try:
+        root = ElementTree.fromstring(content.encode("utf-8"))
+    except ElementTree.ParseError:
+        return [], []
+
+    pages: typing.List[str] = []
+    sitemaps: typing.List[str] = []
+
+    for element in root.iter():
+        if not element.tag.endswith("loc") or not element.text:
+            continue
+
+        parent_is_sitemap = root.tag.endswith("sitemapindex")
+        (sitemaps if parent_is_sitemap else pages).append(element.text.strip())
+
+    return pages, sitemaps
+
+
+class HostLimiter:
+    def __init__(self, concurrency: int, delay: float):
+        self.concurrency = concurrency
+        self.delay = delay
+
+        self._lock = threading.Lock()
+        self._semaphores: typing.Dict[str, threading.Semaphore] = {}
+        self._next_request_at: typing.Dict[str, float] = {}
+
+    @contextlib.contextmanager
+    def slot(self, host: str) -> typing.Iterator[None]:
+        with self._lock:
+            semaphore = self._semaphores.setdefault(
+                host, threading.Semaphore(self.concurrency)
+            )
+
+        with semaphore:
+            with self._lock:
+                now = time.monotonic()
+                request_at = max(now, self._next_request_at.get(host, now))
+                self._next_request_at[host] = request_at + self.delay
+
+            time.sleep(request_at - now)
+
+            yield
+
+
+class Crawler:
+    def __init__(
+        self,
+        start_url: str,
+        max_depth: int,
+        max_pages: int,
+        extraction_mode: str,
+        config: typing.Optional[typing.Dict[str, typing.Any]] = None,
+    ):
+        config = config if config is not None else settings.SUMMARY_CRAWL
+
+        self.start_url = start_url
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.extraction_mode = extraction_mode
+        self.max_workers: int = config["MAX_WORKERS"]
+        self.respect_robots: bool = config["RESPECT_ROBOTS"]
+        self.user_agent: str = settings.SUMMARY_FETCHER["USER_AGENT"]
+
+        self.host = get_host(start_url)
+        self.limiter = HostLimiter(config["PER_HOST_CONCURRENCY"], config["DELAY"])
+        self.robots: typing.Optional[urllib.robotparser.RobotFileParser] = None
+
+    def is_allowed(self, url: str) -> bool:
+        if get_host(url) != self.host:
+            return False
+
+        return self.robots is None or self.robots.can_fetch(self.user_agent, url)
+
+    def load_robots(self) -> None:
+        if not self.respect_robots:
+            return
+
+        parts = urllib.parse.urlsplit(self.start_url)
+        robots_url = f"{parts.scheme}://{parts.netloc}/robots.txt"
+
+        try:
+            _, content = fetcher.get_fetcher().get_html(robots_url, {"text/plain"})
+        except requests.exceptions.RequestException:
+            return
+
+        self.robots = urllib.robotparser.RobotFileParser(robots_url)
+        self.robots.parse(content.splitlines())
+
+    def load_sitemap(self, url: str) -> typing.List[str]:
+        pages: typing.List[str] = []
+        sitemaps = [url]
+
+        # Follows one level of sitemap indexes
+        for _ in range(2):
+            nested_sitemaps: typing.List[str] = []
+
+            for sitemap_url in sitemaps:
+                try:
+                    _, content = fetcher.get_fetcher().get_html(
+                        sitemap_url, sitemap_content_types
+                    )
+                except requests.exceptions.RequestException:
+                    continue
+
+                sitemap_pages, sitemap_indexes = parse_sitemap(content)
+                pages.extend(sitemap_pages)
+                nested_sitemaps.extend(sitemap_indexes)
+
+            sitemaps = nested_sitemaps[: self.max_pages]
+
+        return pages
+
+    def fetch(self, url: str) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        with self.limiter.slot(get_host(url)):
+            started_at = time.perf_counter()
+
+            try:
+                page, http_cache_status = pipeline.fetch_page(url, self.extraction_mode)
+            except pipeline.PipelineError:
+                metrics.increment("crawl.failed_pages")
+                return None
+
+            metrics.increment("crawl.pages")
+
+            return {
+                "url": url,
+                "title": page["title"],
+                "text": page["text"],
+                "links": page.get("links", []),
+                "http_cache": http_cache_status,
+                "seconds": round(time.perf_counter() - started_at, 3),
+            }
+
+    def crawl(
+        self, progress: pipeline.ProgressCallback = pipeline.no_progress
+    ) -> typing.Tuple[
+        typing.List[typing.Dict[str, typing.Any]], typing.Dict[str, typing.Any]
+    ]:
+        started_at = time.perf_counter()
+        self.load_robots()
+
+        if is_sitemap(self.start_url):
+            level = [
+                url
+                for url in dict.fromkeys(self.load_sitemap(self.start_url))
+                if self.is_allowed(url)
+            ]
+            max_depth = 0
+        else:
+            level = [self.start_url]
+            max_depth = self.max_depth
+
+        seen = set(level)
+        pages: typing.List[typing.Dict[str, typing.Any]] = []
+        failed = 0
+        depth = 0
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers
+        ) as executor:
+            for depth in range(max_depth + 1):
+                level = level[: self.max_pages - len(pages)]
+                if not level:
+                    break
+
+                progress("crawling", min(10 + 30 * len(pages) // self.max_pages, 40))
+                next_level: typing.List[str] = []
+
+                for url, page in zip(level, executor.map(self.fetch, level)):
+                    if page is None:
+                        failed += 1
+                        continue
+
+                    pages.append(page)
+
+                    if depth == max_depth:
+                        continue
+
+                    for link in page["links"]:
+                        link_url = normalize_link(url, link)
+
+                        if (
+                            link_url
+                            and link_url not in seen
+                            and self.is_allowed(link_url)
+                        ):
+                            seen.add(link_url)
+                            next_level.append(link_url)
+
+                level = next_level
+
+        report = {
+            "pages": len(pages),
+            "failed_pages": failed,
+            "depth": depth,
+            "discovered_urls": len(seen),
+            "seconds": round(time.perf_counter() - started_at, 3),
+        }
+
+        return pages, report
+
+
+def parse_limits(
+    depth: typing.Any, pages: typing.Any
+) -> typing.Tuple[typing.Optional[int], typing.Optional[int]]:
+    # Depth 0 is only the start page, a crawl always fetches at least one page
+    try:
+        depth = int(depth) if depth is not None else None
+        pages = int(pages) if pages is not None else None
+    except (TypeError, ValueError):
+        raise ValueError("Invalid depth or pages value")
+
+    if (depth is not None and depth < 0) or (pages is not None and pages < 1):
+        raise ValueError("Invalid depth or pages value")
+
+    return depth, pages
+
+
+def summarize_site(
+    url: str,
+    user_prompt: str,
+    max_depth: typing.Optional[int] = None,
+    max_pages: typing.Optional[int] = None,
+    extraction_mode: typing.Optional[str] = None,
+    progress: pipeline.ProgressCallback = pipeline.no_progress,
+    on_token: typing.Optional[engine.TokenCallback] = None,
+) -> pipeline.PipelineResult:
+    config = settings.SUMMARY_CRAWL
+    max_depth = max(
+        min(
+            max_depth if max_depth is not None else config["DEPTH"],
+            config["MAX_DEPTH"],
+        ),
+        0,
+    )
+    max_pages = max(min(max_pages or config["PAGES"], config["MAX_PAGES"]), 1)
+    extraction_mode = extraction_mode or settings.SUMMARY_EXTRACTION["MODE"]
+
+    if extraction_mode not in extraction.extraction_modes:
+        modes = ", ".join(extraction.extraction_modes)
+        raise pipeline.PipelineError(
+            f"Invalid extraction mode. Supported modes: {modes}"
+        )
+
+    source = (
+        f"crawl:{max_depth}:{max_pages}:{extraction_mode}:"
+        f"{singleflight.normalize_url(url)}"
+    )
+    key = singleflight.make_key(source, user_prompt)
+    data, report = pipeline.single_flight(
+        key,
+        lambda: crawl_and_summarize(
+            url,
+            user_prompt,
+            max_depth,
+            max_pages,
+            extraction_mode,
+            progress,
+            on_token,
+        ),
+    )
+    data["url"] = url
+
+    return data, report
+
+
+def crawl_and_summarize(
+    url: str,
+    user_prompt: str,
+    max_depth: int,
+    max_pages: int,
+    extraction_mode: str,
+    progress: pipeline.ProgressCallback = pipeline.no_progress,
+    on_token: typing.Optional[engine.TokenCallback] = None,
+) -> pipeline.PipelineResult:
+    crawler = Crawler(url, max_depth, max_pages, extraction_mode)
+    pages, crawl_report = crawler.crawl(progress)
+
+    if not pages:
+        raise pipeline.PipelineError("Failed to scrape website")
+
+    # Every page gets an equal share of the token budget
+    page_budget = max(
+        settings.SUMMARY_CRAWL["TOKEN_BUDGET"] // len(pages),
+        settings.SUMMARY_CRAWL["MIN_PAGE_TOKENS"],
+    )
+    sections = []
+    tokens_saved = 0
+
+    for page in pages:
+        text, compaction_report = compaction.compact(
+            page["text"], user_prompt, page_budget
+        )
+        tokens_saved += compaction_report["tokens_saved"]
+        sections.append(
+            f"# {page['title'] or page['url']}\nSource: {page['url']}\n{text}"
+        )
+
+    content = "\n\n".join(sections)
+    report: typing.Dict[str, typing.Any] = {
+        "crawl": {
+            **crawl_report,
+            "urls": [page["url"] for page in pages],
+            "tokens_saved": tokens_saved,
+        }
+    }
+
+    progress("summarizing", 50)
+    if chunking.should_chunk(content, None):
+        bot_response, report["chunking"] = chunking.summarize_chunked(
+            content, user_prompt, on_token=on_token
+        )
+    else:
+        bot_response = functions.Website.ask_bot(content, user_prompt, on_token)
+
+    data = {
+        "url": url,
+        "title": bot_response["title"] or pages[0]["title"] or url,
+        "content_type": functions.Website.content_type,
+        "summary": bot_response["content"],
+        "user_prompt": user_prompt,
+        "tags": bot_response["tags"][:5],
+        "category": bot_response["category"],
+    }
+
+    return data, report
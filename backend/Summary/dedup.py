@@ -0,0 +1,237 @@
+import array
+import datetime
+import hashlib
+import re
+import threading
+import time
+import typing
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from . import cache, metrics, models
+
+word_pattern = re.compile(r"\w+", re.UNICODE)
+
+Signature = typing.List[int]
+
+
+def hash64(value: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little"
+    )
+
+
+def get_shingles(content: str, size: int) -> typing.Set[str]:
+    words = word_pattern.findall(cache.normalize_content(content).lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+
+    return {
+        " ".join(words[start : start + size]) for start in range(len(words) - size + 1)
+    }
+
+
+def minhash(shingles: typing.Iterable[str], num_hashes: int) -> Signature:
+    # One-permutation MinHash: every shingle is hashed once and lands in one
+    # bin, which keeps signing linear in the number of shingles.
+    empty = 1 << 64
+    signature = [empty] * num_hashes
+
+    for shingle in shingles:
+        value = hash64(shingle)
+        index = value % num_hashes
+        value //= num_hashes
+
+        if value < signature[index]:
+            signature[index] = value
+
+    filled = [index for index, value in enumerate(signature) if value != empty]
+    if not filled:
+        return [0] * num_hashes
+
+    # Densify empty bins by borrowing the next filled bin (circularly)
+    for index in range(num_hashes):
+        if signature[index] != empty:
+            continue
+
+        offset = 1
+        while signature[(index + offset) % num_hashes] == empty:
+            offset += 1
+
+        signature[index] = signature[(index + offset) % num_hashes] ^ offset
+
+    return signature
+
+
+def similarity(left: Signature, right: Signature) -> float:
+    if len(left) != len(right) or not left:
+        return 0.0
+
+    return sum(1 for a, b in zip(left, right) if a == b) / len(left)
+
+
+def pack_signature(signature: Signature) -> bytes:
+    return array.array("Q", signature).tobytes()
+
+
+def unpack_signature(data: bytes) -> Signature:
+    signature = array.array("Q")
+    signature.frombytes(bytes(data))
+
+    return signature.tolist()
+
+
+def band_keys(signature: Signature, bands: int, scope: str) -> typing.List[int]:
+    rows = len(signature) // bands
+    keys = []
+
+    for band in range(bands):
+        values = signature[band * rows : (band + 1) * rows]
+        key = hash64(f"{scope}\x00{band}\x00{','.join(map(str, values))}")
+        # Postgres bigint is signed
+        keys.append(key - (1 << 63))
+
+    return keys
+
+
+class NearDuplicateIndex:
+    def __init__(self, config: typing.Optional[typing.Dict[str, typing.Any]] = None):
+        config = config if config is not None else settings.SUMMARY_DEDUP
+
+        self.enabled: bool = config["ENABLED"]
+        self.threshold: float = config["THRESHOLD"]
+        self.num_hashes: int = config["NUM_HASHES"]
+        self.bands: int = config["BANDS"]
+        self.shingle_size: int = config["SHINGLE_SIZE"]
+        self.min_shingles: int = config["MIN_SHINGLES"]
+        self.max_candidates: int = config["MAX_CANDIDATES"]
+        self.ttl: int = config["TTL"]
+        self.max_entries: int = config["MAX_ENTRIES"]
+        self.evict_every: int = config["EVICT_EVERY"]
+
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        if self.num_hashes % self.bands:
+            raise ValueError("NUM_HASHES must be a multiple of BANDS")
+
+    def scope(self, user_prompt: str, model: str) -> str:
+        return f"{model}\x00{cache.normalize_prompt(user_prompt)}"
+
+    def sign(self, content: str) -> typing.Optional[Signature]:
+        shingles = get_shingles(content, self.shingle_size)
+        if len(shingles) < self.min_shingles:
+            return None
+
+        return minhash(shingles, self.num_hashes)
+
+    def find(
+        self, content: str, user_prompt: str, model: str
+    ) -> typing.Optional[typing.Tuple[dict, float]]:
+        if not self.enabled:
+            return None
+
+        started_at = time.perf_counter()
+        signature = self.sign(content)
+        signed_at = time.perf_counter()
+
+        if signature is None:
+            return None
+
+        keys = band_keys(signature, self.bands, self.scope(user_prompt, model))
+        # Signatures sharing the most bands are the likeliest near duplicates
+        candidate_ids = list(
+            models.ContentBand.objects.filter(key__in=keys)
+            .values("signature_id")
+            .annotate(matches=Count("id"))
+            .order_by("-matches")
+            .values_list("signature_id", flat=True)[: self.max_candidates]
+        )
+        expired_before = timezone.now() - datetime.timedelta(seconds=self.ttl)
+
+        best: typing.Optional[typing.Tuple[dict, float]] = None
+
+        for candidate in models.ContentSignature.objects.filter(
+            id__in=candidate_ids, created_at__gte=expired_before
+        ):
+            score = similarity(signature, unpack_signature(candidate.signature))
+
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (candidate.response, score)
+
+        metrics.observe("dedup.sign_seconds", signed_at - started_at)
+        metrics.observe("dedup.lookup_seconds", time.perf_counter() - signed_at)
+
+        if best is None:
+            metrics.increment("dedup.misses")
+        else:
+            metrics.increment("dedup.hits")
+            metrics.observe("dedup.similarity", best[1])
+
+        return best
+
+    def add(self, content: str, user_prompt: str, model: str, response: dict) -> None:
+        if not self.enabled:
+            return
+
+        signature = self.sign(content)
+        if signature is None:
+            return
+
+        keys = band_keys(signature, self.bands, self.scope(user_prompt, model))
+
+        with transaction.atomic():
+            entry = models.ContentSignature.objects.create(
+                model=model,
+                signature=pack_signature(signature),
+                response=response,
+            )
+            models.ContentBand.objects.bulk_create(
+                [models.ContentBand(key=key, signature=entry) for key in keys]
+            )
+
+        with self._lock:
+            self._writes += 1
+            should_evict = self._writes % self.evict_every == 0
+
+        if should_evict:
+            self.evict()
+
+    def evict(self) -> int:
+        expired_before = timezone.now() - datetime.timedelta(seconds=self.ttl)
+        expired = models.ContentSignature.objects.filter(created_at__lt=expired_before)
+        # Bands are removed with their signature by the cascade
+        deleted = expired.delete()[1].get(models.ContentSignature._meta.label, 0)
+
+        overflow_ids = list(
+            models.ContentSignature.objects.order_by("-created_at").values_list(
+                "id", flat=True
+            )[self.max_entries :]
+        )
+        if overflow_ids:
+            overflow = models.ContentSignature.objects.filter(id__in=overflow_ids)
+            deleted += overflow.delete()[1].get(models.ContentSignature._meta.label, 0)
+
+        metrics.increment("dedup.evictions", deleted)
+
+        return deleted
+
+
+_index: typing.Optional[NearDuplicateIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> NearDuplicateIndex:
+    global _index
+
+    if _index is not None:
+        return _index
+
+    with _index_lock:
+        if _index is None:
+            _index = NearDuplicateIndex()
+
+    return _index
@@ -0,0 +1,204 @@
+import hashlib
+import re
+import threading
+import time
+import typing
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import metrics, models, pdf
+
+page_range_pattern = re.compile(r"^\s*(\d+)\s*(?:(-)\s*(\d*)\s*)?$")
+
+PageRange = typing.Tuple[int, typing.Optional[int]]
+
+
+def hash_file(file: typing.Any, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    file.seek(0)
+
+    chunks = (
+        file.chunks(chunk_size)
+        if hasattr(file, "chunks")
+        else iter(lambda: file.read(chunk_size), b"")
+    )
+    for chunk in chunks:
+        digest.update(chunk)
+
+    file.seek(0)
+
+    return digest.hexdigest()
+
+
+def parse_page_range(value: typing.Any) -> typing.Optional[PageRange]:
+    # "3", "2-5" or "4-", pages are numbered from 1 and ranges are inclusive
+    if value is None or str(value).strip() == "":
+        return None
+
+    if (match := page_range_pattern.match(str(value))) is None:
+        raise ValueError(f"Invalid page range: {value}")
+
+    first = int(match.group(1))
+    if match.group(2) is None:
+        last: typing.Optional[int] = first
+    else:
+        last = int(match.group(3)) if match.group(3) else None
+
+    if first < 1 or (last is not None and last < first):
+        raise ValueError(f"Invalid page range: {value}")
+
+    return first - 1, last
+
+
+def resolve_page_range(
+    page_range: typing.Optional[PageRange], pages: int
+) -> typing.Tuple[int, int]:
+    if page_range is None:
+        return 0, pages
+
+    start, stop = page_range
+    if start >= pages:
+        raise ValueError(f"Page range starts after the last page ({pages})")
+
+    return start, pages if stop is None else min(stop, pages)
+
+
+class DocumentStore:
+    def __init__(self, config: typing.Optional[typing.Dict[str, typing.Any]] = None):
+        config = config if config is not None else settings.SUMMARY_DOCUMENTS
+
+        self.enabled: bool = config["ENABLED"]
+        self.max_documents: int = config["MAX_DOCUMENTS"]
+        self.evict_every: int = config["EVICT_EVERY"]
+
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, key: str) -> typing.Optional[models.DocumentText]:
+        if not self.enabled:
+            return None
+
+        document = models.DocumentText.objects.filter(key=key).first()
+        if document is None:
+            metrics.increment("documents.misses")
+            return None
+
+        metrics.increment("documents.hits")
+        models.DocumentText.objects.filter(key=key).update(
+            last_accessed_at=timezone.now()
+        )
+
+        return document
+
+    def get_pages(self, key: str, start: int, stop: int) -> typing.List[str]:
+        return list(
+            models.DocumentPage.objects.filter(
+                document_id=key, number__gte=start, number__lt=stop
+            )
+            .order_by("number")
+            .values_list("text", flat=True)
+        )
+
+    def add(
+        self, key: str, title: typing.Optional[str], pages: typing.List[str]
+    ) -> None:
+        if not self.enabled:
+            return
+
+        try:
+            with transaction.atomic():
+                document = models.DocumentText.objects.create(
+                    key=key,
+                    title=title or "",
+                    pages=len(pages),
+                    size=sum(len(text) for text in pages),
+                )
+                models.DocumentPage.objects.bulk_create(
+                    [
+                        models.DocumentPage(document=document, number=number, text=text)
+                        for number, text in enumerate(pages)
+                    ],
+                    batch_size=500,
+                )
+
+        # The same document uploaded concurrently, the first one is kept
+        except IntegrityError:
+            return
+
+        with self._lock:
+            self._writes += 1
+            should_evict = self._writes % self.evict_every == 0
+
+        if should_evict:
+            self.evict()
+
+    def evict(self) -> int:
+        overflow_keys = list(
+            models.DocumentText.objects.order_by("-last_accessed_at").values_list(
+                "key", flat=True
+            )[self.max_documents :]
+        )
+        if not overflow_keys:
+            return 0
+
+        deleted, _ = models.DocumentText.objects.filter(key__in=overflow_keys).delete()
+        metrics.increment("documents.evictions", len(overflow_keys))
+
+        return deleted
+
+    def get_stats(self) -> typing.Dict[str, typing.Any]:
+        return {
+            "enabled": self.enabled,
+            "documents": models.DocumentText.objects.count(),
+            "hits": metrics.get("documents.hits"),
+            "misses": metrics.get("documents.misses"),
+        }
+
+    def get_text(
+        self, file: typing.Any, page_range: typing.Optional[PageRange] = None
+    ) -> typing.Tuple[str, typing.Dict[str, typing.Any]]:
+        started_at = time.perf_counter()
+        # The upload handler hashes files while they arrive
+        key = getattr(file, "sha256", None) or hash_file(file)
+        report: typing.Dict[str, typing.Any] = {"sha256": key}
+
+        if (document := self.get(key)) is not None:
+            start, stop = resolve_page_range(page_range, document.pages)
+            pages = self.get_pages(key, start, stop)
+            report.update(cache="hit", pages=document.pages)
+
+        else:
+            pages, title, extraction_report = pdf.extract_pages(file)
+            self.add(key, title, pages)
+
+            start, stop = resolve_page_range(page_range, len(pages))
+            pages = pages[start:stop]
+            report.update(cache="miss", **extraction_report)
+
+        text = "".join(pages).strip()
+        report.update(
+            page_range=[start + 1, stop],
+            characters=len(text),
+            seconds=round(time.perf_counter() - started_at, 4),
+        )
+
+        return text, report
+
+
+_store: typing.Optional[DocumentStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> DocumentStore:
+    global _store
+
+    if _store is not None:
+        return _store
+
+    with _store_lock:
+        if _store is None:
+            _store = DocumentStore()
+
+    return _store
@@ -0,0 +1,288 @@
+import threading
+import typing
+
+from django.conf import settings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import Runnable
+
+from . import backends, cache, classifier, dedup, metrics, parsing, prompts, scheduler
+
+TokenCallback = typing.Callable[[str], None]
+
+
+def match_category(value: typing.Any) -> typing.Optional[str]:
+    value = str(value or "").strip().lower()
+    if value in prompts.categories:
+        return value
+
+    # Shortened names like "health" are kept, anything ambiguous is left to the
+    # classifier
+    matches = [
+        category for category in prompts.categories if category.startswith(value)
+    ]
+    if value and len(matches) == 1:
+        return matches[0]
+
+    return None
+
+
+def normalize_category(response: dict, content: str = "") -> dict:
+    if (category := match_category(response.get("category"))) is not None:
+        response["category"] = category
+
+    elif (
+        settings.SUMMARY_CLASSIFIER["MODE"] != "off"
+        and (local_classifier := classifier.get_classifier()) is not None
+    ):
+        response["category"], _ = local_classifier.predict_category(
+            content or response.get("content", "")
+        )
+        metrics.increment("classifier.fallbacks")
+
+    return response
+
+
+def get_prepass_classifier() -> typing.Optional[classifier.Classifier]:
+    if settings.SUMMARY_CLASSIFIER["MODE"] != "prepass":
+        return None
+
+    return classifier.get_classifier()
+
+
+class SummarizationEngine:
+    def __init__(self, backend: typing.Optional[backends.LLMBackend] = None):
+        self._lock = threading.Lock()
+        self._models: typing.Dict[str, BaseChatModel] = {}
+        self._chains: typing.Dict[typing.Tuple[str, str], Runnable] = {}
+
+        self.backend = backend if backend is not None else backends.create_backend()
+        self.default_model: str = self.backend.config["MODEL"]
+        self.video_model: str = self.backend.config["VIDEO_MODEL"]
+
+        self.parser = JsonOutputParser(pydantic_object=prompts.BotResponse)
+        self.format_instructions = self.parser.get_format_instructions()
+
+        self.content_parser = JsonOutputParser(pydantic_object=prompts.ContentResponse)
+        self.parsers: typing.Dict[str, JsonOutputParser] = {
+            "content": self.content_parser,
+        }
+
+        self.prompts: typing.Dict[str, PromptTemplate] = {
+            "summary": PromptTemplate(
+                template=prompts.langchain_template,
+                input_variables=["dom_content", "user_prompt"],
+                partial_variables={"format_instructions": self.format_instructions},
+            ),
+            "content": PromptTemplate(
+                template=prompts.langchain_template,
+                input_variables=["dom_content", "user_prompt"],
+                partial_variables={
+                    "format_instructions": self.content_parser.get_format_instructions()
+                },
+            ),
+            "chunk": PromptTemplate(
+                template=prompts.chunk_template,
+                input_variables=[
+                    "dom_content",
+                    "user_prompt",
+                    "chunk_index",
+                    "chunk_count",
+                ],
+                partial_variables={"format_instructions": self.format_instructions},
+            ),
+            "reduce": PromptTemplate(
+                template=prompts.reduce_template,
+                input_variables=["partial_summaries", "user_prompt"],
+                partial_variables={"format_instructions": self.format_instructions},
+            ),
+            "update": PromptTemplate(
+                template=prompts.update_template,
+                input_variables=[
+                    "previous_summary",
+                    "changed_sections",
+                    "removed_sections",
+                    "user_prompt",
+                ],
+                partial_variables={"format_instructions": self.format_instructions},
+            ),
+            "video_extraction": PromptTemplate(
+                template=prompts.video_extraction_template,
+                input_variables=["json_text_response"],
+                partial_variables={"format_instructions": self.format_instructions},
+            ),
+        }
+
+    def get_model(self, model_name: typing.Optional[str] = None) -> BaseChatModel:
+        model_name = model_name or self.default_model
+        if (model := self._models.get(model_name)) is not None:
+            return model
+
+        with self._lock:
+            if (model := self._models.get(model_name)) is None:
+                model = self.backend.create_chat_model(model_name)
+                self._models[model_name] = model
+
+        return model
+
+    def get_chain(
+        self, prompt_name: str, model_name: typing.Optional[str] = None
+    ) -> Runnable:
+        model_name = model_name or self.default_model
+        key = (prompt_name, model_name)
+        if (chain := self._chains.get(key)) is not None:
+            return chain
+
+        model = self.get_model(model_name)
+
+        with self._lock:
+            if (chain := self._chains.get(key)) is None:
+                parser = self.parsers.get(prompt_name, self.parser)
+                chain = self.prompts[prompt_name] | model | parser
+                self._chains[key] = chain
+
+        return chain
+
+    def cache_model_key(self, model_name: str) -> str:
+        return f"{self.backend.name}:{model_name}"
+
+    def estimate_tokens(self, inputs: typing.Dict[str, typing.Any]) -> int:
+        input_characters = sum(len(str(value)) for value in inputs.values())
+
+        return input_characters // 4 + self.backend.config["EXPECTED_OUTPUT_TOKENS"]
+
+    def invoke_chain(
+        self,
+        chain: Runnable,
+        inputs: typing.Dict[str, typing.Any],
+        on_token: typing.Optional[TokenCallback] = None,
+    ) -> dict:
+        llm_scheduler = scheduler.get_scheduler()
+        estimated_tokens = self.estimate_tokens(inputs)
+
+        if on_token is None:
+            return llm_scheduler.run(lambda: chain.invoke(inputs), estimated_tokens)
+
+        streamed_content = ""
+
+        def stream() -> dict:
+            nonlocal streamed_content
+            response: dict = {}
+
+            for partial_response in chain.stream(inputs):
+                if not isinstance(partial_response, dict):
+                    continue
+
+                response = partial_response
+                content = partial_response.get("content")
+
+                if (
+                    isinstance(content, str)
+                    and len(content) > len(streamed_content)
+                    and content.startswith(streamed_content)
+                ):
+                    on_token(content[len(streamed_content) :])
+                    streamed_content = content
+
+            return response
+
+        return llm_scheduler.run(
+            stream, estimated_tokens, can_retry=lambda: not streamed_content
+        )
+
+    def summarize(
+        self,
+        content: str,
+        user_prompt: str,
+        model_name: typing.Optional[str] = None,
+        on_token: typing.Optional[TokenCallback] = None,
+    ) -> dict:
+        model_name = model_name or self.default_model
+        prepass_classifier = get_prepass_classifier()
+        prompt_name = "content" if prepass_classifier is not None else "summary"
+        cache_model = f"{self.cache_model_key(model_name)}:{prompt_name}"
+
+        summary_cache = cache.get_cache()
+        cache_key = cache.make_key(content, user_prompt, cache_model)
+        if (cached_response := summary_cache.get(cache_key)) is not None:
+            if on_token is not None:
+                on_token(cached_response["content"])
+
+            return cached_response
+
+        near_duplicates = dedup.get_index()
+        if (match := near_duplicates.find(content, user_prompt, cache_model)) is not None:
+            response, _ = match
+            summary_cache.set(cache_key, response, cache_model)
+
+            if on_token is not None:
+                on_token(response["content"])
+
+            return response
+
+        chain = self.get_chain(prompt_name, model_name)
+        response = self.invoke_chain(
+            chain, {"dom_content": content, "user_prompt": user_prompt}, on_token
+        )
+
+        if prepass_classifier is not None:
+            response.update(prepass_classifier.predict(content))
+
+        response = normalize_category(response, content)
+
+        summary_cache.set(cache_key, response, cache_model)
+        near_duplicates.add(content, user_prompt, cache_model, response)
+
+        return response
+
+    def summarize_video(self, youtube_url: str, user_prompt: str) -> dict:
+        summary_cache = cache.get_cache()
+        cache_key = cache.make_key(
+            youtube_url, user_prompt, self.cache_model_key(self.video_model)
+        )
+        if (cached_response := summary_cache.get(cache_key)) is not None:
+            return cached_response
+
+        prompt_text = prompts.video_prompt_template.format(
+            user_prompt=user_prompt,
+            format_instructions=self.format_instructions,
+        )
+        json_text_response = scheduler.get_scheduler().run(
+            lambda: self.backend.generate_video(
+                youtube_url, prompt_text, self.video_model
+            ),
+            self.backend.config["EXPECTED_OUTPUT_TOKENS"],
+        )
+        metrics.increment("video.requests")
+
+        if (parsed_response := parsing.parse_bot_response(json_text_response)) is None:
+            metrics.increment("video.fallbacks")
+
+            chain = self.get_chain("video_extraction")
+            parsed_response = self.invoke_chain(
+                chain, {"json_text_response": json_text_response}
+            )
+
+        response = normalize_category(parsed_response)
+
+        summary_cache.set(cache_key, response, self.cache_model_key(self.video_model))
+
+        return response
+
+
+_engine: typing.Optional[SummarizationEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> SummarizationEngine:
+    global _engine
+
+    if _engine is not None:
+        return _engine
+
+    with _engine_lock:
+        if _engine is None:
+            _engine = SummarizationEngine()
+
+    return _engine
@@ -0,0 +1,252 @@
+import io
+import re
+import time
+import typing
+
+from bs4 import BeautifulSoup, Tag
+
+from . import compaction, pdf
+
+try:
+    import lxml  # noqa: F401 - faster BeautifulSoup tree builder
+except ImportError:  # pragma: no cover - optional dependency
+    lxml = None
+
+EXTRACTION_FULL = "full"
+EXTRACTION_MAIN = "main"
+EXTRACTION_PDF = "pdf"
+EXTRACTION_TEXT = "text"
+extraction_modes = [EXTRACTION_FULL, EXTRACTION_MAIN]
+
+boilerplate_tags = [
+    "nav",
+    "footer",
+    "aside",
+    "form",
+    "iframe",
+    "noscript",
+    "svg",
+    "button",
+    "select",
+]
+boilerplate_pattern = re.compile(
+    r"comment|sidebar|related|footer|navbar|\bnav\b|menu|breadcrumb|share|social|"
+    r"advert|\bads?\b|promo|sponsor|cookie|newsletter|subscribe|popup|banner|widget",
+    re.IGNORECASE,
+)
+content_pattern = re.compile(
+    r"article|\bbody\b|content|entry|main|post|story|text", re.IGNORECASE
+)
+heading_tags = ["h1", "h2", "h3", "h4", "h5", "h6"]
+paragraph_tags = ["p", "pre", "blockquote", "td", "li"]
+
+metadata_names = {
+    "description": "description",
+    "author": "author",
+    "keywords": "keywords",
+    "og:title": "og_title",
+    "og:description": "og_description",
+    "og:site_name": "site_name",
+    "article:published_time": "published_time",
+}
+
+
+def get_parser() -> str:
+    return "lxml" if lxml is not None else "html.parser"
+
+
+def clean_text(text: str) -> str:
+    return "\n".join(line.strip() for line in text.splitlines() if line.strip())
+
+
+def get_metadata(soup: BeautifulSoup) -> typing.Dict[str, str]:
+    metadata: typing.Dict[str, str] = {}
+
+    for meta in soup.find_all("meta"):
+        name = (meta.get("name") or meta.get("property") or "").lower()
+        content = meta.get("content")
+
+        if name in metadata_names and content:
+            metadata.setdefault(metadata_names[name], content.strip())
+
+    if (html := soup.html) is not None and html.get("lang"):
+        metadata["language"] = html["lang"]
+
+    if (canonical := soup.find("link", rel="canonical")) is not None:
+        if canonical.get("href"):
+            metadata["canonical_url"] = canonical["href"]
+
+    return metadata
+
+
+def get_class_and_id(element: Tag) -> str:
+    return " ".join(element.get("class") or []) + " " + (element.get("id") or "")
+
+
+def remove_boilerplate(body: Tag) -> None:
+    for element in body(boilerplate_tags):
+        element.decompose()
+
+    for element in body.find_all(True):
+        if element.decomposed or element.name in ("body", "article", "main"):
+            continue
+
+        attributes = get_class_and_id(element)
+        if boilerplate_pattern.search(attributes) and not content_pattern.search(
+            attributes
+        ):
+            element.decompose()
+
+
+def get_link_density(element: Tag) -> float:
+    text_length = len(element.get_text(strip=True))
+    if not text_length:
+        return 1.0
+
+    link_length = sum(len(link.get_text(strip=True)) for link in element.find_all("a"))
+
+    return link_length / text_length
+
+
+def find_main_element(body: Tag) -> Tag:
+    scores: typing.Dict[int, float] = {}
+    elements: typing.Dict[int, Tag] = {}
+
+    # Every paragraph adds to its parent and half as much to its grandparent,
+    # longer paragraphs with more commas count more.
+    for paragraph in body.find_all(paragraph_tags):
+        text = paragraph.get_text(" ", strip=True)
+        if len(text) < 25:
+            continue
+
+        score = 1 + text.count(",") + min(len(text) / 100, 3)
+
+        parent = paragraph.parent
+        grandparent = parent.parent if parent is not None else None
+
+        for ancestor, weight in ((parent, 1.0), (grandparent, 0.5)):
+            if not isinstance(ancestor, Tag):
+                continue
+
+            if id(ancestor) not in elements:
+                elements[id(ancestor)] = ancestor
+                scores[id(ancestor)] = 0.0
+
+                attributes = get_class_and_id(ancestor)
+                if ancestor.name in ("article", "main") or content_pattern.search(
+                    attributes
+                ):
+                    scores[id(ancestor)] += 25
+
+            scores[id(ancestor)] += score * weight
+
+    if not scores:
+        return body
+
+    best_key = max(
+        scores, key=lambda key: scores[key] * (1 - get_link_density(elements[key]))
+    )
+
+    return elements[best_key]
+
+
+def render_structure(element: Tag) -> None:
+    # Flatten headings and list items to one marked line each, innermost first
+    # so nested lists end up inside their parent item
+    for heading in element.find_all(heading_tags):
+        level = int(heading.name[1])
+        heading.string = "#" * level + " " + heading.get_text(" ", strip=True)
+
+    for item in reversed(element.find_all("li")):
+        item.string = "- " + item.get_text(" ", strip=True)
+
+
+def extract(
+    dom_content: str, mode: str = EXTRACTION_FULL
+) -> typing.Optional[typing.Dict[str, typing.Any]]:
+    started_at = time.perf_counter()
+    soup = BeautifulSoup(dom_content, get_parser())
+
+    if (body := soup.body) is None:
+        return None
+
+    title = None
+    if (head := soup.head) is not None and (title_tag := head.title) is not None:
+        title = title_tag.string
+
+    metadata = get_metadata(soup)
+    links = [link["href"] for link in soup.find_all("a", href=True)]
+
+    for script_or_style in body(["script", "style"]):
+        script_or_style.decompose()
+
+    text = clean_text(body.get_text(separator="\n"))
+    report: typing.Dict[str, typing.Any] = {
+        "mode": mode,
+        "parser": get_parser(),
+        "tokens_full": compaction.estimate_tokens(text),
+    }
+
+    if mode == EXTRACTION_MAIN:
+        remove_boilerplate(body)
+        main_element = find_main_element(body)
+        render_structure(main_element)
+        main_text = clean_text(main_element.get_text(separator="\n"))
+
+        # Pages without a recognizable article keep their full text
+        if len(main_text) >= min(len(text) * 0.1, 500):
+            text = main_text
+        else:
+            report["mode"] = EXTRACTION_FULL
+
+    report["tokens"] = compaction.estimate_tokens(text)
+    report["tokens_saved"] = report["tokens_full"] - report["tokens"]
+    report["seconds"] = round(time.perf_counter() - started_at, 4)
+
+    return {
+        "title": title,
+        "text": text,
+        "metadata": metadata,
+        "links": links,
+        "report": report,
+    }
+
+
+def build_page(
+    title: typing.Optional[str], text: str, mode: str, started_at: float
+) -> typing.Dict[str, typing.Any]:
+    tokens = compaction.estimate_tokens(text)
+
+    return {
+        "title": title,
+        "text": text,
+        "metadata": {},
+        "links": [],
+        "report": {
+            "mode": mode,
+            "parser": mode,
+            "tokens_full": tokens,
+            "tokens": tokens,
+            "tokens_saved": 0,
+            "seconds": round(time.perf_counter() - started_at, 4),
+        },
+    }
+
+
+def extract_pdf(data: bytes) -> typing.Optional[typing.Dict[str, typing.Any]]:
+    started_at = time.perf_counter()
+    text, title, _ = pdf.extract_text(io.BytesIO(data))
+
+    if not text:
+        return None
+
+    return build_page(title, text, EXTRACTION_PDF, started_at)
+
+
+def extract_plain_text(text: str) -> typing.Optional[typing.Dict[str, typing.Any]]:
+    started_at = time.perf_counter()
+
+    if not (text := clean_text(text)):
+        return None
+
+    return build_page(None, text, EXTRACTION_TEXT, started_at)
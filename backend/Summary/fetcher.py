@@ -0,0 +1,608 @@
+import codecs
+import collections
+import contextlib
+import itertools
+import re
+import socket
+import sys
+import threading
+import time
+import typing
+import urllib.parse
+
+import requests
+import urllib3.exceptions
+import urllib3.util.connection
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from . import metrics
+
+try:
+    import brotli  # noqa: F401 - lets urllib3 decode "br" responses
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+
+DOCUMENT_HTML = "html"
+DOCUMENT_PDF = "pdf"
+DOCUMENT_TEXT = "text"
+
+html_content_types = {"text/html", "application/xhtml+xml"}
+pdf_content_types = {"application/pdf", "application/x-pdf"}
+text_content_types = {"text/plain", "text/markdown", "text/x-markdown", "text/csv"}
+generic_content_types = {
+    "",
+    "application/octet-stream",
+    "binary/octet-stream",
+    "application/download",
+    "application/force-download",
+}
+charset_pattern = re.compile(
+    rb"""<meta[^>]+charset\s*=\s*["']?\s*([\w.:-]+)""", re.IGNORECASE
+)
+boms = [
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+sniff_bytes = 4096
+
+
+class FetchError(requests.exceptions.RequestException):
+    pass
+
+
+def get_charset(content_type: str) -> typing.Optional[str]:
+    for parameter in content_type.split(";")[1:]:
+        name, _, value = parameter.strip().partition("=")
+        if name.lower() == "charset" and value:
+            return value.strip("\"' ")
+
+    return None
+
+
+def is_known_encoding(encoding: str) -> bool:
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        return False
+
+    return True
+
+
+def detect_encoding(content_type: str, head: bytes) -> str:
+    # Declared encodings only, no detection pass over the body
+    for bom, encoding in boms:
+        if head.startswith(bom):
+            return encoding
+
+    charset = get_charset(content_type)
+    if charset is not None and is_known_encoding(charset):
+        return charset
+
+    if (match := charset_pattern.search(head[:sniff_bytes])) is not None:
+        charset = match.group(1).decode("ascii", "ignore")
+        if is_known_encoding(charset):
+            return charset
+
+    return "utf-8"
+
+
+def sniff_document_type(mime_type: str, head: bytes) -> typing.Optional[str]:
+    # Magic bytes win over the declared type, servers often send PDFs as
+    # octet-stream or even text/html
+    if b"%PDF-" in head[:1024]:
+        return DOCUMENT_PDF
+
+    if mime_type in pdf_content_types:
+        return DOCUMENT_PDF
+
+    if mime_type in html_content_types:
+        return DOCUMENT_HTML
+
+    if mime_type in text_content_types:
+        return DOCUMENT_TEXT
+
+    if mime_type in generic_content_types or mime_type.startswith("text/"):
+        sample = head[:1024].lstrip().lower()
+        if sample.startswith((b"<!doctype html", b"<html")) or b"<body" in sample:
+            return DOCUMENT_HTML
+
+        if b"\x00" not in head:
+            return DOCUMENT_TEXT
+
+    return None
+
+
+class DNSCache:
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._entries: typing.Dict[typing.Tuple, typing.Tuple[float, typing.Any]] = {}
+
+    def resolve(self, host: str, port: int) -> typing.List[typing.Tuple[str, int]]:
+        key = (host, port, urllib3.util.connection.allowed_gai_family())
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry is not None and entry[0] > now:
+            metrics.increment("fetcher.dns_hits")
+            return entry[1]
+
+        metrics.increment("fetcher.dns_misses")
+        addresses = [
+            (address[0], address[1])
+            for *_, address in socket.getaddrinfo(
+                host.strip("[]"), port, key[2], socket.SOCK_STREAM
+            )
+        ]
+
+        with self._lock:
+            self._entries[key] = (now + self.ttl, addresses)
+
+        return addresses
+
+
+class CachedDNSConnectionMixin:
+    # Only the fetcher's own connections resolve through its DNS cache, the
+    # rest of the process keeps using socket.getaddrinfo directly
+    dns_cache: typing.Optional[DNSCache] = None
+
+    def _new_conn(self) -> socket.socket:
+        if self.dns_cache is None:
+            return super()._new_conn()  # type: ignore
+
+        connection: typing.Any = self
+
+        try:
+            addresses = self.dns_cache.resolve(connection._dns_host, connection.port)
+        except socket.gaierror as e:
+            raise urllib3.exceptions.NameResolutionError(
+                connection.host, connection, e
+            ) from e
+
+        error: OSError = OSError(f"No addresses found for {connection.host}")
+
+        # Addresses are tried in order, like urllib3 does after a lookup
+        for address in addresses:
+            try:
+                sock = urllib3.util.connection.create_connection(
+                    address,
+                    connection.timeout,
+                    source_address=connection.source_address,
+                    socket_options=connection.socket_options,
+                )
+            except OSError as e:
+                error = e
+                continue
+
+            sys.audit("http.client.connect", self, connection.host, connection.port)
+
+            return sock
+
+        if isinstance(error, TimeoutError):
+            raise urllib3.exceptions.ConnectTimeoutError(
+                connection,
+                f"Connection to {connection.host} timed out. "
+                f"(connect timeout={connection.timeout})",
+            ) from error
+
+        raise urllib3.exceptions.NewConnectionError(
+            connection, f"Failed to establish a new connection: {error}"
+        ) from error
+
+
+class HostStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        # urllib3 counts requests and opened connections per connection pool
+        self.pool: typing.Any = None
+
+    @property
+    def pool_requests(self) -> int:
+        return getattr(self.pool, "num_requests", 0)
+
+    @property
+    def pool_connections(self) -> int:
+        return getattr(self.pool, "num_connections", 0)
+
+    def as_dict(self) -> typing.Dict[str, typing.Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "reuse_rate": (
+                round(1 - self.pool_connections / self.pool_requests, 3)
+                if self.pool_requests
+                else None
+            ),
+            "mean_seconds": (
+                round(self.total_seconds / self.requests, 4) if self.requests else 0.0
+            ),
+            "max_seconds": round(self.max_seconds, 4),
+        }
+
+
+class BoundedPoolMixin:
+    pool_timeout: typing.Optional[float] = None
+
+    def _get_conn(self, timeout: typing.Optional[float] = None) -> typing.Any:
+        return super()._get_conn(  # type: ignore
+            timeout if timeout is not None else self.pool_timeout
+        )
+
+
+class BoundedPoolAdapter(HTTPAdapter):
+    # requests never passes a pool timeout, with pool_block a host whose
+    # connections are all busy would otherwise be waited on forever
+    def __init__(
+        self,
+        pool_timeout: float,
+        dns_cache: typing.Optional[DNSCache] = None,
+        **kwargs: typing.Any,
+    ):
+        self.pool_timeout = pool_timeout
+        self.dns_cache = dns_cache
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args: typing.Any, **kwargs: typing.Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+
+        connection_attributes = {"dns_cache": self.dns_cache}
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": type(
+                "BoundedHTTPConnectionPool",
+                (BoundedPoolMixin, HTTPConnectionPool),
+                {
+                    "pool_timeout": self.pool_timeout,
+                    "ConnectionCls": type(
+                        "CachedDNSHTTPConnection",
+                        (CachedDNSConnectionMixin, HTTPConnection),
+                        connection_attributes,
+                    ),
+                },
+            ),
+            "https": type(
+                "BoundedHTTPSConnectionPool",
+                (BoundedPoolMixin, HTTPSConnectionPool),
+                {
+                    "pool_timeout": self.pool_timeout,
+                    "ConnectionCls": type(
+                        "CachedDNSHTTPSConnection",
+                        (CachedDNSConnectionMixin, HTTPSConnection),
+                        connection_attributes,
+                    ),
+                },
+            ),
+        }
+
+
+def get_socket(response: requests.Response) -> typing.Optional[socket.socket]:
+    connection = getattr(response.raw, "connection", None)
+
+    return getattr(connection, "sock", None)
+
+
+class Fetcher:
+    def __init__(self, config: typing.Optional[typing.Dict[str, typing.Any]] = None):
+        config = config if config is not None else settings.SUMMARY_FETCHER
+
+        self.timeout: typing.Tuple[float, float] = (
+            config["CONNECT_TIMEOUT"],
+            config["READ_TIMEOUT"],
+        )
+        self.max_bytes: int = config["MAX_BYTES"]
+        self.max_pdf_bytes: int = config["MAX_PDF_BYTES"]
+        self.total_timeout: float = config["TOTAL_TIMEOUT"]
+        self.chunk_size: int = config["CHUNK_SIZE"]
+        self.max_tracked_hosts: int = config["MAX_TRACKED_HOSTS"]
+        self.headers = {
+            "User-Agent": config["USER_AGENT"],
+            "Accept-Encoding": "gzip, deflate, br" if brotli else "gzip, deflate",
+        }
+
+        # One adapter, and so one connection pool per host, is shared by the
+        # per-thread sessions. pool_block caps concurrent connections per host.
+        self.adapter = BoundedPoolAdapter(
+            config["POOL_TIMEOUT"],
+            DNSCache(config["DNS_CACHE_TTL"]) if config["DNS_CACHE"] else None,
+            pool_connections=config["POOL_HOSTS"],
+            pool_maxsize=config["POOL_PER_HOST"],
+            pool_block=True,
+            max_retries=0,
+        )
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._hosts: collections.OrderedDict[str, HostStats] = collections.OrderedDict()
+
+    def get_session(self) -> requests.Session:
+        if (session := getattr(self._local, "session", None)) is not None:
+            return session
+
+        session = requests.Session()
+        session.headers.update(self.headers)
+        session.mount("http://", self.adapter)
+        session.mount("https://", self.adapter)
+        self._local.session = session
+
+        return session
+
+    def get(self, url: str, **kwargs: typing.Any) -> requests.Response:
+        started_at = time.perf_counter()
+        response: typing.Optional[requests.Response] = None
+
+        try:
+            response = self.get_session().get(url, timeout=self.timeout, **kwargs)
+
+            try:
+                response.raise_for_status()
+            except requests.HTTPError:
+                # Streamed responses hold their connection until closed
+                response.close()
+                raise
+
+            return response
+
+        except urllib3.exceptions.EmptyPoolError:
+            metrics.increment("fetcher.pool_timeouts")
+            raise FetchError(f"No free connection to {url} within the pool timeout")
+
+        finally:
+            self.record(url, time.perf_counter() - started_at, response)
+
+    def check_content_length(self, response: requests.Response, limit: int) -> None:
+        content_length = response.headers.get("Content-Length", "")
+
+        if content_length.isdigit() and int(content_length) > limit:
+            metrics.increment("fetcher.rejected")
+            raise FetchError(f"Document is larger than {limit} bytes")
+
+    def get_html(
+        self,
+        url: str,
+        content_types: typing.Collection[str] = html_content_types,
+        **kwargs: typing.Any,
+    ) -> typing.Tuple[requests.Response, str]:
+        response = self.get(url, stream=True, **kwargs)
+
+        with contextlib.closing(response):
+            if response.status_code == 304:
+                return response, ""
+
+            content_type = response.headers.get("Content-Type", "")
+            mime_type = content_type.split(";")[0].strip().lower()
+            if mime_type and mime_type not in content_types:
+                metrics.increment("fetcher.rejected")
+                raise FetchError(f"Unsupported content type: {mime_type}")
+
+            self.check_content_length(response, self.max_bytes)
+            chunks = self.iter_chunks(response)
+
+            return response, self.read_text(chunks, content_type, self.max_bytes)
+
+    def get_document(
+        self, url: str, **kwargs: typing.Any
+    ) -> typing.Tuple[requests.Response, str, typing.Union[str, bytes]]:
+        # Returns the document type and the decoded text, or the raw bytes of PDFs
+        response = self.get(url, stream=True, **kwargs)
+
+        with contextlib.closing(response):
+            if response.status_code == 304:
+                return response, "", ""
+
+            content_type = response.headers.get("Content-Type", "")
+            mime_type = content_type.split(";")[0].strip().lower()
+            chunks = self.iter_chunks(response)
+
+            head = b""
+            for chunk in chunks:
+                head += chunk
+                if len(head) >= sniff_bytes:
+                    break
+
+            if (document_type := sniff_document_type(mime_type, head)) is None:
+                metrics.increment("fetcher.rejected")
+                raise FetchError(f"Unsupported content type: {mime_type or 'binary'}")
+
+            metrics.increment(f"fetcher.documents.{document_type}")
+            chunks = itertools.chain([head], chunks)
+
+            if document_type == DOCUMENT_PDF:
+                self.check_content_length(response, self.max_pdf_bytes)
+
+                return (
+                    response,
+                    document_type,
+                    self.read_bytes(chunks, self.max_pdf_bytes),
+                )
+
+            self.check_content_length(response, self.max_bytes)
+
+            return (
+                response,
+                document_type,
+                self.read_text(chunks, content_type, self.max_bytes),
+            )
+
+    def abort_slow_download(self) -> typing.NoReturn:
+        metrics.increment("fetcher.aborted")
+        raise FetchError(f"Download took longer than {self.total_timeout}s")
+
+    def iter_chunks(self, response: requests.Response) -> typing.Iterator[bytes]:
+        deadline = time.monotonic() + self.total_timeout
+
+        if not hasattr(response.raw, "read1"):
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                if time.monotonic() > deadline:
+                    self.abort_slow_download()
+
+                yield chunk
+
+            return
+
+        # read1 returns after a single socket read and every read may only wait
+        # for the time left, so a server trickling bytes can't outlast the
+        # total timeout
+        sock = get_socket(response)
+
+        while True:
+            if (remaining := deadline - time.monotonic()) <= 0:
+                self.abort_slow_download()
+
+            if sock is not None:
+                sock.settimeout(min(self.timeout[1], remaining))
+
+            try:
+                chunk = response.raw.read1(self.chunk_size, decode_content=True)
+
+            except urllib3.exceptions.ReadTimeoutError as e:
+                if time.monotonic() >= deadline:
+                    self.abort_slow_download()
+
+                raise requests.exceptions.ConnectionError(e)
+
+            except urllib3.exceptions.ProtocolError as e:
+                raise requests.exceptions.ChunkedEncodingError(e)
+
+            except urllib3.exceptions.DecodeError as e:
+                raise requests.exceptions.ContentDecodingError(e)
+
+            if not chunk:
+                return
+
+            yield chunk
+
+    def read_bytes(self, chunks: typing.Iterable[bytes], limit: int) -> bytes:
+        buffer = bytearray()
+
+        for chunk in chunks:
+            buffer += chunk
+
+            if len(buffer) > limit:
+                metrics.increment("fetcher.aborted")
+                raise FetchError(f"Document is larger than {limit} bytes")
+
+        metrics.observe("fetcher.bytes", len(buffer))
+
+        return bytes(buffer)
+
+    def read_text(
+        self, chunks: typing.Iterable[bytes], content_type: str, limit: int
+    ) -> str:
+        decoder: typing.Optional[codecs.IncrementalDecoder] = None
+        head = b""
+        parts: typing.List[str] = []
+        size = 0
+
+        # Bytes are decoded as they arrive, the encoding comes from the headers
+        # or the first few kilobytes, and the download stops at the byte cap
+        for chunk in chunks:
+            size += len(chunk)
+
+            if size > limit:
+                metrics.increment("fetcher.aborted")
+                raise FetchError(f"Document is larger than {limit} bytes")
+
+            if decoder is None:
+                head += chunk
+                if len(head) < sniff_bytes:
+                    continue
+
+                chunk, head = head, b""
+                encoding = detect_encoding(content_type, chunk)
+                decoder = codecs.getincrementaldecoder(encoding)("replace")
+
+            parts.append(decoder.decode(chunk))
+
+        if decoder is None:
+            encoding = detect_encoding(content_type, head)
+            decoder = codecs.getincrementaldecoder(encoding)("replace")
+            parts.append(decoder.decode(head))
+
+        parts.append(decoder.decode(b"", final=True))
+        metrics.observe("fetcher.bytes", size)
+
+        return "".join(parts)
+
+    def get_text(self, url: str) -> typing.Optional[str]:
+        try:
+            _, text = self.get_html(url)
+        except requests.exceptions.RequestException:
+            return None
+
+        return text
+
+    def record(
+        self, url: str, seconds: float, response: typing.Optional[requests.Response]
+    ) -> None:
+        error = response is None or not response.ok
+        if response is not None:
+            url = response.url
+
+        host = urllib.parse.urlsplit(url).netloc.lower()
+
+        metrics.increment("fetcher.requests")
+        metrics.increment("fetcher.errors", int(error))
+        metrics.observe("fetcher.seconds", seconds)
+
+        with self._lock:
+            if (stats := self._hosts.get(host)) is None:
+                stats = self._hosts[host] = HostStats()
+
+            self._hosts.move_to_end(host)
+            while len(self._hosts) > self.max_tracked_hosts:
+                self._hosts.popitem(last=False)
+
+            stats.requests += 1
+            stats.errors += int(error)
+            stats.total_seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+
+            if response is not None:
+                stats.pool = getattr(response.raw, "_pool", None) or stats.pool
+
+    def get_stats(self) -> typing.Dict[str, typing.Any]:
+        with self._lock:
+            hosts = {host: stats.as_dict() for host, stats in self._hosts.items()}
+            pool_requests = sum(stats.pool_requests for stats in self._hosts.values())
+            pool_connections = sum(
+                stats.pool_connections for stats in self._hosts.values()
+            )
+
+        return {
+            "requests": metrics.get("fetcher.requests"),
+            "errors": metrics.get("fetcher.errors"),
+            "reuse_rate": (
+                round(1 - pool_connections / pool_requests, 3)
+                if pool_requests
+                else None
+            ),
+            "brotli": brotli is not None,
+            "hosts": hosts,
+        }
+
+
+_fetcher: typing.Optional[Fetcher] = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher() -> Fetcher:
+    global _fetcher
+
+    if _fetcher is not None:
+        return _fetcher
+
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = Fetcher()
+
+    return _fetcher
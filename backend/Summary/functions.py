@@ -1,29 +1,9 @@
-import os
 import typing
 
-import pydantic
-import requests
-from bs4 import BeautifulSoup
 from django.db.models.manager import BaseManager
 from django.http import QueryDict
-from google import genai
-from google.genai import types
-from langchain_core.output_parsers import JsonOutputParser
-from langchain_core.prompts import PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
-
-from . import models, serializers
-
-langchain_template = (
-    "You are tasked with extracting specific information from the following text content: {dom_content}. "
-    "Format the response in this JSON format: {format_instructions}. "
-    "Please follow these instructions carefully: \n\n"
-    "1. **Extract Information:** If not stated otherwise by user, keep the response long, detailed and informative. Only extract the information that directly matches the provided description: {user_prompt}. "
-    "2. **No Extra Content:** Do not include any additional text, comments, or explanations in your response. "
-    "3. **Empty Response:** If no information matches the description, return an empty string ('')."
-    "4. **Direct Data Only:** Your output should contain only the data that is explicitly requested, with no other text."
-    "5. **Format response:** Add to your response html tags like <br> for line breaks, <p> for paragraphs, <h1> for headers, <strong> for bold text, <em> for italic text, <a> for links, <ul> for unordered lists, <ol> for ordered lists, <li> for list items, <table> for tables, <tr> for table rows, <th> for table headers, <td> for table cells, to make the response more clean and readable."
-)
+
+from . import engine, models, serializers
 
 
 def check_required_fields(
@@ -34,6 +14,13 @@ def check_required_fields(
     return missing_fields
 
 
+def parse_bool(value: typing.Any) -> bool:
+    if isinstance(value, bool):
+        return value
+
+    return str(value).lower() in ("true", "1", "yes")
+
+
 def create_summary(data: typing.Dict[str, str]) -> typing.Optional[models.Summary]:
     serializer = serializers.SummarySerializer(
         data=data, context={"author": data["author"]}
@@ -119,254 +106,47 @@ def get_summary_by_id(summary_id: str) -> typing.Optional[models.Summary]:
         return None
 
 
-def get_api_key(model: str = "GEMINI"):
-    match model.upper():
-        case "GEMINI":
-            return os.environ.get("GEMINI_API_KEY")
-        case "OPENAI":
-            return os.environ.get("OPENAI_API_KEY")
-
-
-categories = [
-    "technology",
-    "business",
-    "health & wellness",
-    "education",
-    "lifestyle",
-    "entertainment",
-    "science",
-    "politics",
-    "art & culture",
-    "sports",
-    "food & drink",
-    "travel",
-    "other",
-]
-
-
-class BotResponse(pydantic.BaseModel):
-    title: str = pydantic.Field(description="The title of the content")
-    content: str = pydantic.Field(description="The answer to the user's query")
-    tags: typing.List[str] = pydantic.Field(description="Max 5 tags for the summary")
-    category: str = pydantic.Field(
-        description=f"The category of the content. Choose one from the list: [{', '.join(categories)}]"
-    )
-
-
 class Website:
     content_type = "website"
 
     @staticmethod
-    def get_dom_content(url: str) -> typing.Optional[str]:
-        try:
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-            }
-            response: requests.Response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-
-            return response.text
-
-        except requests.exceptions.RequestException:
-            return None
-
-    @staticmethod
-    def get_body_content(dom_content: str) -> typing.Optional[str]:
-        soup = BeautifulSoup(dom_content, "html.parser")
-        body_content = soup.body
-
-        if body_content:
-            return str(body_content)
-
-        return None
-
-    @staticmethod
-    def clean_body_content(body_content: str) -> str:
-        soup = BeautifulSoup(body_content, "html.parser")
-
-        for script_or_style in soup(["script", "style"]):
-            script_or_style.extract()
-
-        cleaned_content = soup.get_text(separator="\n")
-        cleaned_content = "\n".join(
-            line.strip() for line in cleaned_content.splitlines() if line.strip()
-        )
-
-        return cleaned_content
-
-    @staticmethod
-    def get_title_for_content(dom_content: str) -> typing.Optional[str]:
-        soup = BeautifulSoup(dom_content, "html.parser")
-
-        if (head := soup.head) is not None and (title := head.title) is not None:
-            return title.string
-
-        return None
-
-    @staticmethod
-    def ask_bot(content: str, user_prompt: str) -> dict[str, str]:
-        model = ChatGoogleGenerativeAI(
-            api_key=get_api_key(),  # type: ignore
-            model="gemini-2.0-flash",
-            temperature=0,
-            max_tokens=None,
-            timeout=None,
-            max_retries=2,
-        )
-
-        parser = JsonOutputParser(pydantic_object=BotResponse)
-
-        prompt = PromptTemplate(
-            template=langchain_template,
-            input_variables=["dom_content", "user_prompt"],
-            partial_variables={"format_instructions": parser.get_format_instructions()},
-        )
-
-        chain = prompt | model | parser
-
-        response = chain.invoke({"dom_content": content, "user_prompt": user_prompt})
-
-        for category in categories:
-            if response["category"] in category:
-                response["category"] = category
-                break
-
-        return response
+    def ask_bot(
+        content: str,
+        user_prompt: str,
+        on_token: typing.Optional[engine.TokenCallback] = None,
+    ) -> dict[str, str]:
+        return engine.get_engine().summarize(content, user_prompt, on_token=on_token)
 
 
 class Text:
     content_type = "text"
 
     @staticmethod
-    def ask_bot(content: str, user_prompt: str) -> dict[str, str]:
-        model = ChatGoogleGenerativeAI(
-            api_key=get_api_key(),  # type: ignore
-            model="gemini-2.0-flash",
-            temperature=0,
-            max_tokens=None,
-            timeout=None,
-            max_retries=2,
-        )
-
-        parser = JsonOutputParser(pydantic_object=BotResponse)
-
-        prompt = PromptTemplate(
-            template=langchain_template,
-            input_variables=["dom_content", "user_prompt"],
-            partial_variables={"format_instructions": parser.get_format_instructions()},
-        )
-
-        chain = prompt | model | parser
-
-        response = chain.invoke({"dom_content": content, "user_prompt": user_prompt})
-
-        for category in categories:
-            if response["category"] in category:
-                response["category"] = category
-                break
-
-        return response
+    def ask_bot(
+        content: str,
+        user_prompt: str,
+        on_token: typing.Optional[engine.TokenCallback] = None,
+    ) -> dict[str, str]:
+        return engine.get_engine().summarize(content, user_prompt, on_token=on_token)
 
 
 class File:
     content_type = "file"
 
     @staticmethod
-    def process_file_content(file_content: str, user_prompt: str) -> dict[str, str]:
-        model = ChatGoogleGenerativeAI(
-            api_key=get_api_key(),  # type: ignore
-            model="gemini-2.0-flash",
-            temperature=0,
-            max_tokens=None,
-            timeout=None,
-            max_retries=2,
+    def process_file_content(
+        file_content: str,
+        user_prompt: str,
+        on_token: typing.Optional[engine.TokenCallback] = None,
+    ) -> dict[str, str]:
+        return engine.get_engine().summarize(
+            file_content, user_prompt, on_token=on_token
         )
 
-        parser = JsonOutputParser(pydantic_object=BotResponse)
-
-        prompt = PromptTemplate(
-            template=langchain_template,
-            input_variables=["dom_content", "user_prompt"],
-            partial_variables={"format_instructions": parser.get_format_instructions()},
-        )
-
-        chain = prompt | model | parser
-
-        response = chain.invoke(
-            {"dom_content": file_content, "user_prompt": user_prompt}
-        )
-
-        for category in categories:
-            if response["category"] in category:
-                response["category"] = category
-                break
-
-        return response
-
 
 class Video:
     content_type = "video"
 
     @staticmethod
     def ask_bot(youtube_url: str, user_prompt: str) -> dict[str, str]:
-        parser = JsonOutputParser(pydantic_object=BotResponse)
-
-        client = genai.Client(api_key=get_api_key("GEMINI"))
-        gemini_model = "gemini-2.5-pro-exp-03-25"
-        contents = [
-            types.Content(
-                role="user",
-                parts=[
-                    types.Part.from_uri(
-                        file_uri=youtube_url,
-                        mime_type="video/*",
-                    ),
-                    types.Part.from_text(
-                        text=f"From the YouTube video extract the following information: {user_prompt}\nReturn the response in the following JSON format: {parser.get_format_instructions()}",
-                    ),
-                ],
-            ),
-        ]
-
-        response = client.models.generate_content(model=gemini_model, contents=contents)  # type: ignore
-        json_text_response = str(response.candidates[0].content.parts[0].text)  # type: ignore
-
-        model = ChatGoogleGenerativeAI(
-            api_key=get_api_key(),  # type: ignore
-            model="gemini-2.0-flash",
-            temperature=0,
-            max_tokens=None,
-            timeout=None,
-            max_retries=2,
-        )
-
-        prompt = PromptTemplate(
-            template="""
-            You are extracting data from a JSON string that may be wrapped in markdown code blocks like ```json.
-            The JSON contains properties with 'value' fields that hold the actual data.
-            
-            From this text: {json_text_response}
-            
-            Extract each property's 'value' field and create a clean JSON object with just:
-            - title (string)
-            - content (string) 
-            - tags (array of strings)
-            - category (string)
-            
-            Format the response in this JSON format: {format_instructions}
-            Don't include any explanations, just the properly formatted JSON.
-            """,
-            input_variables=["json_text_response"],
-            partial_variables={"format_instructions": parser.get_format_instructions()},
-        )
-
-        chain = prompt | model | parser
-
-        response = chain.invoke({"json_text_response": json_text_response})
-
-        for category in categories:
-            if response["category"] in category:
-                response["category"] = category
-                break
-
-        return response
+        return engine.get_engine().summarize_video(youtube_url, user_prompt)
@@ -0,0 +1,358 @@
+import email.utils
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import typing
+
+import requests
+from django.conf import settings
+
+from . import fetcher, metrics
+
+STATUS_FRESH = "fresh"
+STATUS_REVALIDATED = "revalidated"
+STATUS_FETCHED = "fetched"
+
+
+def parse_cache_control(value: str) -> typing.Dict[str, typing.Optional[str]]:
+    directives: typing.Dict[str, typing.Optional[str]] = {}
+
+    for directive in value.split(","):
+        name, _, argument = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+
+    return directives
+
+
+def parse_http_date(value: typing.Optional[str]) -> typing.Optional[float]:
+    if not value:
+        return None
+
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def is_storable(headers: typing.Mapping[str, str]) -> bool:
+    directives = parse_cache_control(headers.get("Cache-Control", ""))
+
+    return "no-store" not in directives and "private" not in directives
+
+
+def get_expires_at(headers: typing.Mapping[str, str], now: float) -> float:
+    directives = parse_cache_control(headers.get("Cache-Control", ""))
+
+    if "no-cache" in directives:
+        return now
+
+    for name in ("s-maxage", "max-age"):
+        try:
+            return now + max(0, int(directives[name] or ""))
+        except (KeyError, ValueError):
+            continue
+
+    expires = parse_http_date(headers.get("Expires"))
+    if expires is not None:
+        date = parse_http_date(headers.get("Date")) or now
+        return now + max(0.0, expires - date)
+
+    # No freshness information, revalidate on every request
+    return now
+
+
+class HTTPDiskCache:
+    def __init__(self, config: typing.Optional[typing.Dict[str, typing.Any]] = None):
+        config = config if config is not None else settings.SUMMARY_HTTP_CACHE
+
+        self.enabled: bool = config["ENABLED"]
+        self.cache_dir: str = config["DIR"] or os.path.join(
+            tempfile.gettempdir(), "summarizzler-http-cache"
+        )
+        self.max_bytes: int = config["MAX_BYTES"]
+        self.evict_every: int = config["EVICT_EVERY"]
+
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str, kind: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.{kind}.gz")
+
+    def _read(self, key: str, kind: str) -> typing.Optional[bytes]:
+        path = self._path(key, kind)
+
+        try:
+            with gzip.open(path, "rb") as cache_file:
+                data = cache_file.read()
+
+            os.utime(path)
+
+            return data
+
+        except (OSError, EOFError):
+            return None
+
+    def _write(self, key: str, kind: str, data: bytes) -> None:
+        path = self._path(key, kind)
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        try:
+            with gzip.open(temporary_path, "wb", compresslevel=6) as cache_file:
+                cache_file.write(data)
+
+            os.replace(temporary_path, path)
+
+        except OSError:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def get_entry(self, key: str) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        if (data := self._read(key, "meta")) is None:
+            return None
+
+        try:
+            return json.loads(data)
+        except ValueError:
+            return None
+
+    def set_entry(self, key: str, entry: typing.Dict[str, typing.Any]) -> None:
+        self._write(key, "meta", json.dumps(entry).encode("utf-8"))
+
+    def load_body(
+        self, key: str, document_type: str = fetcher.DOCUMENT_HTML
+    ) -> typing.Optional[typing.Union[str, bytes]]:
+        if (data := self._read(key, "body")) is None:
+            return None
+
+        if document_type == fetcher.DOCUMENT_PDF:
+            return data
+
+        return data.decode("utf-8", errors="replace")
+
+    def store(
+        self,
+        key: str,
+        url: str,
+        response: requests.Response,
+        document_type: str,
+        body: typing.Union[str, bytes],
+    ) -> None:
+        now = time.time()
+        self._write(
+            key, "body", body.encode("utf-8") if isinstance(body, str) else body
+        )
+        self.set_entry(
+            key,
+            {
+                "url": url,
+                "document_type": document_type,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "expires_at": get_expires_at(response.headers, now),
+                "stored_at": now,
+                "extractions": {},
+            },
+        )
+
+        with self._lock:
+            self._writes += 1
+            should_evict = self._writes % self.evict_every == 0
+
+        if should_evict:
+            self.evict()
+
+    def fetch(self, url: str) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        http_fetcher = fetcher.get_fetcher()
+
+        if not self.enabled:
+            try:
+                _, document_type, body = http_fetcher.get_document(url)
+            except requests.exceptions.RequestException:
+                return None
+
+            return {
+                "key": None,
+                "status": STATUS_FETCHED,
+                "document_type": document_type,
+                "body": body,
+            }
+
+        key = self.make_key(url)
+        entry = self.get_entry(key)
+        now = time.time()
+
+        if entry is not None and not os.path.exists(self._path(key, "body")):
+            entry = None
+
+        if entry is not None:
+            entry.setdefault("document_type", fetcher.DOCUMENT_HTML)
+
+        if entry is not None and entry["expires_at"] > now:
+            metrics.increment("http_cache.fresh")
+            return {
+                "key": key,
+                "status": STATUS_FRESH,
+                "document_type": entry["document_type"],
+                "body": None,
+                "entry": entry,
+            }
+
+        headers = {}
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            response, document_type, body = http_fetcher.get_document(
+                url, headers=headers
+            )
+        except requests.exceptions.RequestException:
+            return None
+
+        if response.status_code == 304 and entry is not None:
+            metrics.increment("http_cache.revalidated")
+            entry["expires_at"] = get_expires_at(response.headers, now)
+            self.set_entry(key, entry)
+
+            return {
+                "key": key,
+                "status": STATUS_REVALIDATED,
+                "document_type": entry["document_type"],
+                "body": None,
+                "entry": entry,
+            }
+
+        metrics.increment("http_cache.misses")
+
+        if not is_storable(response.headers):
+            key = None
+        else:
+            self.store(key, url, response, document_type, body)
+
+        return {
+            "key": key,
+            "status": STATUS_FETCHED,
+            "document_type": document_type,
+            "body": body,
+        }
+
+    def get_text(self, url: str) -> typing.Optional[str]:
+        if (fetched := self.fetch(url)) is None:
+            return None
+
+        # Callers of get_text parse HTML, binary documents have no text here
+        if fetched["document_type"] == fetcher.DOCUMENT_PDF:
+            return None
+
+        if fetched["body"] is not None:
+            return fetched["body"]
+
+        return self.load_body(fetched["key"], fetched["document_type"])
+
+    def get_extraction(
+        self, fetched: typing.Dict[str, typing.Any], variant: str
+    ) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        if fetched["status"] == STATUS_FETCHED:
+            return None
+
+        return fetched["entry"]["extractions"].get(variant)
+
+    def set_extraction(
+        self,
+        fetched: typing.Dict[str, typing.Any],
+        variant: str,
+        extraction: typing.Dict[str, typing.Any],
+    ) -> None:
+        if fetched["key"] is None:
+            return
+
+        if (entry := fetched.get("entry")) is None:
+            entry = self.get_entry(fetched["key"])
+
+        if entry is not None:
+            entry["extractions"][variant] = extraction
+            self.set_entry(fetched["key"], entry)
+
+    def evict(self) -> None:
+        files: typing.Dict[str, typing.List[typing.Tuple[str, float, int]]] = {}
+        total_bytes = 0
+
+        for entry in os.scandir(self.cache_dir):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+
+            files.setdefault(entry.name.split(".")[0], []).append(
+                (entry.path, stat.st_mtime, stat.st_size)
+            )
+            total_bytes += stat.st_size
+
+        if total_bytes <= self.max_bytes:
+            return
+
+        # Least recently used first, reads touch the files' modification time
+        keys = sorted(files, key=lambda key: max(mtime for _, mtime, _ in files[key]))
+
+        for key in keys:
+            if total_bytes <= self.max_bytes * 0.9:
+                break
+
+            for path, _, size in files[key]:
+                try:
+                    os.remove(path)
+                    total_bytes -= size
+                except OSError:
+                    continue
+
+            metrics.increment("http_cache.evictions")
+
+    def get_stats(self) -> typing.Dict[str, typing.Any]:
+        total_bytes = 0
+        entries = 0
+
+        for entry in os.scandir(self.cache_dir):
+            try:
+                total_bytes += entry.stat().st_size
+            except OSError:
+                continue
+
+            entries += entry.name.endswith(".meta.gz")
+
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "bytes": total_bytes,
+            "fresh": metrics.get("http_cache.fresh"),
+            "revalidated": metrics.get("http_cache.revalidated"),
+            "misses": metrics.get("http_cache.misses"),
+        }
+
+
+_cache: typing.Optional[HTTPDiskCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> HTTPDiskCache:
+    global _cache
+
+    if _cache is not None:
+        return _cache
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = HTTPDiskCache()
+
+    return _cache
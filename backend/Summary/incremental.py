@@ -0,0 +1,177 @@
+import datetime
+import difflib
+import json
+import threading
+import time
+import typing
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import cache, engine, metrics, models, singleflight
+
+_writes = 0
+_writes_lock = threading.Lock()
+
+
+def split_paragraphs(text: str) -> typing.List[str]:
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def diff_sections(
+    old_paragraphs: typing.List[str], new_paragraphs: typing.List[str]
+) -> typing.Tuple[typing.List[str], typing.List[str]]:
+    # A section is a run of consecutive paragraphs that differ between versions
+    matcher = difflib.SequenceMatcher(
+        a=old_paragraphs, b=new_paragraphs, autojunk=False
+    )
+    changed_sections: typing.List[str] = []
+    removed_sections: typing.List[str] = []
+
+    for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+
+        if new_end > new_start:
+            changed_sections.append("\n".join(new_paragraphs[new_start:new_end]))
+
+        if old_end > old_start:
+            removed_sections.append("\n".join(old_paragraphs[old_start:old_end]))
+
+    return changed_sections, removed_sections
+
+
+def evict_snapshots() -> int:
+    config = settings.SUMMARY_INCREMENTAL
+    expired_before = timezone.now() - datetime.timedelta(seconds=config["TTL"])
+    deleted, _ = models.PageSnapshot.objects.filter(
+        updated_at__lt=expired_before
+    ).delete()
+
+    overflow_keys = list(
+        models.PageSnapshot.objects.order_by("-updated_at").values_list(
+            "key", flat=True
+        )[config["MAX_SNAPSHOTS"] :]
+    )
+    if overflow_keys:
+        deleted += models.PageSnapshot.objects.filter(key__in=overflow_keys).delete()[0]
+
+    metrics.increment("incremental.evictions", deleted)
+
+    return deleted
+
+
+def save_snapshot(key: str, defaults: typing.Dict[str, typing.Any]) -> None:
+    global _writes
+
+    models.PageSnapshot.objects.update_or_create(key=key, defaults=defaults)
+
+    with _writes_lock:
+        _writes += 1
+        should_evict = _writes % settings.SUMMARY_INCREMENTAL["EVICT_EVERY"] == 0
+
+    if should_evict:
+        evict_snapshots()
+
+
+def summarize_page(
+    url: str,
+    content: str,
+    user_prompt: str,
+    on_token: typing.Optional[engine.TokenCallback] = None,
+    variant: str = "",
+) -> typing.Tuple[dict, typing.Dict[str, typing.Any]]:
+    summarization_engine = engine.get_engine()
+
+    if not settings.SUMMARY_INCREMENTAL["ENABLED"]:
+        response = summarization_engine.summarize(
+            content, user_prompt, on_token=on_token
+        )
+
+        return response, {"mode": "full"}
+
+    started_at = time.perf_counter()
+    cache_model = summarization_engine.cache_model_key(
+        summarization_engine.default_model
+    )
+    source = f"{variant}:{singleflight.normalize_url(url)}"
+    key = cache.make_key(source, user_prompt, cache_model)
+    snapshot = models.PageSnapshot.objects.filter(key=key).first()
+
+    report: typing.Dict[str, typing.Any] = {
+        "mode": "full",
+        "characters_total": len(content),
+        "characters_sent": len(content),
+    }
+
+    if snapshot is None:
+        response = summarization_engine.summarize(
+            content, user_prompt, on_token=on_token
+        )
+
+    else:
+        changed_sections, removed_sections = diff_sections(
+            split_paragraphs(snapshot.text), split_paragraphs(content)
+        )
+        changed_characters = sum(len(section) for section in changed_sections)
+        max_changed_characters = (
+            len(content) * settings.SUMMARY_INCREMENTAL["MAX_CHANGED_RATIO"]
+        )
+        report.update(
+            changed_sections=len(changed_sections),
+            removed_sections=len(removed_sections),
+        )
+
+        if not changed_sections and not removed_sections:
+            response = snapshot.response
+            report.update(mode="unchanged", characters_sent=0)
+
+            if on_token is not None:
+                on_token(response["content"])
+
+        elif changed_characters > max_changed_characters:
+            response = summarization_engine.summarize(
+                content, user_prompt, on_token=on_token
+            )
+
+        else:
+            chain = summarization_engine.get_chain("update")
+            response = summarization_engine.invoke_chain(
+                chain,
+                {
+                    "previous_summary": json.dumps(
+                        snapshot.response, ensure_ascii=False
+                    ),
+                    "changed_sections": json.dumps(
+                        changed_sections, ensure_ascii=False
+                    ),
+                    "removed_sections": json.dumps(
+                        removed_sections, ensure_ascii=False
+                    ),
+                    "user_prompt": user_prompt,
+                },
+                on_token,
+            )
+            response = engine.normalize_category(response, content)
+            report.update(mode="incremental", characters_sent=changed_characters)
+
+    if report["mode"] != "unchanged":
+        save_snapshot(
+            key,
+            {
+                "url": url,
+                "model": cache_model,
+                "text": content,
+                "response": response,
+            },
+        )
+
+    report["seconds"] = round(time.perf_counter() - started_at, 3)
+
+    metrics.increment(f"incremental.{report['mode']}")
+    metrics.increment(
+        "incremental.characters_saved",
+        report["characters_total"] - report["characters_sent"],
+    )
+
+    return response, report
@@ -0,0 +1,357 @@
+import contextlib
+import datetime
+import io
+import logging
+import threading
+import typing
+
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from . import crawl, functions, metrics, models, pipeline, uploads
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(
+    author: typing.Any, content_type: str, payload: typing.Dict[str, typing.Any]
+) -> models.SummaryJob:
+    job = models.SummaryJob.objects.create(
+        author=author, content_type=content_type, payload=payload
+    )
+    metrics.increment("jobs.enqueued")
+
+    if settings.SUMMARY_JOBS["AUTOSTART"]:
+        get_worker_pool().start()
+
+    get_worker_pool().wake()
+
+    return job
+
+
+def update_progress(job: models.SummaryJob, stage: str, progress: int) -> None:
+    job.stage = stage
+    job.progress = progress
+    # Progress doubles as the heartbeat that keeps a running job from being requeued
+    models.SummaryJob.objects.filter(id=job.id, attempts=job.attempts).update(
+        stage=stage, progress=progress, updated_at=timezone.now()
+    )
+
+
+def requeue_stale_jobs() -> int:
+    stale_before = timezone.now() - datetime.timedelta(
+        seconds=settings.SUMMARY_JOBS["TIMEOUT"]
+    )
+    stale_jobs = models.SummaryJob.objects.filter(
+        status=models.SummaryJob.STATUS_RUNNING,
+        updated_at__lt=stale_before,
+    )
+
+    # Jobs that timed out on their last attempt are failed instead of left running
+    exhausted_jobs = stale_jobs.filter(
+        attempts__gte=settings.SUMMARY_JOBS["MAX_ATTEMPTS"]
+    )
+    staged_paths = [
+        payload.get("path")
+        for payload in exhausted_jobs.values_list("payload", flat=True)
+    ]
+    failed = exhausted_jobs.update(
+        status=models.SummaryJob.STATUS_FAILED,
+        stage="failed",
+        error="Job timed out after the maximum number of attempts",
+        finished_at=timezone.now(),
+        updated_at=timezone.now(),
+    )
+    metrics.increment("jobs.failed", failed)
+
+    for path in staged_paths:
+        uploads.remove_staged(path)
+
+    return stale_jobs.filter(attempts__lt=settings.SUMMARY_JOBS["MAX_ATTEMPTS"]).update(
+        status=models.SummaryJob.STATUS_QUEUED, stage="requeued"
+    )
+
+
+def claim_job() -> typing.Optional[models.SummaryJob]:
+    with transaction.atomic():
+        job = (
+            models.SummaryJob.objects.select_for_update(skip_locked=True)
+            .filter(status=models.SummaryJob.STATUS_QUEUED)
+            .order_by("created_at")
+            .first()
+        )
+
+        if job is None:
+            return None
+
+        job.status = models.SummaryJob.STATUS_RUNNING
+        job.stage = "started"
+        job.progress = 0
+        job.attempts += 1
+        job.started_at = timezone.now()
+        job.save(
+            update_fields=[
+                "status",
+                "stage",
+                "progress",
+                "attempts",
+                "started_at",
+                "updated_at",
+            ]
+        )
+
+    return job
+
+
+@contextlib.contextmanager
+def open_job_file(job: models.SummaryJob) -> typing.Iterator[typing.Any]:
+    # Jobs queued before uploads were staged on disk carry the file in the row
+    if (path := job.payload.get("path")) is None:
+        yield io.BytesIO(bytes(job.file_data or b""))
+        return
+
+    try:
+        source = open(path, "rb")
+    except FileNotFoundError:
+        raise pipeline.PipelineError("The uploaded file is no longer available")
+
+    with source:
+        file = File(source, name=job.payload["file_name"])
+        file.sha256 = job.payload.get("sha256")  # type: ignore
+
+        yield file
+
+
+def run_pipeline(
+    job: models.SummaryJob, progress: pipeline.ProgressCallback
+) -> pipeline.PipelineResult:
+    payload = job.payload
+
+    match job.content_type:
+        case functions.Website.content_type if payload.get("crawl", False):
+            return crawl.summarize_site(
+                payload["url"],
+                payload["prompt"],
+                payload.get("depth", None),
+                payload.get("pages", None),
+                payload.get("extraction", None),
+                progress=progress,
+            )
+        case functions.Website.content_type:
+            return pipeline.summarize_website(
+                payload["url"],
+                payload["prompt"],
+                progress=progress,
+                extraction_mode=payload.get("extraction", None),
+            )
+        case functions.Text.content_type:
+            return pipeline.summarize_text(
+                payload["text"],
+                payload["prompt"],
+                chunked=payload.get("chunked", None),
+                progress=progress,
+            )
+        case functions.File.content_type:
+            with open_job_file(job) as file:
+                return pipeline.summarize_file(
+                    payload["file_name"],
+                    file,
+                    payload["prompt"],
+                    chunked=payload.get("chunked", None),
+                    progress=progress,
+                    pages=payload.get("pages", None),
+                )
+        case functions.Video.content_type:
+            return pipeline.summarize_video(
+                payload["url"], payload["prompt"], progress=progress
+            )
+        case _:
+            raise pipeline.PipelineError(f"Unknown content type: {job.content_type}")
+
+
+def finish_job(job: models.SummaryJob) -> bool:
+    job.finished_at = timezone.now()
+
+    # A job requeued after a lost heartbeat belongs to its newer attempt
+    finished = models.SummaryJob.objects.filter(
+        id=job.id,
+        status=models.SummaryJob.STATUS_RUNNING,
+        attempts=job.attempts,
+    ).update(
+        summary=job.summary,
+        status=job.status,
+        stage=job.stage,
+        progress=job.progress,
+        error=job.error,
+        file_data=job.file_data,
+        finished_at=job.finished_at,
+        updated_at=job.finished_at,
+    )
+
+    if finished:
+        uploads.remove_staged(job.payload.get("path"))
+    else:
+        metrics.increment("jobs.superseded")
+
+    return bool(finished)
+
+
+def run_job(job: models.SummaryJob) -> models.SummaryJob:
+    def progress(stage: str, value: int) -> None:
+        update_progress(job, stage, value)
+
+    try:
+        data, _ = run_pipeline(job, progress)
+
+        progress("saving", 90)
+        data["author"] = job.author
+        data["is_private"] = job.payload.get("private", False)
+
+        with transaction.atomic():
+            if (summary := functions.create_summary(data)) is None:
+                raise pipeline.PipelineError("Failed to create summary")
+
+            job.summary = summary
+            job.status = models.SummaryJob.STATUS_DONE
+            job.stage = "done"
+            job.progress = 100
+            job.file_data = None
+
+            # The summary is only kept when this attempt still owns the job
+            if finish_job(job):
+                metrics.increment("jobs.done")
+            else:
+                transaction.set_rollback(True)
+
+    except Exception as e:
+        logger.exception("Summary job %s failed", job.id)
+        job.summary = None
+        job.status = models.SummaryJob.STATUS_FAILED
+        job.stage = "failed"
+        job.error = e.message if isinstance(e, pipeline.PipelineError) else str(e)
+
+        if finish_job(job):
+            metrics.increment("jobs.failed")
+
+    if job.started_at is not None:
+        metrics.observe(
+            "jobs.seconds", (job.finished_at - job.started_at).total_seconds()
+        )
+
+    return job
+
+
+class WorkerPool:
+    def __init__(self, workers: int, poll_interval: float):
+        self.workers = workers
+        self.poll_interval = poll_interval
+
+        self._lock = threading.Lock()
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._threads: typing.List[threading.Thread] = []
+
+    @property
+    def running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self) -> None:
+        with self._lock:
+            if self.running:
+                return
+
+            self._stop_event.clear()
+            self._threads = [
+                threading.Thread(
+                    target=self._work,
+                    name=f"summary-worker-{index}",
+                    daemon=True,
+                )
+                for index in range(self.workers)
+            ]
+
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout: typing.Optional[float] = None) -> None:
+        self._stop_event.set()
+        self._wake_event.set()
+
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def wake(self) -> None:
+        self._wake_event.set()
+
+    def join(self) -> None:
+        for thread in self._threads:
+            thread.join()
+
+    def _work(self) -> None:
+        try:
+            while not self._stop_event.is_set():
+                close_old_connections()
+
+                try:
+                    requeue_stale_jobs()
+                    job = claim_job()
+                except Exception:
+                    logger.exception("Failed to claim summary job")
+                    job = None
+
+                if job is None:
+                    self._wake_event.wait(self.poll_interval)
+                    self._wake_event.clear()
+                    continue
+
+                run_job(job)
+
+        finally:
+            connection.close()
+
+
+_worker_pool: typing.Optional[WorkerPool] = None
+_worker_pool_lock = threading.Lock()
+
+
+def get_worker_pool() -> WorkerPool:
+    global _worker_pool
+
+    if _worker_pool is not None:
+        return _worker_pool
+
+    with _worker_pool_lock:
+        if _worker_pool is None:
+            _worker_pool = WorkerPool(
+                workers=settings.SUMMARY_JOBS["WORKERS"],
+                poll_interval=settings.SUMMARY_JOBS["POLL_INTERVAL"],
+            )
+
+    return _worker_pool
+
+
+def autostart() -> None:
+    # Called by the ASGI and WSGI entrypoints only, so management commands, test
+    # runners and shells never start workers on their own
+    if settings.SUMMARY_JOBS["AUTOSTART"]:
+        get_worker_pool().start()
+
+
+def get_stats() -> typing.Dict[str, typing.Any]:
+    counts = {
+        status: models.SummaryJob.objects.filter(status=status).count()
+        for status in (
+            models.SummaryJob.STATUS_QUEUED,
+            models.SummaryJob.STATUS_RUNNING,
+        )
+    }
+
+    return {
+        "queued": counts[models.SummaryJob.STATUS_QUEUED],
+        "running": counts[models.SummaryJob.STATUS_RUNNING],
+        "done": metrics.get("jobs.done"),
+        "failed": metrics.get("jobs.failed"),
+        "workers_running": get_worker_pool().running,
+    }
@@ -0,0 +1,666 @@
+import concurrent.futures
+import http.server
+import io
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+import typing
+import zlib
+
+from bs4 import BeautifulSoup
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from PyPDF2 import PdfReader
+
+import Users.functions as users_functions
+from Summary import (
+    classifier,
+    crawl,
+    engine,
+    extraction,
+    models,
+    parsing,
+    pdf,
+    scheduler,
+)
+
+
+def percentile(values: typing.List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+
+    return ordered[index]
+
+
+def synthetic_pdf(pages: int, lines: int = 40) -> bytes:
+    font = b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+    objects: typing.List[bytes] = [b"<< /Type /Catalog /Pages 2 0 R >>", b"", font]
+    kids = []
+
+    for page in range(pages):
+        text = "".join(
+            f"(Page {page} line {line} of the benchmark document, with some text.) "
+            "Tj 0 -14 Td "
+            for line in range(lines)
+        )
+        stream = zlib.compress(f"BT /F1 10 Tf 50 780 Td {text} ET".encode("ascii"))
+        objects.append(
+            b"<< /Length %d /Filter /FlateDecode >>stream\n" % len(stream)
+            + stream
+            + b"\nendstream"
+        )
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects)
+        )
+        kids.append(b"%d 0 R" % len(objects))
+
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), pages)
+
+    document = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(document))
+        document += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+
+    xref_offset = len(document)
+    document += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    document += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    document += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref_offset,
+    )
+
+    return bytes(document)
+
+
+class Command(BaseCommand):
+    help = "Benchmark parts of the summarization pipeline"
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest="scenario", required=True)
+
+        requests_parser = subparsers.add_parser(
+            "requests", help="Load-test the text endpoint through the Django stack"
+        )
+        requests_parser.add_argument("--username", required=True)
+        requests_parser.add_argument("--password", required=True)
+        requests_parser.add_argument("--requests", type=int, default=100)
+        requests_parser.add_argument("--concurrency", type=int, default=10)
+        requests_parser.add_argument(
+            "--repeat",
+            action="store_true",
+            help="Send identical texts so repeated requests hit the summary cache",
+        )
+        requests_parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the summaries created during the run",
+        )
+
+        batch_parser = subparsers.add_parser(
+            "batch", help="Compare one batch request against sequential requests"
+        )
+        batch_parser.add_argument("--username", required=True)
+        batch_parser.add_argument("--password", required=True)
+        batch_parser.add_argument("--items", type=int, default=50)
+        batch_parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the summaries created during the run",
+        )
+
+        classifier_parser = subparsers.add_parser(
+            "classifier",
+            help="Measure the local category and tag classifier on stored summaries",
+        )
+        classifier_parser.add_argument("--limit", type=int, default=2000)
+        classifier_parser.add_argument(
+            "--test-fraction",
+            type=float,
+            default=0.2,
+            help="Fraction of summaries held out for evaluation",
+        )
+        classifier_parser.add_argument(
+            "--llm-samples",
+            type=int,
+            default=20,
+            help="Held-out summaries sent to the configured LLM, 0 skips the LLM",
+        )
+
+        extraction_parser = subparsers.add_parser(
+            "extraction",
+            help="Compare single-parse HTML extraction against the three-pass path",
+        )
+        extraction_parser.add_argument(
+            "--file", help="HTML file to parse, a synthetic page is used otherwise"
+        )
+        extraction_parser.add_argument(
+            "--size-kb", type=int, default=2048, help="Size of the synthetic page"
+        )
+        extraction_parser.add_argument("--repeat", type=int, default=5)
+
+        crawl_parser = subparsers.add_parser(
+            "crawl",
+            help="Crawl a site, a local synthetic site is served when no url is given",
+        )
+        crawl_parser.add_argument("--url")
+        crawl_parser.add_argument("--depth", type=int, default=2)
+        crawl_parser.add_argument("--pages", type=int, default=50)
+        crawl_parser.add_argument(
+            "--site-pages", type=int, default=60, help="Size of the synthetic site"
+        )
+        crawl_parser.add_argument(
+            "--latency", type=float, default=0.05, help="Synthetic server latency"
+        )
+
+        pdf_parser = subparsers.add_parser(
+            "pdf",
+            help="Compare streaming PDF extraction against the in-memory path",
+        )
+        pdf_parser.add_argument(
+            "--file", help="PDF file to extract, a synthetic document is used otherwise"
+        )
+        pdf_parser.add_argument(
+            "--pages", type=int, default=500, help="Pages of the synthetic document"
+        )
+
+        parallel_pdf_parser = subparsers.add_parser(
+            "pdf-parallel",
+            help="Compare process pool PDF extraction against one process",
+        )
+        parallel_pdf_parser.add_argument(
+            "--pages",
+            default="25,50,100,300,500",
+            help="Comma separated page counts of the synthetic documents",
+        )
+        parallel_pdf_parser.add_argument(
+            "--workers", type=int, default=settings.SUMMARY_PDF["WORKERS"]
+        )
+
+    def handle(self, *args, **options):
+        scenario = options["scenario"].replace("-", "_")
+        getattr(self, f"benchmark_{scenario}")(options)
+
+    def report(self, title: str, rows: typing.Dict[str, typing.Any]) -> None:
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+
+        for name, value in rows.items():
+            if isinstance(value, float):
+                value = f"{value:.4f}"
+
+            self.stdout.write(f"  {name:<28} {value}")
+
+    def get_auth_headers(self, options) -> typing.Dict[str, str]:
+        if settings.SUMMARY_LLM["BACKEND"] != "local":
+            self.stderr.write(
+                self.style.WARNING(
+                    "SUMMARY_LLM_BACKEND is not 'local', requests will call the real model"
+                )
+            )
+
+        tokens = users_functions.get_jwt_token(options["username"], options["password"])
+        if tokens is None:
+            raise CommandError("Failed to get a token for the given credentials")
+
+        return {"HTTP_AUTHORIZATION": f"Bearer {tokens['access']}"}
+
+    def benchmark_requests(self, options):
+        headers = self.get_auth_headers(options)
+
+        def send(index: int) -> typing.Tuple[int, float, typing.Optional[str]]:
+            text_id = 0 if options["repeat"] else index
+            data = {
+                "text": f"Benchmark document {text_id}. " * 200,
+                "prompt": "Summarize the document",
+                "private": True,
+            }
+
+            started_at = time.perf_counter()
+            response = Client().post("/summary/text/", data, **headers)
+            elapsed = time.perf_counter() - started_at
+
+            summary_id = None
+            if response.status_code == 200:
+                summary_id = response.json()["id"]
+
+            return response.status_code, elapsed, summary_id
+
+        started_at = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=options["concurrency"]
+        ) as executor:
+            results = list(executor.map(send, range(options["requests"])))
+        total_seconds = time.perf_counter() - started_at
+
+        latencies = [elapsed for _, elapsed, _ in results]
+        failures = sum(1 for status_code, _, _ in results if status_code != 200)
+
+        self.report(
+            "Text endpoint",
+            {
+                "backend": settings.SUMMARY_LLM["BACKEND"],
+                "requests": len(results),
+                "failures": failures,
+                "concurrency": options["concurrency"],
+                "total seconds": total_seconds,
+                "requests per second": len(results) / total_seconds,
+                "latency mean": statistics.mean(latencies),
+                "latency p50": percentile(latencies, 50),
+                "latency p95": percentile(latencies, 95),
+                "latency p99": percentile(latencies, 99),
+            },
+        )
+
+        if not options["keep"]:
+            summary_ids = [summary_id for _, _, summary_id in results if summary_id]
+            models.Summary.objects.filter(id__in=summary_ids).delete()
+
+    def benchmark_batch(self, options):
+        headers = self.get_auth_headers(options)
+        run_id = time.time_ns()
+        items = [
+            {
+                "type": "text",
+                "text": f"Batch benchmark {run_id} document {index}. " * 200,
+                "prompt": "Summarize the document",
+            }
+            for index in range(options["items"])
+        ]
+
+        started_at = time.perf_counter()
+        response = Client().post(
+            "/summary/batch/",
+            {"items": items, "private": True},
+            content_type="application/json",
+            **headers,
+        )
+        batch_seconds = time.perf_counter() - started_at
+
+        if response.status_code != 200:
+            raise CommandError(f"Batch request failed: {response.content!r}")
+
+        results = response.json()["results"]
+        summary_ids = [result["id"] for result in results if result["status"] == "ok"]
+
+        started_at = time.perf_counter()
+        for item in items[:5]:
+            item_data = {"text": f"Sequential {item['text']}", "prompt": item["prompt"]}
+            sequential_response = Client().post("/summary/text/", item_data, **headers)
+
+            if sequential_response.status_code == 200:
+                summary_ids.append(sequential_response.json()["id"])
+
+        sequential_item_seconds = (time.perf_counter() - started_at) / min(
+            len(items), 5
+        )
+
+        self.report(
+            "Batch endpoint",
+            {
+                "backend": settings.SUMMARY_LLM["BACKEND"],
+                "items": len(items),
+                "succeeded": response.json()["succeeded"],
+                "max workers": settings.SUMMARY_BATCH["MAX_WORKERS"],
+                "batch seconds": batch_seconds,
+                "sequential seconds per item": sequential_item_seconds,
+                "estimated sequential seconds": sequential_item_seconds * len(items),
+                "speedup": sequential_item_seconds * len(items) / batch_seconds,
+            },
+        )
+
+        if not options["keep"]:
+            models.Summary.objects.filter(id__in=summary_ids).delete()
+
+    def benchmark_classifier(self, options):
+        summaries = list(
+            models.Summary.objects.exclude(category="").order_by("-created_at")[
+                : options["limit"]
+            ]
+        )
+        documents = list(classifier.summary_documents(summaries))
+        test_size = int(len(documents) * options["test_fraction"])
+
+        if test_size < 1 or len(documents) - test_size < 1:
+            raise CommandError("Not enough summaries to train and evaluate")
+
+        test_documents, train_documents = documents[:test_size], documents[test_size:]
+
+        started_at = time.perf_counter()
+        local_classifier = classifier.Classifier(classifier.train(train_documents))
+        train_seconds = time.perf_counter() - started_at
+
+        correct_categories = 0
+        tag_overlaps: typing.List[float] = []
+        latencies: typing.List[float] = []
+
+        for text, category, tags in test_documents:
+            started_at = time.perf_counter()
+            prediction = local_classifier.predict(text)
+            latencies.append(time.perf_counter() - started_at)
+
+            correct_categories += prediction["category"] == category
+
+            if tags:
+                expected_tags = {tag.lower() for tag in tags}
+                tag_overlaps.append(
+                    len(expected_tags & set(prediction["tags"])) / len(expected_tags)
+                )
+
+        llm_rows = self.compare_with_llm(
+            summaries[: min(test_size, options["llm_samples"])], local_classifier
+        )
+
+        self.report(
+            "Local classifier",
+            {
+                "train documents": len(train_documents),
+                "test documents": len(test_documents),
+                "train seconds": train_seconds,
+                "category accuracy": correct_categories / len(test_documents),
+                "tag recall": statistics.mean(tag_overlaps) if tag_overlaps else 0.0,
+                "predict latency mean": statistics.mean(latencies),
+                "predict latency p95": percentile(latencies, 95),
+                **llm_rows,
+            },
+        )
+
+    def compare_with_llm(
+        self,
+        summaries: typing.List[models.Summary],
+        local_classifier: classifier.Classifier,
+    ) -> typing.Dict[str, typing.Any]:
+        if not summaries:
+            return {}
+
+        summarization_engine = engine.get_engine()
+        model = summarization_engine.get_model()
+
+        def output_tokens(prompt_name: str, content: str) -> typing.Tuple[int, str]:
+            chain = summarization_engine.prompts[prompt_name] | model
+            message = scheduler.get_scheduler().run(
+                lambda: chain.invoke(
+                    {"dom_content": content, "user_prompt": "Summarize the content"}
+                )
+            )
+            text = str(message.content)
+            usage = getattr(message, "usage_metadata", None) or {}
+
+            # Providers that don't report usage are estimated like the rest of
+            # the engine, at four characters per token
+            return usage.get("output_tokens") or len(text) // 4, text
+
+        agreements = 0
+        stored_agreements = 0
+        full_tokens: typing.List[int] = []
+        prepass_tokens: typing.List[int] = []
+
+        for summary in summaries:
+            content = summary.raw_text[:20_000]
+
+            tokens, text = output_tokens("summary", content)
+            full_tokens.append(tokens)
+            prepass_tokens.append(output_tokens("content", content)[0])
+
+            response = parsing.parse_bot_response(text) or {}
+            llm_category = engine.match_category(response.get("category"))
+            predicted_category, _ = local_classifier.predict_category(content)
+
+            agreements += llm_category == predicted_category
+            stored_agreements += llm_category == summary.category
+
+        return {
+            "llm samples": len(summaries),
+            "llm vs classifier category": agreements / len(summaries),
+            "llm vs stored category": stored_agreements / len(summaries),
+            "full output tokens mean": statistics.mean(full_tokens),
+            "prepass output tokens mean": statistics.mean(prepass_tokens),
+            "output tokens saved per doc": statistics.mean(full_tokens)
+            - statistics.mean(prepass_tokens),
+        }
+
+    def benchmark_extraction(self, options):
+        if options["file"]:
+            with open(options["file"], encoding="utf-8", errors="replace") as html_file:
+                dom_content = html_file.read()
+        else:
+            section = (
+                "<div class='post'><h2>Section heading</h2>"
+                "<p>Paragraph with <a href='#'>a link</a> and <strong>bold</strong> "
+                "text describing the benchmark page in some detail.</p>"
+                "<script>var tracking = {id: 1};</script><ul><li>One</li><li>Two</li></ul>"
+                "</div>\n"
+            )
+            sections = options["size_kb"] * 1024 // len(section) + 1
+            dom_content = (
+                "<html lang='en'><head><title>Benchmark page</title>"
+                "<meta name='description' content='Synthetic page'></head>"
+                f"<body>{section * sections}</body></html>"
+            )
+
+        # The previous extraction parsed the page once each for the body, the
+        # title and the cleanup
+        def three_pass() -> str:
+            body = BeautifulSoup(dom_content, "html.parser").body
+            BeautifulSoup(dom_content, "html.parser").title
+
+            soup = BeautifulSoup(str(body or ""), "html.parser")
+            for script_or_style in soup(["script", "style"]):
+                script_or_style.extract()
+
+            return "\n".join(
+                line.strip()
+                for line in soup.get_text(separator="\n").splitlines()
+                if line.strip()
+            )
+
+        def single_pass() -> str:
+            page = extraction.extract(dom_content)
+
+            return page["text"] if page is not None else ""
+
+        timings: typing.Dict[str, typing.List[float]] = {}
+        outputs: typing.Dict[str, str] = {}
+
+        for name, function in (
+            ("three pass", three_pass),
+            ("single pass", single_pass),
+        ):
+            timings[name] = []
+
+            for _ in range(options["repeat"]):
+                started_at = time.perf_counter()
+                outputs[name] = function()
+                timings[name].append(time.perf_counter() - started_at)
+
+        three_pass_seconds = statistics.median(timings["three pass"])
+        single_pass_seconds = statistics.median(timings["single pass"])
+
+        self.report(
+            "HTML extraction",
+            {
+                "page kilobytes": len(dom_content) // 1024,
+                "parser": extraction.get_parser(),
+                "three pass median seconds": three_pass_seconds,
+                "single pass median seconds": single_pass_seconds,
+                "speedup": three_pass_seconds / single_pass_seconds,
+                "same text": outputs["three pass"] == outputs["single pass"],
+            },
+        )
+
+    def serve_synthetic_site(
+        self, pages: int, latency: float
+    ) -> http.server.ThreadingHTTPServer:
+        class SiteHandler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                time.sleep(latency)
+                page = self.path.strip("/").removeprefix("page-") or "0"
+
+                if not page.isdigit() or int(page) >= pages:
+                    self.send_error(404)
+                    return
+
+                index = int(page)
+                links = "".join(
+                    f"<li><a href='/page-{link}'>Page {link}</a></li>"
+                    for link in (index * 3 + 1, index * 3 + 2, index * 3 + 3)
+                    if link < pages
+                )
+                body = (
+                    f"<html><head><title>Page {index}</title></head><body>"
+                    f"<nav><ul>{links}</ul></nav><article><h1>Page {index}</h1>"
+                    + f"<p>Synthetic crawl page {index}, paragraph text.</p>" * 20
+                    + "</article></body></html>"
+                ).encode("utf-8")
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), SiteHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        return server
+
+    def benchmark_crawl(self, options):
+        server = None
+        url = options["url"]
+
+        if url is None:
+            server = self.serve_synthetic_site(
+                options["site_pages"], options["latency"]
+            )
+            url = f"http://127.0.0.1:{server.server_port}/"
+
+        try:
+            crawler = crawl.Crawler(
+                url, options["depth"], options["pages"], extraction.EXTRACTION_MAIN
+            )
+            pages, report = crawler.crawl()
+        finally:
+            if server is not None:
+                server.shutdown()
+
+        page_seconds = [page["seconds"] for page in pages]
+
+        self.report(
+            "Site crawl",
+            {
+                "url": url,
+                "pages": report["pages"],
+                "failed pages": report["failed_pages"],
+                "depth reached": report["depth"],
+                "discovered urls": report["discovered_urls"],
+                "total seconds": report["seconds"],
+                "pages per second": report["pages"] / max(report["seconds"], 1e-9),
+                "page fetch mean": statistics.mean(page_seconds) if pages else 0.0,
+                "page fetch p95": percentile(page_seconds, 95),
+                "workers": settings.SUMMARY_CRAWL["MAX_WORKERS"],
+                "per host concurrency": settings.SUMMARY_CRAWL["PER_HOST_CONCURRENCY"],
+            },
+        )
+
+    def benchmark_pdf(self, options):
+        if options["file"]:
+            with open(options["file"], "rb") as pdf_file:
+                data = pdf_file.read()
+        else:
+            data = synthetic_pdf(options["pages"])
+
+        def in_memory(file: typing.IO[bytes]) -> str:
+            text = ""
+            for page in PdfReader(io.BytesIO(file.read())).pages:
+                text += page.extract_text()
+
+            return text.strip()
+
+        def streaming(file: typing.IO[bytes]) -> str:
+            return pdf.extract_text(file)[0]
+
+        rows: typing.Dict[str, typing.Any] = {"file bytes": len(data)}
+        outputs: typing.Dict[str, str] = {}
+
+        with tempfile.TemporaryFile() as spooled_file:
+            spooled_file.write(data)
+
+            for name, function in (("in memory", in_memory), ("streaming", streaming)):
+                # Timed without tracemalloc, its hooks slow extraction down a lot
+                spooled_file.seek(0)
+                started_at = time.perf_counter()
+                outputs[name] = function(spooled_file)
+                rows[f"{name} seconds"] = time.perf_counter() - started_at
+
+                spooled_file.seek(0)
+                tracemalloc.start()
+                function(spooled_file)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+                rows[f"{name} peak bytes"] = peak
+                rows[f"{name} peak / file size"] = peak / len(data)
+
+        rows["pages"] = len(PdfReader(io.BytesIO(data)).pages)
+        rows["text characters"] = len(outputs["streaming"])
+        rows["streaming peak / text size"] = rows["streaming peak bytes"] / max(
+            len(outputs["streaming"]), 1
+        )
+        rows["same text"] = outputs["in memory"] == outputs["streaming"]
+
+        self.report("PDF extraction", rows)
+
+    def benchmark_pdf_parallel(self, options):
+        workers = options["workers"]
+        if workers < 2:
+            raise CommandError("Parallel extraction needs at least 2 workers")
+
+        # Start the pool processes and import the extraction code in them
+        # outside the timings
+        with tempfile.NamedTemporaryFile(suffix=".pdf") as warm_up_file:
+            warm_up_pages = workers * 2 * settings.SUMMARY_PDF["MIN_PAGES_PER_TASK"]
+            warm_up_file.write(synthetic_pdf(warm_up_pages))
+            warm_up_file.flush()
+            pdf.extract_parallel(warm_up_file, warm_up_file, warm_up_pages, workers)
+
+        for pages in [int(count) for count in options["pages"].split(",")]:
+            with tempfile.NamedTemporaryFile(suffix=".pdf") as pdf_file:
+                pdf_file.write(synthetic_pdf(pages))
+                pdf_file.flush()
+
+                started_at = time.perf_counter()
+                sequential = "".join(pdf.iter_page_texts(PdfReader(pdf_file.name)))
+                sequential_seconds = time.perf_counter() - started_at
+
+                started_at = time.perf_counter()
+                parallel = "".join(
+                    pdf.extract_parallel(pdf_file, pdf_file, pages, workers) or []
+                )
+                parallel_seconds = time.perf_counter() - started_at
+
+            ranges = pdf.get_page_ranges(
+                pages, workers, settings.SUMMARY_PDF["MIN_PAGES_PER_TASK"]
+            )
+
+            self.report(
+                f"PDF extraction, {pages} pages",
+                {
+                    "workers": workers,
+                    "page ranges": len(ranges),
+                    "one process seconds": sequential_seconds,
+                    "process pool seconds": parallel_seconds,
+                    "speedup": sequential_seconds / parallel_seconds,
+                    "same text": sequential == parallel,
+                },
+            )
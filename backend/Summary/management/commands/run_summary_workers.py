@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from Summary import jobs
+
+
+class Command(BaseCommand):
+    help = "Run background workers processing queued summary jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.SUMMARY_JOBS["WORKERS"],
+            help="Number of worker threads",
+        )
+
+    def handle(self, *args, **options):
+        pool = jobs.WorkerPool(
+            workers=options["workers"],
+            poll_interval=settings.SUMMARY_JOBS["POLL_INTERVAL"],
+        )
+        pool.start()
+
+        self.stdout.write(f"Started {options['workers']} summary workers")
+
+        try:
+            pool.join()
+        except KeyboardInterrupt:
+            pool.stop(timeout=5)
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from Summary import classifier, models
+
+
+class Command(BaseCommand):
+    help = "Train the local category and tag classifier from stored summaries"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default=settings.SUMMARY_CLASSIFIER["MODEL_PATH"],
+            help="Path of the model file to write",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="Only use the most recent summaries",
+        )
+        parser.add_argument("--min-tag-count", type=int, default=3)
+
+    def handle(self, *args, **options):
+        summaries = models.Summary.objects.exclude(category="").order_by("-created_at")
+        if options["limit"]:
+            summaries = summaries[: options["limit"]]
+
+        model = classifier.train(
+            classifier.summary_documents(summaries.iterator()),
+            min_tag_count=options["min_tag_count"],
+        )
+
+        if not model["documents"]:
+            raise CommandError("No summaries to train on")
+
+        classifier.save_model(model, options["output"])
+
+        self.stdout.write(
+            f"Trained on {model['documents']} summaries: "
+            f"{len(model['categories'])} categories, {len(model['tags'])} tags "
+            f"-> {options['output']}"
+        )
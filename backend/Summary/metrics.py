@@ -0,0 +1,55 @@
+import threading
+import typing
+
+_lock = threading.Lock()
+_counters: typing.Dict[str, float] = {}
+_timings: typing.Dict[str, typing.Dict[str, float]] = {}
+
+
+def increment(name: str, value: float = 1) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def observe(name: str, value: float) -> None:
+    with _lock:
+        timing = _timings.setdefault(
+            name, {"count": 0, "total": 0.0, "max": 0.0, "last": 0.0}
+        )
+        timing["count"] += 1
+        timing["total"] += value
+        timing["max"] = max(timing["max"], value)
+        timing["last"] = value
+
+
+def get(name: str) -> float:
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def ratio(numerator: str, denominator: str) -> typing.Optional[float]:
+    with _lock:
+        total = _counters.get(denominator, 0)
+        if not total:
+            return None
+
+        return _counters.get(numerator, 0) / total
+
+
+def snapshot() -> typing.Dict[str, typing.Any]:
+    with _lock:
+        timings = {
+            name: {
+                **timing,
+                "avg": timing["total"] / timing["count"] if timing["count"] else 0.0,
+            }
+            for name, timing in _timings.items()
+        }
+
+        return {"counters": dict(_counters), "timings": timings}
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _timings.clear()
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Summary', '0012_remove_summary_dislikes_remove_summary_favorites_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CachedResponse',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('model', models.CharField(default='', max_length=50)),
+                ('response', models.JSONField(default=dict)),
+                ('size', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True, blank=True)),
+                ('last_accessed_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:30
+
+import Summary.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Summary', '0013_cachedresponse'),
+        ('Users', '0002_userdata_dislikes_userdata_likes_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SummaryJob',
+            fields=[
+                ('id', models.BigIntegerField(default=Summary.models.generate_uuid, editable=False, primary_key=True, serialize=False)),
+                ('content_type', models.CharField(default='', max_length=10)),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(db_index=True, default='queued', max_length=10)),
+                ('file_data', models.BinaryField(blank=True, null=True)),
+                ('stage', models.CharField(blank=True, default='', max_length=30)),
+                ('progress', models.IntegerField(default=0)),
+                ('attempts', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True, blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, blank=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summary_jobs', to='Users.userdata')),
+                ('summary', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='Summary.summary')),
+            ],
+        ),
+    ]
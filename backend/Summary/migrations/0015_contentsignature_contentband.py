@@ -0,0 +1,32 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Summary', '0014_summaryjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentSignature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(default='', max_length=50)),
+                ('signature', models.BinaryField()),
+                ('response', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True, blank=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ContentBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField(db_index=True)),
+                ('signature', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bands', to='Summary.contentsignature')),
+            ],
+        ),
+    ]
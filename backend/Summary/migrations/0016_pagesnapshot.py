@@ -0,0 +1,24 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Summary', '0015_contentsignature_contentband'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageSnapshot',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('url', models.TextField(db_index=True, default='')),
+                ('model', models.CharField(default='', max_length=50)),
+                ('text', models.TextField(default='')),
+                ('response', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True, blank=True)),
+            ],
+        ),
+    ]
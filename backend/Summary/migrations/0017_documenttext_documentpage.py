@@ -0,0 +1,37 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Summary', '0016_pagesnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentText',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('title', models.TextField(blank=True, default='')),
+                ('pages', models.IntegerField(default=0)),
+                ('size', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True, blank=True)),
+                ('last_accessed_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DocumentPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.IntegerField()),
+                ('text', models.TextField(default='')),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='page_texts', to='Summary.documenttext')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('document', 'number'), name='unique_document_page')],
+            },
+        ),
+    ]
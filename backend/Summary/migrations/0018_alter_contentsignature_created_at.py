@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Summary', '0017_documenttext_documentpage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contentsignature',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, blank=True, db_index=True),
+        ),
+    ]
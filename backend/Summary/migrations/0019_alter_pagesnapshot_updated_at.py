@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Summary', '0018_alter_contentsignature_created_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pagesnapshot',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, blank=True, db_index=True),
+        ),
+    ]
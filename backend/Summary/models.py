@@ -53,3 +53,129 @@ class Summary(models.Model):
 
     def __str__(self):
         return self.title
+
+
+class CachedResponse(models.Model):
+    key = models.CharField(max_length=64, primary_key=True)
+    model = models.CharField(max_length=50, default="")
+    response = models.JSONField(default=dict)
+    size = models.IntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True, blank=True)
+    last_accessed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.key
+
+
+class ContentSignature(models.Model):
+    model = models.CharField(max_length=50, default="")
+    signature = models.BinaryField()
+    response = models.JSONField(default=dict)
+
+    created_at = models.DateTimeField(auto_now_add=True, blank=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.model} signature {self.id}"
+
+
+class ContentBand(models.Model):
+    key = models.BigIntegerField(db_index=True)
+    signature = models.ForeignKey(
+        ContentSignature,
+        on_delete=models.CASCADE,
+        related_name="bands",
+    )
+
+    def __str__(self):
+        return str(self.key)
+
+
+class PageSnapshot(models.Model):
+    key = models.CharField(max_length=64, primary_key=True)
+    url = models.TextField(default="", db_index=True)
+    model = models.CharField(max_length=50, default="")
+    text = models.TextField(default="")
+    response = models.JSONField(default=dict)
+
+    updated_at = models.DateTimeField(auto_now=True, blank=True, db_index=True)
+
+    def __str__(self):
+        return self.url
+
+
+class DocumentText(models.Model):
+    key = models.CharField(max_length=64, primary_key=True)
+    title = models.TextField(blank=True, default="")
+    pages = models.IntegerField(default=0)
+    size = models.IntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True, blank=True)
+    last_accessed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.key
+
+
+class DocumentPage(models.Model):
+    document = models.ForeignKey(
+        DocumentText,
+        on_delete=models.CASCADE,
+        related_name="page_texts",
+    )
+    number = models.IntegerField()
+    text = models.TextField(default="")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["document", "number"], name="unique_document_page"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.document_id} page {self.number}"
+
+
+class SummaryJob(models.Model):
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+
+    # pk
+    id = models.BigIntegerField(primary_key=True, default=generate_uuid, editable=False)
+    # required
+    author = models.ForeignKey(
+        "Users.UserData",
+        on_delete=models.CASCADE,
+        related_name="summary_jobs",
+    )
+    content_type = models.CharField(max_length=10, default="")
+    payload = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=10, default=STATUS_QUEUED, db_index=True
+    )  # queued, running, done, failed
+
+    # not required
+    file_data = models.BinaryField(null=True, blank=True)
+    stage = models.CharField(max_length=30, blank=True, default="")
+    progress = models.IntegerField(default=0)
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    summary = models.ForeignKey(
+        Summary,
+        on_delete=models.SET_NULL,
+        related_name="jobs",
+        null=True,
+        blank=True,
+    )
+
+    # Auto-generated
+    created_at = models.DateTimeField(auto_now_add=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.content_type} job {self.id} ({self.status})"
@@ -0,0 +1,74 @@
+import json
+import re
+import typing
+
+import pydantic
+
+from . import prompts
+
+code_fence_pattern = re.compile(r"```(?:json|JSON)?\s*(.*?)```", re.DOTALL)
+trailing_comma_pattern = re.compile(r",\s*([}\]])")
+
+
+def strip_code_fences(text: str) -> str:
+    if (match := code_fence_pattern.search(text)) is not None:
+        return match.group(1)
+
+    return text
+
+
+def find_json_object(text: str) -> typing.Optional[str]:
+    start = text.find("{")
+    end = text.rfind("}")
+
+    if start == -1 or end <= start:
+        return None
+
+    return text[start : end + 1]
+
+
+def unwrap_values(data: typing.Any) -> typing.Any:
+    if isinstance(data, dict):
+        if "properties" in data and isinstance(data["properties"], dict):
+            data = data["properties"]
+
+        if set(data.keys()) == {"value"} or (
+            "value" in data and {"description", "type"} & set(data.keys())
+        ):
+            return unwrap_values(data["value"])
+
+        return {key: unwrap_values(value) for key, value in data.items()}
+
+    if isinstance(data, list):
+        return [unwrap_values(value) for value in data]
+
+    return data
+
+
+def repair_json(text: str) -> typing.Optional[dict]:
+    if (json_text := find_json_object(strip_code_fences(text))) is None:
+        return None
+
+    for candidate in (json_text, trailing_comma_pattern.sub(r"\1", json_text)):
+        try:
+            data = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+
+        if isinstance(data, dict):
+            return unwrap_values(data)
+
+    return None
+
+
+def parse_bot_response(text: str) -> typing.Optional[dict]:
+    if (data := repair_json(text)) is None:
+        return None
+
+    if isinstance(data.get("tags"), str):
+        data["tags"] = [tag.strip() for tag in data["tags"].split(",") if tag.strip()]
+
+    try:
+        return prompts.BotResponse.model_validate(data).model_dump()
+    except pydantic.ValidationError:
+        return None
@@ -0,0 +1,233 @@
+import concurrent.futures
+import contextlib
+import io
+import itertools
+import math
+import mmap
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import typing
+
+from django.conf import settings
+from PyPDF2 import PdfReader
+
+from . import metrics
+
+real_file_types = (io.FileIO, io.BufferedReader, io.BufferedRandom)
+
+
+@contextlib.contextmanager
+def open_source(file: typing.Any) -> typing.Iterator[typing.Tuple[typing.Any, str]]:
+    # Uploads spooled to disk and real files are memory-mapped, in-memory
+    # uploads are read in place, neither is copied into a new buffer
+    if hasattr(file, "temporary_file_path"):
+        with open(file.temporary_file_path(), "rb") as source:
+            with mmap_file(source) as mapped:
+                yield mapped, "mmap"
+                return
+
+    stream = getattr(file, "file", file)
+
+    # Only real files are asked for a descriptor, fileno() would make a
+    # SpooledTemporaryFile roll over to disk
+    fileno = None
+    if isinstance(stream, real_file_types):
+        try:
+            fileno = stream.fileno()
+        except (OSError, io.UnsupportedOperation):
+            fileno = None
+
+    if fileno is not None and os.fstat(fileno).st_size:
+        with mmap_file(stream) as mapped:
+            yield mapped, "mmap"
+            return
+
+    stream.seek(0)
+    yield stream, "memory"
+
+
+@contextlib.contextmanager
+def mmap_file(source: typing.IO[bytes]) -> typing.Iterator[mmap.mmap]:
+    mapped = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        yield mapped
+    finally:
+        mapped.close()
+
+
+def get_title(reader: PdfReader) -> typing.Optional[str]:
+    if reader.metadata is None or not reader.metadata.title:
+        return None
+
+    return str(reader.metadata.title).strip() or None
+
+
+def iter_page_texts(
+    reader: PdfReader,
+    start: int = 0,
+    stop: typing.Optional[int] = None,
+    clear_every: typing.Optional[int] = None,
+) -> typing.Iterator[str]:
+    stop = len(reader.pages) if stop is None else stop
+    if clear_every is None:
+        clear_every = settings.SUMMARY_PDF["CACHE_CLEAR_EVERY"]
+
+    for index in range(start, stop):
+        yield reader.pages[index].extract_text()
+
+        # Resolved objects are cached on the reader, clearing them every few
+        # pages bounds memory while fonts shared between pages stay cached
+        if clear_every > 0 and (index - start + 1) % clear_every == 0:
+            reader.resolved_objects.clear()
+
+
+def extract_page_range(
+    path: str, start: int, stop: int, clear_every: int
+) -> typing.List[str]:
+    # Runs in a pool process, every task opens its own reader on the file
+    with open(path, "rb") as source:
+        with mmap_file(source) as mapped:
+            return list(iter_page_texts(PdfReader(mapped), start, stop, clear_every))
+
+
+def get_page_ranges(
+    pages: int, workers: int, min_pages_per_task: int
+) -> typing.List[typing.Tuple[int, int]]:
+    # Two ranges per worker evens out pages that are slower to extract
+    size = max(min_pages_per_task, math.ceil(pages / (workers * 2)), 1)
+
+    return [(start, min(start + size, pages)) for start in range(0, pages, size)]
+
+
+@contextlib.contextmanager
+def source_path(file: typing.Any, stream: typing.Any) -> typing.Iterator[str]:
+    if hasattr(file, "temporary_file_path"):
+        yield file.temporary_file_path()
+        return
+
+    name = getattr(getattr(file, "file", file), "name", None)
+    if isinstance(name, str) and os.path.isfile(name):
+        yield name
+        return
+
+    # In-memory uploads are written to disk once instead of being pickled to
+    # every worker
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as temporary_file:
+        stream.seek(0)
+        shutil.copyfileobj(stream, temporary_file)
+        temporary_file.flush()
+
+        yield temporary_file.name
+
+
+def get_available_cpus() -> int:
+    # CPUs this process may run on, which containers often limit below cpu_count
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+
+    return os.cpu_count() or 1
+
+
+_pools: typing.Dict[int, concurrent.futures.ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(workers: int) -> concurrent.futures.ProcessPoolExecutor:
+    if (pool := _pools.get(workers)) is not None:
+        return pool
+
+    with _pools_lock:
+        if (pool := _pools.get(workers)) is None:
+            pool = _pools[workers] = concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context(
+                    settings.SUMMARY_PDF["START_METHOD"]
+                ),
+            )
+
+    return pool
+
+
+def reset_pool(workers: int) -> None:
+    with _pools_lock:
+        if (pool := _pools.pop(workers, None)) is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def extract_parallel(
+    file: typing.Any, stream: typing.Any, pages: int, workers: int
+) -> typing.Optional[typing.List[str]]:
+    ranges = get_page_ranges(pages, workers, settings.SUMMARY_PDF["MIN_PAGES_PER_TASK"])
+
+    with source_path(file, stream) as path:
+        try:
+            # map keeps the ranges in page order
+            results = get_pool(workers).map(
+                extract_page_range,
+                itertools.repeat(path),
+                [start for start, _ in ranges],
+                [stop for _, stop in ranges],
+                itertools.repeat(settings.SUMMARY_PDF["CACHE_CLEAR_EVERY"]),
+            )
+
+            return list(itertools.chain.from_iterable(results))
+
+        except concurrent.futures.process.BrokenProcessPool:
+            metrics.increment("pdf.broken_pool")
+            reset_pool(workers)
+
+            return None
+
+
+def extract_pages(
+    file: typing.Any, workers: typing.Optional[int] = None
+) -> typing.Tuple[typing.List[str], typing.Optional[str], typing.Dict[str, typing.Any]]:
+    config = settings.SUMMARY_PDF
+    workers = config["WORKERS"] if workers is None else workers
+    # More processes than usable CPUs only adds start-up and pickling overhead
+    workers = min(workers, get_available_cpus())
+    started_at = time.perf_counter()
+
+    with open_source(file) as (stream, source):
+        reader = PdfReader(stream)
+        title = get_title(reader)
+        page_count = len(reader.pages)
+        pages = None
+
+        if workers > 1 and page_count >= config["PARALLEL_MIN_PAGES"]:
+            pages = extract_parallel(file, stream, page_count, workers)
+
+        # Small documents, a single usable CPU or a pool that died are extracted
+        # in this process
+        if pages is None:
+            workers = 1
+            pages = list(iter_page_texts(reader))
+
+    seconds = time.perf_counter() - started_at
+    metrics.increment("pdf.pages", page_count)
+    metrics.observe("pdf.seconds", seconds)
+
+    return (
+        pages,
+        title,
+        {
+            "source": source,
+            "pages": page_count,
+            "workers": workers,
+            "seconds": round(seconds, 4),
+        },
+    )
+
+
+def extract_text(
+    file: typing.Any, workers: typing.Optional[int] = None
+) -> typing.Tuple[str, typing.Optional[str], typing.Dict[str, typing.Any]]:
+    pages, title, report = extract_pages(file, workers)
+    text = "".join(pages).strip()
+
+    return text, title, {**report, "characters": len(text)}
@@ -0,0 +1,240 @@
+import typing
+
+from django.conf import settings
+
+from . import (
+    chunking,
+    compaction,
+    documents,
+    engine,
+    extraction,
+    fetcher,
+    functions,
+    httpcache,
+    incremental,
+    singleflight,
+)
+
+ProgressCallback = typing.Callable[[str, int], None]
+PipelineResult = typing.Tuple[
+    typing.Dict[str, typing.Any], typing.Dict[str, typing.Any]
+]
+T = typing.TypeVar("T")
+
+
+class PipelineError(Exception):
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def no_progress(stage: str, progress: int) -> None:
+    pass
+
+
+def single_flight(key: str, function: typing.Callable[[], T]) -> T:
+    try:
+        return singleflight.get_single_flight().do(key, function)
+    except singleflight.WaitTimeout:
+        raise PipelineError(
+            "The same content is already being summarized, please try again shortly",
+            503,
+        )
+
+
+def summarize_website(
+    url: str,
+    user_prompt: str,
+    progress: ProgressCallback = no_progress,
+    on_token: typing.Optional[engine.TokenCallback] = None,
+    extraction_mode: typing.Optional[str] = None,
+) -> PipelineResult:
+    extraction_mode = extraction_mode or settings.SUMMARY_EXTRACTION["MODE"]
+    if extraction_mode not in extraction.extraction_modes:
+        modes = ", ".join(extraction.extraction_modes)
+        raise PipelineError(f"Invalid extraction mode. Supported modes: {modes}")
+
+    source = f"{extraction_mode}:{singleflight.normalize_url(url)}"
+    key = singleflight.make_key(source, user_prompt)
+    data, report = single_flight(
+        key,
+        lambda: fetch_and_summarize_website(
+            url, user_prompt, progress, on_token, extraction_mode
+        ),
+    )
+    data["url"] = url
+
+    return data, report
+
+
+def fetch_page(
+    url: str,
+    extraction_mode: str = extraction.EXTRACTION_FULL,
+    progress: ProgressCallback = no_progress,
+) -> typing.Tuple[typing.Dict[str, typing.Any], str]:
+    progress("fetching", 10)
+    http_cache = httpcache.get_cache()
+    if (fetched := http_cache.fetch(url)) is None:
+        raise PipelineError("Failed to scrape website")
+
+    progress("extracting", 30)
+    # A fresh or revalidated page reuses the text extracted from the cached copy
+    if (page := http_cache.get_extraction(fetched, extraction_mode)) is None:
+        body = fetched["body"]
+        if body is None:
+            body = http_cache.load_body(fetched["key"], fetched["document_type"])
+
+        # PDFs and plain text never go through the HTML parser
+        match fetched["document_type"]:
+            case fetcher.DOCUMENT_PDF:
+                page = extraction.extract_pdf(body or b"")
+            case fetcher.DOCUMENT_TEXT:
+                page = extraction.extract_plain_text(body or "")
+            case _:
+                page = extraction.extract(body or "", extraction_mode)
+
+        if page is None:
+            raise PipelineError("Failed to get body content")
+
+        http_cache.set_extraction(fetched, extraction_mode, page)
+
+    return page, fetched["status"]
+
+
+def fetch_and_summarize_website(
+    url: str,
+    user_prompt: str,
+    progress: ProgressCallback = no_progress,
+    on_token: typing.Optional[engine.TokenCallback] = None,
+    extraction_mode: str = extraction.EXTRACTION_FULL,
+) -> PipelineResult:
+    page, http_cache_status = fetch_page(url, extraction_mode, progress)
+    cleaned_content, compaction_report = compaction.compact(page["text"], user_prompt)
+
+    progress("summarizing", 50)
+    bot_response, incremental_report = incremental.summarize_page(
+        url, cleaned_content, user_prompt, on_token, extraction_mode
+    )
+    title = page["title"]
+
+    data = {
+        "url": url,
+        "title": title if title is not None else bot_response["title"],
+        "content_type": functions.Website.content_type,
+        "summary": bot_response["content"],
+        "user_prompt": user_prompt,
+        "tags": bot_response["tags"][:5],
+        "category": bot_response["category"],
+    }
+
+    report = {
+        "http_cache": http_cache_status,
+        "extraction": {**page["report"], "metadata": page["metadata"]},
+        "compaction": compaction_report,
+        "incremental": incremental_report,
+    }
+
+    return data, report
+
+
+def summarize_text(
+    input_text: str,
+    user_prompt: str,
+    chunked: typing.Any = None,
+    progress: ProgressCallback = no_progress,
+    on_token: typing.Optional[engine.TokenCallback] = None,
+) -> PipelineResult:
+    report: typing.Dict[str, typing.Any] = {}
+
+    progress("summarizing", 50)
+    if chunking.should_chunk(input_text, chunked):
+        bot_response, report["chunking"] = chunking.summarize_chunked(
+            input_text, user_prompt, on_token=on_token
+        )
+    else:
+        bot_response = functions.Text.ask_bot(input_text, user_prompt, on_token)
+
+    data = {
+        "title": bot_response["title"],
+        "content_type": functions.Text.content_type,
+        "summary": bot_response["content"],
+        "user_prompt": user_prompt,
+        "tags": bot_response["tags"],
+        "category": bot_response["category"],
+        "raw_text": input_text,
+    }
+
+    return data, report
+
+
+def summarize_file(
+    file_name: str,
+    file: typing.IO[bytes],
+    user_prompt: str,
+    chunked: typing.Any = None,
+    progress: ProgressCallback = no_progress,
+    on_token: typing.Optional[engine.TokenCallback] = None,
+    pages: typing.Any = None,
+) -> PipelineResult:
+    report: typing.Dict[str, typing.Any] = {}
+
+    progress("extracting", 20)
+    # Repeated uploads of the same file reuse its stored page texts
+    try:
+        file_content, report["pdf"] = documents.get_store().get_text(
+            file, documents.parse_page_range(pages)
+        )
+    except ValueError as e:
+        raise PipelineError(str(e))
+
+    progress("summarizing", 50)
+    if chunking.should_chunk(file_content, chunked):
+        bot_response, report["chunking"] = chunking.summarize_chunked(
+            file_content, user_prompt, on_token=on_token
+        )
+    else:
+        bot_response = functions.File.process_file_content(
+            file_content, user_prompt, on_token
+        )
+
+    data = {
+        "title": file_name.split(".pdf")[0],
+        "content_type": functions.File.content_type,
+        "summary": bot_response["content"],
+        "user_prompt": user_prompt,
+        "tags": bot_response["tags"],
+        "category": bot_response["category"],
+        "raw_text": file_content,
+    }
+
+    return data, report
+
+
+def check_video_support() -> None:
+    if not engine.get_engine().backend.supports_video:
+        raise PipelineError(
+            "Video summaries are not supported by the configured backend", 400
+        )
+
+
+def summarize_video(
+    url: str, user_prompt: str, progress: ProgressCallback = no_progress
+) -> PipelineResult:
+    check_video_support()
+
+    progress("summarizing", 50)
+    key = singleflight.make_key(singleflight.normalize_url(url), user_prompt)
+    bot_response = single_flight(key, lambda: functions.Video.ask_bot(url, user_prompt))
+
+    data = {
+        "title": bot_response["title"],
+        "content_type": functions.Video.content_type,
+        "summary": bot_response["content"],
+        "user_prompt": user_prompt,
+        "tags": bot_response["tags"],
+        "category": bot_response["category"],
+        "url": url,
+    }
+
+    return data, {}
@@ -0,0 +1,93 @@
+import typing
+
+import pydantic
+
+langchain_template = (
+    "You are tasked with extracting specific information from the following text content: {dom_content}. "
+    "Format the response in this JSON format: {format_instructions}. "
+    "Please follow these instructions carefully: \n\n"
+    "1. **Extract Information:** If not stated otherwise by user, keep the response long, detailed and informative. Only extract the information that directly matches the provided description: {user_prompt}. "
+    "2. **No Extra Content:** Do not include any additional text, comments, or explanations in your response. "
+    "3. **Empty Response:** If no information matches the description, return an empty string ('')."
+    "4. **Direct Data Only:** Your output should contain only the data that is explicitly requested, with no other text."
+    "5. **Format response:** Add to your response html tags like <br> for line breaks, <p> for paragraphs, <h1> for headers, <strong> for bold text, <em> for italic text, <a> for links, <ul> for unordered lists, <ol> for ordered lists, <li> for list items, <table> for tables, <tr> for table rows, <th> for table headers, <td> for table cells, to make the response more clean and readable."
+)
+
+chunk_template = (
+    "You are summarizing part {chunk_index} of {chunk_count} of a longer document. The text of this part is: {dom_content}. "
+    "Format the response in this JSON format: {format_instructions}. "
+    "Please follow these instructions carefully: \n\n"
+    "1. **Extract Information:** Only extract the information from this part that matches the provided description: {user_prompt}. Keep every relevant fact, the parts will be merged later. "
+    "2. **No Extra Content:** Do not include any additional text, comments, or explanations in your response. "
+    "3. **Empty Response:** If no information in this part matches the description, return an empty string ('') as content."
+)
+
+reduce_template = (
+    "You are merging partial summaries of consecutive parts of one document into a single summary. The partial summaries in document order are: {partial_summaries}. "
+    "Format the response in this JSON format: {format_instructions}. "
+    "Please follow these instructions carefully: \n\n"
+    "1. **Merge Information:** Combine the partial summaries into one coherent answer to the description: {user_prompt}. If not stated otherwise by user, keep the response long, detailed and informative. Remove repetitions between parts. "
+    "2. **No Extra Content:** Do not include any additional text, comments, or explanations in your response. "
+    "3. **Title, Tags and Category:** Choose one title, max 5 tags and one category describing the whole document. "
+    "4. **Format response:** Add to your response html tags like <br> for line breaks, <p> for paragraphs, <h1> for headers, <strong> for bold text, <em> for italic text, <a> for links, <ul> for unordered lists, <ol> for ordered lists, <li> for list items, <table> for tables, <tr> for table rows, <th> for table headers, <td> for table cells, to make the response more clean and readable."
+)
+
+update_template = (
+    "You are updating an existing summary of a web page that has changed since it was last summarized. The previous summary is: {previous_summary}. "
+    "Sections that were added or changed on the page: {changed_sections}. "
+    "Sections that were removed from the page: {removed_sections}. "
+    "Format the response in this JSON format: {format_instructions}. "
+    "Please follow these instructions carefully: \n\n"
+    "1. **Update Information:** Return the full updated answer to the description: {user_prompt}. Keep everything from the previous summary that is still true, add the information from the changed sections and drop what only came from the removed sections. "
+    "2. **No Extra Content:** Do not include any additional text, comments, or explanations in your response. "
+    "3. **Title, Tags and Category:** Keep the previous title, tags and category unless the changes make them wrong. "
+    "4. **Format response:** Keep the html formatting of the previous summary, using tags like <br>, <p>, <h1>, <strong>, <em>, <a>, <ul>, <ol>, <li> and <table> to make the response clean and readable."
+)
+
+video_extraction_template = """
+            You are extracting data from a JSON string that may be wrapped in markdown code blocks like ```json.
+            The JSON contains properties with 'value' fields that hold the actual data.
+
+            From this text: {json_text_response}
+
+            Extract each property's 'value' field and create a clean JSON object with just:
+            - title (string)
+            - content (string)
+            - tags (array of strings)
+            - category (string)
+
+            Format the response in this JSON format: {format_instructions}
+            Don't include any explanations, just the properly formatted JSON.
+            """
+
+video_prompt_template = "From the YouTube video extract the following information: {user_prompt}\nReturn the response in the following JSON format: {format_instructions}"
+
+categories = [
+    "technology",
+    "business",
+    "health & wellness",
+    "education",
+    "lifestyle",
+    "entertainment",
+    "science",
+    "politics",
+    "art & culture",
+    "sports",
+    "food & drink",
+    "travel",
+    "other",
+]
+
+
+class BotResponse(pydantic.BaseModel):
+    title: str = pydantic.Field(description="The title of the content")
+    content: str = pydantic.Field(description="The answer to the user's query")
+    tags: typing.List[str] = pydantic.Field(description="Max 5 tags for the summary")
+    category: str = pydantic.Field(
+        description=f"The category of the content. Choose one from the list: [{', '.join(categories)}]"
+    )
+
+
+class ContentResponse(pydantic.BaseModel):
+    title: str = pydantic.Field(description="The title of the content")
+    content: str = pydantic.Field(description="The answer to the user's query")
@@ -0,0 +1,285 @@
+import random
+import threading
+import time
+import typing
+
+from django.conf import settings
+
+from . import metrics
+
+T = typing.TypeVar("T")
+
+transient_status_codes = {500, 502, 503, 504}
+rate_limit_error_names = {"ResourceExhausted", "RateLimitError", "TooManyRequests"}
+transient_error_names = {
+    "ServiceUnavailable",
+    "InternalServerError",
+    "DeadlineExceeded",
+    "APITimeoutError",
+    "APIConnectionError",
+    "Timeout",
+    "TimeoutError",
+    "ReadTimeout",
+    "ConnectTimeout",
+    "ConnectionError",
+}
+
+
+def iter_causes(error: BaseException) -> typing.Iterator[BaseException]:
+    # Client libraries often wrap the provider error, the cause carries the status
+    seen: typing.Set[int] = set()
+    current: typing.Optional[BaseException] = error
+
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        yield current
+        current = current.__cause__
+
+
+def get_status_code(error: BaseException) -> typing.Optional[int]:
+    for source in (error, getattr(error, "response", None)):
+        for attribute in ("status_code", "code", "status"):
+            value = getattr(source, attribute, None)
+            if isinstance(value, int) and 100 <= value < 600:
+                return value
+
+    return None
+
+
+def has_error_type(error: BaseException, names: typing.Set[str]) -> bool:
+    return any(error_type.__name__ in names for error_type in type(error).__mro__)
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    return any(
+        get_status_code(cause) == 429 or has_error_type(cause, rate_limit_error_names)
+        for cause in iter_causes(error)
+    )
+
+
+def is_transient_error(error: BaseException) -> bool:
+    return any(
+        get_status_code(cause) in transient_status_codes
+        or has_error_type(cause, transient_error_names)
+        for cause in iter_causes(error)
+    )
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        # A limit of zero or less disables the bucket
+        self.unlimited = per_minute <= 0
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+
+        self._lock = threading.Lock()
+        self._tokens = per_minute
+        self._updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    def acquire(self, amount: float = 1) -> float:
+        if self.unlimited:
+            return 0.0
+
+        amount = min(amount, self.capacity)
+        waited = 0.0
+
+        while True:
+            with self._lock:
+                self._refill()
+
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return waited
+
+                delay = (amount - self._tokens) / self.rate
+
+            time.sleep(delay)
+            waited += delay
+
+    @property
+    def available(self) -> typing.Optional[float]:
+        if self.unlimited:
+            return None
+
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        target_latency: float,
+        decrease_factor: float = 0.5,
+    ):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+
+        self._condition = threading.Condition()
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._decreased_at = float("-inf")
+
+    @property
+    def limit(self) -> int:
+        return max(self.minimum, int(self._limit))
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+
+            self._in_flight += 1
+
+    def release(
+        self, latency: float, throttled: bool = False, succeeded: bool = True
+    ) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            now = time.monotonic()
+
+            # Requests sent before the last decrease belong to the same congestion
+            # window, their throttling is already accounted for
+            if throttled:
+                if now - latency > self._decreased_at:
+                    self._limit = max(self.minimum, self._limit * self.decrease_factor)
+                    self._decreased_at = now
+            elif latency > self.target_latency:
+                self._limit = max(self.minimum, self._limit - 1)
+            elif succeeded:
+                # Failed requests say nothing about spare capacity
+                self._limit = min(self.maximum, self._limit + 1 / max(self._limit, 1))
+
+            self._condition.notify_all()
+
+
+class LLMScheduler:
+    def __init__(self, config: typing.Optional[typing.Dict[str, typing.Any]] = None):
+        config = config if config is not None else settings.SUMMARY_SCHEDULER
+
+        self.max_retries: int = config["MAX_RETRIES"]
+        self.backoff_base: float = config["BACKOFF_BASE"]
+        self.backoff_max: float = config["BACKOFF_MAX"]
+
+        self.requests_bucket = TokenBucket(config["REQUESTS_PER_MINUTE"])
+        self.tokens_bucket = TokenBucket(config["TOKENS_PER_MINUTE"])
+        self.limiter = AdaptiveLimiter(
+            initial=config["INITIAL_CONCURRENCY"],
+            minimum=config["MIN_CONCURRENCY"],
+            maximum=config["MAX_CONCURRENCY"],
+            target_latency=config["TARGET_LATENCY"],
+        )
+
+        self._lock = threading.Lock()
+        self._queued = 0
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    def run(
+        self,
+        function: typing.Callable[[], T],
+        estimated_tokens: int = 0,
+        can_retry: typing.Callable[[], bool] = lambda: True,
+    ) -> T:
+        attempt = 0
+
+        while True:
+            with self._lock:
+                self._queued += 1
+
+            queued_at = time.perf_counter()
+
+            try:
+                self.requests_bucket.acquire(1)
+                self.tokens_bucket.acquire(estimated_tokens)
+                self.limiter.acquire()
+            finally:
+                with self._lock:
+                    self._queued -= 1
+
+            metrics.observe("scheduler.queue_seconds", time.perf_counter() - queued_at)
+
+            started_at = time.perf_counter()
+            throttled = False
+            succeeded = False
+
+            try:
+                result = function()
+
+            except Exception as e:
+                throttled = is_rate_limit_error(e)
+                retryable = throttled or is_transient_error(e)
+
+                if throttled:
+                    metrics.increment("scheduler.throttled")
+
+                if not retryable or attempt >= self.max_retries or not can_retry():
+                    metrics.increment("scheduler.failed")
+                    raise
+
+                metrics.increment("scheduler.retries")
+
+            else:
+                succeeded = True
+                metrics.increment("scheduler.succeeded")
+                return result
+
+            finally:
+                latency = time.perf_counter() - started_at
+                self.limiter.release(latency, throttled, succeeded)
+                metrics.observe("scheduler.call_seconds", latency)
+
+            time.sleep(self.backoff(attempt))
+            attempt += 1
+
+    def get_stats(self) -> typing.Dict[str, typing.Any]:
+        requests_available = self.requests_bucket.available
+        tokens_available = self.tokens_bucket.available
+
+        return {
+            "queued": self._queued,
+            "in_flight": self.limiter.in_flight,
+            "concurrency_limit": self.limiter.limit,
+            "requests_available": (
+                round(requests_available, 2) if requests_available is not None else None
+            ),
+            "tokens_available": (
+                round(tokens_available) if tokens_available is not None else None
+            ),
+            "throttled": metrics.get("scheduler.throttled"),
+            "retries": metrics.get("scheduler.retries"),
+        }
+
+
+_scheduler: typing.Optional[LLMScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    global _scheduler
+
+    if _scheduler is not None:
+        return _scheduler
+
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+
+    return _scheduler
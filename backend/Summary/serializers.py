@@ -130,3 +130,29 @@ class SummaryPreviewSerializer(serializers.ModelSerializer):
 
     def get_favorites(self, obj):
         return obj.favorites.count()
+
+
+class SummaryJobSerializer(serializers.ModelSerializer):
+    id = serializers.CharField(read_only=True)
+    summary = serializers.SerializerMethodField()
+
+    class Meta:
+        model = models.SummaryJob
+        fields = (
+            "id",
+            "content_type",
+            "status",
+            "stage",
+            "progress",
+            "error",
+            "summary",
+            "created_at",
+            "updated_at",
+            "finished_at",
+        )
+
+    def get_summary(self, obj):
+        if obj.summary_id is None:
+            return None
+
+        return str(obj.summary_id)
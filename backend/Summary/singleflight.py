@@ -0,0 +1,228 @@
+import concurrent.futures
+import copy
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import typing
+import urllib.parse
+
+from django.conf import settings
+from django.db import connection
+
+from . import cache, metrics
+
+T = typing.TypeVar("T")
+
+
+# Raised only while waiting on another caller, so a TimeoutError from the work
+# itself is not mistaken for a busy key
+class WaitTimeout(TimeoutError):
+    pass
+
+
+tracking_parameters = {"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid"}
+
+
+def normalize_url(url: str) -> str:
+    parts = urllib.parse.urlsplit(url.strip())
+
+    query = sorted(
+        (name, value)
+        for name, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if not name.lower().startswith("utm_")
+        and name.lower() not in tracking_parameters
+    )
+
+    netloc = parts.netloc.lower()
+    if netloc.startswith("www."):
+        netloc = netloc[4:]
+
+    return urllib.parse.urlunsplit(
+        (
+            parts.scheme.lower() or "https",
+            netloc,
+            parts.path.rstrip("/") or "/",
+            urllib.parse.urlencode(query),
+            "",
+        )
+    )
+
+
+def make_key(source: str, user_prompt: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(source.encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(cache.normalize_prompt(user_prompt).encode("utf-8"))
+
+    return digest.hexdigest()
+
+
+class SingleFlight:
+    def __init__(self, config: typing.Optional[typing.Dict[str, typing.Any]] = None):
+        config = config if config is not None else settings.SUMMARY_SINGLE_FLIGHT
+
+        self.enabled: bool = config["ENABLED"]
+        self.result_dir: str = config["RESULT_DIR"] or os.path.join(
+            tempfile.gettempdir(), "summarizzler-singleflight"
+        )
+        self.result_ttl: float = config["RESULT_TTL"]
+        self.wait_timeout: float = config["WAIT_TIMEOUT"]
+
+        self._lock = threading.Lock()
+        self._calls: typing.Dict[str, concurrent.futures.Future] = {}
+        self._runs = 0
+
+        # Results include summaries of private requests
+        os.makedirs(self.result_dir, mode=0o700, exist_ok=True)
+
+    def do(self, key: str, function: typing.Callable[[], T]) -> T:
+        if not self.enabled:
+            return function()
+
+        with self._lock:
+            future = self._calls.get(key)
+            is_leader = future is None
+
+            if is_leader:
+                future = concurrent.futures.Future()
+                self._calls[key] = future
+
+        if not is_leader:
+            metrics.increment("singleflight.followers")
+
+            done, _ = concurrent.futures.wait([future], timeout=self.wait_timeout)
+            if not done:
+                metrics.increment("singleflight.wait_timeouts")
+                raise WaitTimeout(
+                    f"Timed out after {self.wait_timeout}s waiting for another request"
+                )
+
+            return copy.deepcopy(future.result())
+
+        metrics.increment("singleflight.leaders")
+
+        try:
+            result = self._run_exclusive(key, function)
+            future.set_result(result)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+        return copy.deepcopy(result)
+
+    def _result_path(self, key: str) -> str:
+        return os.path.join(self.result_dir, f"{key}.json")
+
+    def _read_result(self, key: str) -> typing.Optional[typing.Any]:
+        path = self._result_path(key)
+
+        try:
+            if time.time() - os.path.getmtime(path) > self.result_ttl:
+                return None
+
+            with open(path, encoding="utf-8") as result_file:
+                return json.load(result_file)
+
+        except (OSError, ValueError):
+            return None
+
+    def _write_result(self, key: str, result: typing.Any) -> None:
+        path = self._result_path(key)
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        try:
+            flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+            with open(
+                os.open(temporary_path, flags, 0o600), "w", encoding="utf-8"
+            ) as result_file:
+                json.dump(result, result_file)
+
+            os.replace(temporary_path, path)
+
+        except (OSError, TypeError, ValueError):
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def _run_exclusive(self, key: str, function: typing.Callable[[], T]) -> T:
+        # Other processes are coordinated with a Postgres advisory lock on the key,
+        # which leaves nothing behind once released
+        if connection.vendor != "postgresql":
+            return function()
+
+        lock_id = int.from_bytes(bytes.fromhex(key[:16]), "big", signed=True)
+        self._acquire(lock_id)
+
+        try:
+            if (result := self._read_result(key)) is not None:
+                metrics.increment("singleflight.shared")
+                return result
+
+            result = function()
+            self._write_result(key, result)
+
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [lock_id])
+
+        self._cleanup()
+
+        return result
+
+    def _acquire(self, lock_id: int) -> None:
+        # Poll instead of blocking so a stuck leader in another process can't
+        # hold followers past WAIT_TIMEOUT
+        deadline = time.monotonic() + self.wait_timeout
+        delay = 0.01
+
+        while True:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_try_advisory_lock(%s)", [lock_id])
+                if cursor.fetchone()[0]:
+                    return
+
+            if time.monotonic() >= deadline:
+                metrics.increment("singleflight.lock_timeouts")
+                raise WaitTimeout(
+                    f"Timed out after {self.wait_timeout}s waiting for another process"
+                )
+
+            time.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+            delay = min(delay * 2, 0.25)
+
+    def _cleanup(self) -> None:
+        with self._lock:
+            self._runs += 1
+            if self._runs % 100:
+                return
+
+        expired_before = time.time() - max(self.result_ttl * 10, 60)
+
+        for entry in os.scandir(self.result_dir):
+            try:
+                if entry.stat().st_mtime < expired_before:
+                    os.remove(entry.path)
+            except OSError:
+                continue
+
+
+_single_flight: typing.Optional[SingleFlight] = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    global _single_flight
+
+    if _single_flight is not None:
+        return _single_flight
+
+    with _single_flight_lock:
+        if _single_flight is None:
+            _single_flight = SingleFlight()
+
+    return _single_flight
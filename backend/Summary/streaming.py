@@ -0,0 +1,111 @@
+import asyncio
+import json
+import logging
+import time
+import typing
+
+from django.db import close_old_connections
+from django.http import StreamingHttpResponse
+
+from . import engine, functions, metrics, pipeline
+
+logger = logging.getLogger(__name__)
+
+StreamingPipeline = typing.Callable[
+    [pipeline.ProgressCallback, engine.TokenCallback], pipeline.PipelineResult
+]
+
+
+def sse_event(event: str, data: typing.Dict[str, typing.Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def run_and_save(
+    run_pipeline: StreamingPipeline,
+    user_data: typing.Any,
+    is_private: typing.Any,
+    send: typing.Callable[[str, typing.Dict[str, typing.Any]], None],
+) -> None:
+    close_old_connections()
+
+    try:
+        data, report = run_pipeline(
+            lambda stage, progress: send(
+                "progress", {"stage": stage, "progress": progress}
+            ),
+            lambda token: send("token", {"content": token}),
+        )
+
+        data["author"] = user_data
+        data["is_private"] = is_private
+
+        if (summary := functions.create_summary(data)) is None:
+            raise pipeline.PipelineError("Failed to create summary")
+
+        send(
+            "summary",
+            {
+                "id": str(summary.id),  # type: ignore
+                "title": summary.title,
+                "tags": summary.tags,
+                "category": summary.category,
+                **report,
+            },
+        )
+
+    except pipeline.PipelineError as e:
+        send("error", {"message": e.message})
+
+    except Exception as e:
+        logger.exception("Streaming summary failed")
+        send("error", {"message": str(e)})
+
+    finally:
+        close_old_connections()
+
+
+async def event_stream(
+    run_pipeline: StreamingPipeline, user_data: typing.Any, is_private: typing.Any
+) -> typing.AsyncIterator[str]:
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue[typing.Optional[str]] = asyncio.Queue()
+
+    def send(event: str, data: typing.Dict[str, typing.Any]) -> None:
+        loop.call_soon_threadsafe(queue.put_nowait, sse_event(event, data))
+
+    def work() -> None:
+        try:
+            run_and_save(run_pipeline, user_data, is_private, send)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+
+    started_at = time.perf_counter()
+    metrics.increment("streaming.started")
+    worker = loop.run_in_executor(None, work)
+
+    yield sse_event("start", {})
+
+    first_token = True
+    while (event := await queue.get()) is not None:
+        if first_token and event.startswith("event: token"):
+            metrics.observe(
+                "streaming.first_token_seconds", time.perf_counter() - started_at
+            )
+            first_token = False
+
+        yield event
+
+    await worker
+
+
+def streaming_response(
+    run_pipeline: StreamingPipeline, user_data: typing.Any, is_private: typing.Any
+) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(
+        event_stream(run_pipeline, user_data, is_private),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+
+    return response
@@ -1,3 +1,964 @@
-from django.test import TestCase
+import datetime
+import http.server
+import io
+import os
+import socket
+import tempfile
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.core.files.uploadhandler import SkipFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from Users.models import UserData
+
+from . import (
+    backends,
+    batch,
+    cache,
+    chunking,
+    classifier,
+    compaction,
+    crawl,
+    dedup,
+    documents,
+    engine,
+    extraction,
+    fetcher,
+    jobs,
+    models,
+    parsing,
+    pdf,
+    pipeline,
+    scheduler,
+    singleflight,
+    uploads,
+)
+
+
+class SyntheticSiteHandler(http.server.BaseHTTPRequestHandler):
+    # Page N links to pages 3N+1 to 3N+3, anything past the last page is a 404
+    protocol_version = "HTTP/1.1"
+    pages = 13
+
+    def do_GET(self):
+        page = self.path.strip("/").removeprefix("page-") or "0"
+
+        if not page.isdigit() or int(page) >= self.pages:
+            self.send_error(404)
+            return
+
+        index = int(page)
+        links = "".join(
+            f"<li><a href='/page-{link}'>Page {link}</a></li>"
+            for link in (index * 3 + 1, index * 3 + 2, index * 3 + 3)
+        )
+        body = (
+            f"<html><head><title>Page {index}</title></head><body>"
+            f"<nav><ul>{links}</ul></nav><article><h1>Page {index}</h1>"
+            + f"<p>Synthetic crawl page {index}, paragraph text.</p>" * 5
+            + "</article></body></html>"
+        ).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CrawlerTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.server = http.server.ThreadingHTTPServer(
+            ("127.0.0.1", 0), SyntheticSiteHandler
+        )
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+        host, port = cls.server.server_address[:2]
+        cls.url = f"http://{host}:{port}/"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+        super().tearDownClass()
+
+    def crawl(self, max_depth, max_pages):
+        crawler = crawl.Crawler(
+            self.url,
+            max_depth,
+            max_pages,
+            extraction.EXTRACTION_MAIN,
+            config={**settings.SUMMARY_CRAWL, "DELAY": 0},
+        )
+
+        return crawler.crawl()
+
+    def test_depth_zero_fetches_only_the_start_page(self):
+        pages, report = self.crawl(0, 10)
+
+        self.assertEqual([page["url"] for page in pages], [self.url])
+        self.assertEqual(pages[0]["title"], "Page 0")
+        self.assertEqual(report["depth"], 0)
+
+    def test_crawl_follows_links_breadth_first(self):
+        pages, report = self.crawl(1, 10)
+
+        self.assertEqual(
+            [page["title"] for page in pages],
+            ["Page 0", "Page 1", "Page 2", "Page 3"],
+        )
+        self.assertIn("Synthetic crawl page 2", pages[2]["text"])
+        self.assertEqual(report["failed_pages"], 0)
+
+    def test_dns_cache_is_scoped_to_the_fetcher(self):
+        getaddrinfo = socket.getaddrinfo
+        page_fetcher = fetcher.Fetcher({**settings.SUMMARY_FETCHER, "DNS_CACHE": True})
+        url = self.url.replace("127.0.0.1", "localhost")
+
+        with mock.patch("socket.getaddrinfo", wraps=getaddrinfo) as lookups:
+            for _ in range(3):
+                # A new connection for every request, each one needs an address
+                page_fetcher.get(url, headers={"Connection": "close"}).close()
+
+        # One real lookup, the rest are numeric lookups of the cached address
+        # made by every new connection
+        hosts = [lookup.args[0] for lookup in lookups.call_args_list]
+        self.assertEqual(hosts.count("localhost"), 1)
+        self.assertGreaterEqual(len(hosts) - 1, 3)
+        self.assertIs(socket.getaddrinfo, getaddrinfo)
+
+    def test_crawl_stops_at_max_pages(self):
+        pages, report = self.crawl(3, 6)
+
+        self.assertEqual(len(pages), 6)
+        self.assertEqual(len({page["url"] for page in pages}), 6)
+
+    def test_missing_pages_are_counted_as_failed(self):
+        # Pages 4 to 12 link to pages 13 and above, which do not exist
+        pages, report = self.crawl(3, 50)
+
+        self.assertEqual(len(pages), SyntheticSiteHandler.pages)
+        self.assertEqual(report["failed_pages"], 27)
+
+
+class CrawlLimitTests(SimpleTestCase):
+    url = "https://example.com/"
+
+    def test_parse_limits_accepts_numeric_strings(self):
+        self.assertEqual(crawl.parse_limits("2", "5"), (2, 5))
+        self.assertEqual(crawl.parse_limits(None, None), (None, None))
+
+    def test_parse_limits_rejects_invalid_values(self):
+        for depth, pages in [(-1, None), (None, 0), ("two", None), (None, [3])]:
+            with self.assertRaises(ValueError):
+                crawl.parse_limits(depth, pages)
+
+    def test_batch_rejects_invalid_crawl_limits(self):
+        item = {"type": "website", "url": self.url, "prompt": "Summarize"}
+
+        self.assertIsNone(batch.validate_item({**item, "crawl": True, "depth": "1"}))
+        self.assertEqual(
+            batch.validate_item({**item, "crawl": True, "depth": -1}),
+            "Invalid depth or pages value",
+        )
+        self.assertEqual(
+            batch.validate_item({**item, "crawl": "true", "pages": "many"}),
+            "Invalid depth or pages value",
+        )
+
+
+class BatchValidationTests(SimpleTestCase):
+    def test_required_fields_must_be_non_empty_strings(self):
+        item = {"type": "video", "prompt": "Summarize"}
+
+        for url in [None, 42, ["https://www.youtube.com/watch?v=abc"], " "]:
+            self.assertEqual(
+                batch.validate_item({**item, "url": url}),
+                "Fields must be non-empty strings: url",
+            )
+
+        self.assertEqual(
+            batch.validate_item({"type": "text", "text": {"body": "x"}, "prompt": ""}),
+            "Fields must be non-empty strings: text, prompt",
+        )
+
+    def test_unhashable_types_are_rejected(self):
+        self.assertEqual(
+            batch.validate_item({"type": ["video"], "url": "x", "prompt": "x"}),
+            "Invalid type. Supported types: website, text, video",
+        )
+
+    def test_valid_video_item(self):
+        item = {"type": "video", "prompt": "Summarize"}
+
+        self.assertIsNone(
+            batch.validate_item({**item, "url": "https://www.youtube.com/watch?v=abc"})
+        )
+        self.assertEqual(
+            batch.validate_item({**item, "url": "https://example.com/"}),
+            "Invalid URL. Only YouTube videos are supported.",
+        )
+
+
+@override_settings(SUMMARY_COMPACTION={"ENABLED": True, "TOKEN_BUDGET": 30_000})
+class CompactionTests(SimpleTestCase):
+    def test_under_budget_pages_are_cleaned(self):
+        text = "\n".join(
+            [
+                "Home | News | Sign in",
+                "Quarterly results",
+                "Revenue grew by 12 percent compared with the previous quarter.",
+                "Home | News | Sign in",
+                "Revenue grew by 12 percent compared with the previous quarter.",
+                "Subscribe to our newsletter",
+                "Subscribe to our newsletter",
+                "2023",
+            ]
+        )
+
+        compacted, report = compaction.compact(text)
+
+        self.assertEqual(
+            compacted.splitlines(),
+            [
+                "Quarterly results",
+                "Revenue grew by 12 percent compared with the previous quarter.",
+                "2023",
+            ],
+        )
+        self.assertEqual(report["lines_removed"], 5)
+        self.assertGreater(report["tokens_saved"], 0)
+
+    def test_prose_mentioning_boilerplate_words_is_kept(self):
+        line = "We read more than 200 papers about cookie consent and privacy policy design."
+
+        self.assertFalse(compaction.is_low_information(line))
+        self.assertFalse(compaction.is_low_information("$19.99"))
+        self.assertTrue(compaction.is_low_information("Menu"))
+
+    def test_over_budget_pages_are_trimmed(self):
+        text = "\n\n".join(
+            f"Section {index}\n" + "Body sentence with enough words to count. " * 20
+            for index in range(20)
+        )
+
+        compacted, report = compaction.compact(text, token_budget=500)
+
+        self.assertLessEqual(report["tokens_after"], 500)
+        self.assertGreater(report["tokens_after"], 0)
+
+    def test_sections_matching_the_prompt_are_kept_when_trimming(self):
+        sections = [
+            f"Section {index}\n"
+            + f"Filler sentence {index} about nothing in particular. " * 30
+            for index in range(10)
+        ]
+        pricing = (
+            "Pricing\nThe subscription pricing starts at ten dollars a month "
+            "for every single user."
+        )
+
+        compacted, report = compaction.compact(
+            "\n\n".join(sections + [pricing]), "What is the pricing?", 300
+        )
+
+        self.assertIn("subscription pricing starts", compacted)
+        self.assertNotIn("Filler sentence", compacted)
+        self.assertLessEqual(report["tokens_after"], 300)
+
+    @override_settings(SUMMARY_COMPACTION={"ENABLED": False, "TOKEN_BUDGET": 10})
+    def test_disabled_compaction_returns_the_text_unchanged(self):
+        text = "Menu\nHome\n" + "Body sentence. " * 100
+
+        compacted, report = compaction.compact(text)
+
+        self.assertEqual(compacted, text)
+        self.assertEqual(report["tokens_saved"], 0)
+
+
+class JobTests(TestCase):
+    data = {
+        "title": "Title",
+        "content_type": "text",
+        "summary": "Summary",
+        "user_prompt": "Summarize",
+        "tags": [],
+        "category": "other",
+        "raw_text": "Text",
+    }
+
+    def setUp(self):
+        user = User.objects.create_user("author", "author@example.com", "password")
+        self.author = UserData.objects.create(user=user)
+
+    def create_job(self, attempts=1, idle_seconds=0, **fields):
+        job = models.SummaryJob.objects.create(
+            **{
+                "author": self.author,
+                "content_type": "text",
+                "payload": {"text": "Text", "prompt": "Summarize"},
+                "status": models.SummaryJob.STATUS_RUNNING,
+                "attempts": attempts,
+                **fields,
+            }
+        )
+        models.SummaryJob.objects.filter(id=job.id).update(
+            updated_at=timezone.now() - datetime.timedelta(seconds=idle_seconds)
+        )
+        job.refresh_from_db()
+
+        return job
+
+    def test_long_running_jobs_with_a_heartbeat_are_not_requeued(self):
+        timeout = settings.SUMMARY_JOBS["TIMEOUT"]
+        started_at = timezone.now() - datetime.timedelta(seconds=timeout * 3)
+        alive = self.create_job(started_at=started_at)
+        stale = self.create_job(started_at=started_at, idle_seconds=timeout + 60)
+
+        self.assertEqual(jobs.requeue_stale_jobs(), 1)
+
+        alive.refresh_from_db()
+        stale.refresh_from_db()
+        self.assertEqual(alive.status, models.SummaryJob.STATUS_RUNNING)
+        self.assertEqual(stale.status, models.SummaryJob.STATUS_QUEUED)
+
+    def test_stale_jobs_without_attempts_left_fail(self):
+        job = self.create_job(
+            attempts=settings.SUMMARY_JOBS["MAX_ATTEMPTS"],
+            idle_seconds=settings.SUMMARY_JOBS["TIMEOUT"] + 60,
+        )
+
+        self.assertEqual(jobs.requeue_stale_jobs(), 0)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, models.SummaryJob.STATUS_FAILED)
+        self.assertTrue(job.error)
+
+    def test_superseded_attempt_does_not_create_a_summary(self):
+        job = self.create_job()
+        # Another worker requeued and claimed the job while this attempt ran
+        models.SummaryJob.objects.filter(id=job.id).update(attempts=2)
+
+        with mock.patch.object(jobs, "run_pipeline", return_value=(self.data, {})):
+            jobs.run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, models.SummaryJob.STATUS_RUNNING)
+        self.assertFalse(models.Summary.objects.exists())
+
+    def test_current_attempt_finishes_the_job(self):
+        job = self.create_job()
+
+        with mock.patch.object(jobs, "run_pipeline", return_value=(self.data, {})):
+            jobs.run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, models.SummaryJob.STATUS_DONE)
+        self.assertEqual(job.summary.title, "Title")
+
+    def test_file_jobs_read_the_staged_upload_and_remove_it(self):
+        jobs_dir = tempfile.mkdtemp()
+        upload = SimpleUploadedFile("report.pdf", b"%PDF-1.4 staged")
+
+        with override_settings(
+            SUMMARY_UPLOADS={**settings.SUMMARY_UPLOADS, "JOBS_DIR": jobs_dir}
+        ):
+            path = uploads.stage_for_job(upload, "abc")
+
+        job = self.create_job(
+            content_type="file",
+            payload={
+                "file_name": "report.pdf",
+                "prompt": "Summarize",
+                "path": path,
+                "sha256": "abc",
+            },
+        )
+        received = {}
+
+        def summarize_file(file_name, file, prompt, **kwargs):
+            received.update(content=file.read(), sha256=file.sha256)
+            return self.data, {}
+
+        with mock.patch.object(jobs.pipeline, "summarize_file", summarize_file):
+            jobs.run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, models.SummaryJob.STATUS_DONE)
+        self.assertEqual(received, {"content": b"%PDF-1.4 staged", "sha256": "abc"})
+        self.assertIsNone(job.file_data)
+        self.assertFalse(os.path.exists(path))
+
+
+class StageForJobTests(SimpleTestCase):
+    def setUp(self):
+        self.jobs_dir = os.path.join(tempfile.mkdtemp(), "jobs")
+        self.settings_override = override_settings(
+            SUMMARY_UPLOADS={**settings.SUMMARY_UPLOADS, "JOBS_DIR": self.jobs_dir}
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def test_temporary_uploads_are_linked_not_copied(self):
+        upload = TemporaryUploadedFile("report.pdf", "application/pdf", 0, None)
+        upload.write(b"%PDF-1.4 on disk")
+        upload.flush()
+        self.addCleanup(upload.close)
+
+        path = uploads.stage_for_job(upload, "abc")
+
+        self.assertTrue(os.path.samefile(path, upload.temporary_file_path()))
+        self.assertEqual(os.stat(self.jobs_dir).st_mode & 0o777, 0o700)
+
+    def test_in_memory_uploads_are_written_to_disk(self):
+        upload = SimpleUploadedFile("report.pdf", b"%PDF-1.4 in memory")
+
+        path = uploads.stage_for_job(upload, "abc")
+
+        with open(path, "rb") as staged:
+            self.assertEqual(staged.read(), b"%PDF-1.4 in memory")
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+
+        uploads.remove_staged(path)
+        uploads.remove_staged(path)
+        self.assertFalse(os.path.exists(path))
+
+
+class SingleFlightTests(TestCase):
+    key = singleflight.make_key("https://example.com/", "Summarize")
+
+    def create_single_flight(self):
+        return singleflight.SingleFlight(
+            {
+                "ENABLED": True,
+                "RESULT_DIR": self.result_dir,
+                "RESULT_TTL": 30,
+                "WAIT_TIMEOUT": 0.3,
+            }
+        )
+
+    def setUp(self):
+        self.result_dir = os.path.join(tempfile.mkdtemp(), "results")
+
+    def test_results_are_shared_through_private_files(self):
+        self.assertEqual(
+            self.create_single_flight().do(self.key, lambda: {"title": "First"}),
+            {"title": "First"},
+        )
+
+        # A second process finds the leader's result instead of running again
+        result = self.create_single_flight().do(self.key, lambda: {"title": "Second"})
+
+        self.assertEqual(result, {"title": "First"})
+        self.assertEqual(os.listdir(self.result_dir), [f"{self.key}.json"])
+        self.assertEqual(os.stat(self.result_dir).st_mode & 0o777, 0o700)
+        result_path = os.path.join(self.result_dir, f"{self.key}.json")
+        self.assertEqual(os.stat(result_path).st_mode & 0o777, 0o600)
+
+    def test_waiting_on_another_process_times_out(self):
+        locked = threading.Event()
+        release = threading.Event()
+        lock_id = int.from_bytes(bytes.fromhex(self.key[:16]), "big", signed=True)
+
+        def hold_lock():
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_lock(%s)", [lock_id])
+                    locked.set()
+                    release.wait(5)
+                    cursor.execute("SELECT pg_advisory_unlock(%s)", [lock_id])
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=hold_lock)
+        thread.start()
+        locked.wait(5)
+
+        try:
+            with self.assertRaises(singleflight.WaitTimeout):
+                self.create_single_flight().do(self.key, lambda: {"title": "Late"})
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(
+            self.create_single_flight().do(self.key, lambda: {"title": "Late"}),
+            {"title": "Late"},
+        )
+
+    def test_follower_timeout_is_a_service_unavailable_error(self):
+        flight = self.create_single_flight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_summary():
+            started.set()
+            release.wait(5)
+            return {"title": "Slow"}
+
+        def lead():
+            try:
+                flight.do(self.key, slow_summary)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=lead)
+        thread.start()
+        started.wait(5)
+
+        try:
+            with mock.patch.object(
+                singleflight, "get_single_flight", return_value=flight
+            ):
+                with self.assertRaises(pipeline.PipelineError) as error:
+                    pipeline.single_flight(self.key, lambda: {"title": "Follower"})
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(error.exception.status_code, 503)
+
+    def test_timeouts_raised_by_the_work_are_not_translated(self):
+        def timed_out():
+            raise TimeoutError("read timed out")
+
+        with mock.patch.object(
+            singleflight, "get_single_flight", return_value=self.create_single_flight()
+        ):
+            with self.assertRaises(TimeoutError) as error:
+                pipeline.single_flight(self.key, timed_out)
+
+        self.assertNotIsInstance(error.exception, pipeline.PipelineError)
+
+
+class VideoSupportTests(SimpleTestCase):
+    def test_backends_without_video_support_are_rejected(self):
+        backend = backends.OpenAIBackend(settings.SUMMARY_LLM)
+
+        with mock.patch.object(
+            pipeline.engine, "get_engine", return_value=mock.Mock(backend=backend)
+        ):
+            with self.assertRaises(pipeline.PipelineError) as error:
+                pipeline.summarize_video(
+                    "https://www.youtube.com/watch?v=abc", "Summarize"
+                )
+
+        self.assertEqual(error.exception.status_code, 400)
+        self.assertEqual(
+            error.exception.message,
+            "Video summaries are not supported by the configured backend",
+        )
+
+
+class SchedulerTests(SimpleTestCase):
+    config = {
+        "REQUESTS_PER_MINUTE": 0,
+        "TOKENS_PER_MINUTE": 0,
+        "INITIAL_CONCURRENCY": 4,
+        "MIN_CONCURRENCY": 1,
+        "MAX_CONCURRENCY": 32,
+        "TARGET_LATENCY": 30,
+        "MAX_RETRIES": 2,
+        "BACKOFF_BASE": 0,
+        "BACKOFF_MAX": 0,
+    }
+
+    def test_non_retryable_failures_do_not_raise_the_limit(self):
+        llm_scheduler = scheduler.LLMScheduler(self.config)
+
+        def bad_request():
+            raise ValueError("Could not parse the response")
+
+        for _ in range(20):
+            with self.assertRaises(ValueError):
+                llm_scheduler.run(bad_request)
+
+        self.assertEqual(llm_scheduler.limiter.limit, 4)
+
+        for _ in range(20):
+            llm_scheduler.run(lambda: "ok")
+
+        self.assertGreater(llm_scheduler.limiter.limit, 4)
+
+    def test_zero_per_minute_is_unlimited(self):
+        bucket = scheduler.TokenBucket(0)
+
+        self.assertEqual(bucket.acquire(1_000_000), 0)
+        self.assertIsNone(bucket.available)
+
+        stats = scheduler.LLMScheduler(self.config).get_stats()
+        self.assertIsNone(stats["requests_available"])
+        self.assertIsNone(stats["tokens_available"])
+
+
+class CategoryTests(SimpleTestCase):
+    def test_exact_and_unique_prefix_matches(self):
+        self.assertEqual(engine.match_category(" Technology "), "technology")
+        self.assertEqual(engine.match_category("health"), "health & wellness")
+        self.assertEqual(engine.match_category("food"), "food & drink")
+
+    def test_empty_and_ambiguous_values_do_not_match(self):
+        for value in ["", None, "s", "tech news", "culture"]:
+            self.assertIsNone(engine.match_category(value))
+
+    @override_settings(SUMMARY_CLASSIFIER={"MODE": "fallback", "MODEL_PATH": ""})
+    def test_unmatched_categories_fall_back_to_the_classifier(self):
+        local_classifier = mock.Mock()
+        local_classifier.predict_category.return_value = ("science", 0.8)
+
+        with mock.patch.object(
+            engine.classifier, "get_classifier", return_value=local_classifier
+        ):
+            response = engine.normalize_category({"category": ""}, "Orbital physics")
+            self.assertEqual(response["category"], "science")
+            local_classifier.predict_category.assert_called_once_with("Orbital physics")
+
+            response = engine.normalize_category({"category": "Sports"})
+            self.assertEqual(response["category"], "sports")
+            self.assertEqual(local_classifier.predict_category.call_count, 1)
+
+
+class CacheTests(TestCase):
+    config = {
+        "ENABLED": True,
+        "MEMORY_ENTRIES": 2,
+        "TTL": 60,
+        "DB_MAX_ENTRIES": 2,
+        "DB_MAX_BYTES": 1024 * 1024,
+        "EVICT_EVERY": 1000,
+    }
+
+    def test_make_key_normalizes_whitespace_and_prompt_case(self):
+        key = cache.make_key("Some  page\n text", "Summarize  this", "gemini:flash")
+
+        self.assertEqual(
+            key, cache.make_key(" Some page text ", "SUMMARIZE this", "gemini:flash")
+        )
+        self.assertNotEqual(
+            key, cache.make_key("Some page text", "Summarize this", "openai:gpt")
+        )
+        self.assertNotEqual(
+            key, cache.make_key("Some Page text", "Summarize this", "gemini:flash")
+        )
+
+    def test_memory_entries_are_evicted_least_recently_used_first(self):
+        summary_cache = cache.SummaryCache(self.config)
+
+        summary_cache.set("a", {"title": "A"})
+        summary_cache.set("b", {"title": "B"})
+        summary_cache.get("a")
+        summary_cache.set("c", {"title": "C"})
+
+        self.assertEqual(list(summary_cache._memory), ["a", "c"])
+
+    def test_database_eviction_keeps_recently_accessed_entries(self):
+        summary_cache = cache.SummaryCache(self.config)
+
+        for key in ["a", "b", "c"]:
+            summary_cache.set(key, {"title": key})
+
+        summary_cache.clear_memory()
+        self.assertEqual(summary_cache.get("a"), {"title": "a"})
+
+        self.assertEqual(summary_cache.evict(), 1)
+        self.assertEqual(
+            set(models.CachedResponse.objects.values_list("key", flat=True)),
+            {"a", "c"},
+        )
+
+
+class ChunkingTests(SimpleTestCase):
+    def test_chunks_respect_the_size_and_carry_overlap(self):
+        paragraphs = [f"Paragraph {index} " + "word " * 20 for index in range(12)]
+        text = "\n\n".join(paragraphs)
+
+        chunks = chunking.split_into_chunks(text, chunk_size=400, overlap=150)
+
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk) <= 400 for chunk in chunks))
+
+        for previous, current in zip(chunks, chunks[1:]):
+            self.assertEqual(previous.split("\n\n")[-1], current.split("\n\n")[0])
+
+        for paragraph in paragraphs:
+            self.assertTrue(any(paragraph.strip() in chunk for chunk in chunks))
+
+    def test_oversized_blocks_are_split_by_sentence(self):
+        sentences = [f"Sentence number {index} ends here." for index in range(40)]
+        text = " ".join(sentences)
+
+        chunks = chunking.split_into_chunks(text, chunk_size=200, overlap=0)
+
+        self.assertTrue(all(len(chunk) <= 200 for chunk in chunks))
+        self.assertEqual(" ".join(chunks), text)
+
+    def test_headings_start_new_blocks(self):
+        text = "# Intro\nFirst part.\n# Details\nSecond part."
+
+        self.assertEqual(
+            chunking.split_blocks(text),
+            ["# Intro\nFirst part.", "# Details\nSecond part."],
+        )
+
+
+class ParsingTests(SimpleTestCase):
+    def test_repair_json_handles_fences_prose_and_trailing_commas(self):
+        text = 'Here you go:\n```json\n{"title": "T", "tags": ["a", "b",],}\n```'
+
+        self.assertEqual(parsing.repair_json(text), {"title": "T", "tags": ["a", "b"]})
+        self.assertEqual(
+            parsing.repair_json('The answer is {"title": "T"} as requested.'),
+            {"title": "T"},
+        )
+
+    def test_repair_json_unwraps_schema_shaped_values(self):
+        text = (
+            '{"properties": {"title": {"type": "string", "value": "T"}, '
+            '"tags": {"value": ["a"]}}}'
+        )
+
+        self.assertEqual(parsing.repair_json(text), {"title": "T", "tags": ["a"]})
+
+    def test_repair_json_rejects_non_objects(self):
+        for text in ["", "no json here", "[1, 2, 3]", '{"title": "T"']:
+            self.assertIsNone(parsing.repair_json(text))
+
+
+class LimiterTests(SimpleTestCase):
+    def create_limiter(self):
+        return scheduler.AdaptiveLimiter(
+            initial=16, minimum=1, maximum=32, target_latency=10
+        )
+
+    def test_throttling_decreases_once_per_congestion_window(self):
+        limiter = self.create_limiter()
+        for _ in range(3):
+            limiter.acquire()
+
+        limiter.release(latency=1, throttled=True)
+        limiter.release(latency=1, throttled=True)
+        self.assertEqual(limiter.limit, 8)
+
+        # Sent after the decrease, so it belongs to a new window
+        limiter.release(latency=0, throttled=True)
+        self.assertEqual(limiter.limit, 4)
+
+    def test_slow_calls_decrease_and_successes_increase_slowly(self):
+        limiter = self.create_limiter()
+
+        limiter.acquire()
+        limiter.release(latency=20)
+        self.assertEqual(limiter.limit, 15)
+
+        # Roughly one more slot per window of successful calls
+        for _ in range(16):
+            limiter.acquire()
+            limiter.release(latency=1)
+
+        self.assertEqual(limiter.limit, 16)
+
+    def test_acquire_blocks_at_the_limit(self):
+        limiter = scheduler.AdaptiveLimiter(
+            initial=1, minimum=1, maximum=1, target_latency=10
+        )
+        limiter.acquire()
+        acquired = threading.Event()
+
+        thread = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+        thread.start()
+
+        self.assertFalse(acquired.wait(0.1))
+        limiter.release(latency=1)
+        self.assertTrue(acquired.wait(5))
+        thread.join()
+
+    def test_token_bucket_waits_for_refill(self):
+        bucket = scheduler.TokenBucket(600)
+
+        self.assertEqual(bucket.acquire(600), 0)
+        self.assertGreater(bucket.acquire(1), 0.05)
+        self.assertLess(bucket.available, 1)
+
+
+class ClassifierTests(SimpleTestCase):
+    documents = [
+        (f"{topic} {words}", category, tags)
+        for _ in range(4)
+        for topic, words, category, tags in [
+            (
+                "Football",
+                "match league goal striker season championship",
+                "sports",
+                ["football"],
+            ),
+            (
+                "Processor",
+                "software chip computer developers programming silicon",
+                "technology",
+                ["hardware"],
+            ),
+        ]
+    ]
+
+    def test_train_and_predict(self):
+        model = classifier.train(self.documents)
+        local_classifier = classifier.Classifier(model)
+
+        self.assertEqual(model["documents"], 8)
+        self.assertEqual(set(model["categories"]), {"sports", "technology"})
+        prediction = local_classifier.predict(
+            "The striker scored a late goal in the league"
+        )
+        self.assertEqual(prediction["category"], "sports")
+        self.assertEqual(prediction["tags"][0], "football")
+        self.assertEqual(
+            local_classifier.predict("New silicon chip for software developers")[
+                "category"
+            ],
+            "technology",
+        )
+
+    def test_unknown_categories_and_rare_tags_are_not_learned(self):
+        model = classifier.train(
+            self.documents + [("Cooking pasta recipe", "recipes", ["pasta"])]
+        )
+
+        self.assertNotIn("recipes", model["categories"])
+        self.assertNotIn("pasta", model["tags"])
+
+
+class MinHashTests(SimpleTestCase):
+    def sign(self, text):
+        return dedup.minhash(dedup.get_shingles(text, 5), 128)
+
+    def test_similarity_tracks_content_overlap(self):
+        words = [f"word{index}" for index in range(400)]
+        text = " ".join(words)
+        edited = " ".join(words[:390] + ["changed"] * 10)
+        unrelated = " ".join(f"other{index}" for index in range(400))
+
+        self.assertEqual(dedup.similarity(self.sign(text), self.sign(text)), 1.0)
+        self.assertGreater(dedup.similarity(self.sign(text), self.sign(edited)), 0.8)
+        self.assertLess(dedup.similarity(self.sign(text), self.sign(unrelated)), 0.1)
+
+    def test_signatures_survive_packing(self):
+        signature = self.sign("A short page about near duplicate detection")
+
+        self.assertEqual(
+            dedup.unpack_signature(dedup.pack_signature(signature)), signature
+        )
+        self.assertEqual(dedup.similarity(signature, signature[:-1]), 0.0)
+
+
+class PageRangeTests(SimpleTestCase):
+    def test_parse_page_range(self):
+        self.assertEqual(documents.parse_page_range("3"), (2, 3))
+        self.assertEqual(documents.parse_page_range(" 2 - 5 "), (1, 5))
+        self.assertEqual(documents.parse_page_range("4-"), (3, None))
+        self.assertEqual(documents.parse_page_range(7), (6, 7))
+        self.assertIsNone(documents.parse_page_range(None))
+        self.assertIsNone(documents.parse_page_range(" "))
+
+    def test_parse_page_range_rejects_invalid_values(self):
+        for value in ["0", "5-2", "abc", "1-2-3", "-3"]:
+            with self.assertRaises(ValueError):
+                documents.parse_page_range(value)
+
+    def test_resolve_page_range_clamps_to_the_document(self):
+        self.assertEqual(documents.resolve_page_range((3, None), 10), (3, 10))
+        self.assertEqual(documents.resolve_page_range((0, 50), 10), (0, 10))
+
+        with self.assertRaises(ValueError):
+            documents.resolve_page_range((10, None), 10)
+
+
+class StagingUploadHandlerTests(SimpleTestCase):
+    def create_handler(self, content_length=100):
+        handler = uploads.StagingUploadHandler(
+            config={"MAX_BYTES": 32, "MEMORY_BYTES": 1024}
+        )
+        handler.handle_raw_input(None, {}, content_length, b"boundary")
+        handler.new_file("file", "document.pdf", "application/pdf", content_length)
+
+        return handler
+
+    def test_pdf_is_hashed_while_it_arrives(self):
+        handler = self.create_handler()
+
+        handler.receive_data_chunk(b"%PDF-1.7\n", 0)
+        handler.receive_data_chunk(b"body", 9)
+        uploaded_file = handler.file_complete(13)
+
+        self.assertEqual(uploaded_file.read(), b"%PDF-1.7\nbody")
+        self.assertEqual(
+            uploaded_file.sha256, documents.hash_file(io.BytesIO(b"%PDF-1.7\nbody"))
+        )
+        self.assertIsNone(handler.rejection)
+
+    def test_files_without_pdf_magic_bytes_are_rejected(self):
+        handler = self.create_handler()
+
+        with self.assertRaises(SkipFile):
+            handler.receive_data_chunk(b"MZ\x90\x00 not a pdf", 0)
+
+        self.assertEqual(
+            handler.rejection, "Invalid file type. Only PDF files are supported."
+        )
+
+    def test_files_over_the_size_limit_are_rejected(self):
+        handler = self.create_handler()
+        handler.receive_data_chunk(b"%PDF-1.7\n" + b"x" * 16, 0)
+
+        with self.assertRaises(SkipFile):
+            handler.receive_data_chunk(b"x" * 16, 25)
+
+        self.assertEqual(handler.rejection, "File is larger than 32 bytes")
+
+
+class PDFSourceTests(SimpleTestCase):
+    data = b"%PDF-1.4\n" + b"0" * 1024
+
+    def test_spooled_uploads_are_read_in_memory(self):
+        spooled = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        spooled.write(self.data)
+
+        with pdf.open_source(spooled) as (stream, source):
+            self.assertEqual(source, "memory")
+            self.assertEqual(stream.read(), self.data)
+
+        self.assertFalse(spooled._rolled)
+
+    def test_real_files_are_memory_mapped(self):
+        with tempfile.NamedTemporaryFile() as named_file:
+            named_file.write(self.data)
+            named_file.flush()
+
+            with pdf.open_source(named_file) as (stream, source):
+                self.assertEqual(source, "mmap")
+                self.assertEqual(stream[:8], self.data[:8])
+
+    def test_resolved_objects_are_cleared_every_few_pages(self):
+        page = mock.Mock()
+        page.extract_text.return_value = "Page text"
+        reader = mock.Mock(pages=[page] * 7)
+
+        texts = list(pdf.iter_page_texts(reader, clear_every=3))
+
+        self.assertEqual(texts, ["Page text"] * 7)
+        self.assertEqual(reader.resolved_objects.clear.call_count, 2)
+
+        list(pdf.iter_page_texts(reader, clear_every=0))
+        self.assertEqual(reader.resolved_objects.clear.call_count, 2)
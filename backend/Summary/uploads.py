@@ -0,0 +1,164 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import time
+import typing
+import uuid
+
+from django.conf import settings
+from django.core.files.uploadedfile import (
+    InMemoryUploadedFile,
+    TemporaryUploadedFile,
+    UploadedFile,
+)
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+
+from . import metrics
+
+pdf_magic = b"%PDF-"
+
+
+class StagingUploadHandler(FileUploadHandler):
+    # Validates, hashes and stages uploaded PDFs chunk by chunk while the
+    # request body is still arriving, so the document hash is ready as soon as
+    # the last byte lands and the file never has to be read again to find it
+
+    def __init__(
+        self,
+        request: typing.Any = None,
+        config: typing.Optional[typing.Dict[str, typing.Any]] = None,
+    ):
+        super().__init__(request)
+        config = config if config is not None else settings.SUMMARY_UPLOADS
+
+        self.max_bytes: int = config["MAX_BYTES"]
+        self.memory_bytes: int = config["MEMORY_BYTES"]
+
+        self.in_memory = False
+        self.rejection: typing.Optional[str] = None
+
+    def handle_raw_input(
+        self, input_data, META, content_length, boundary, encoding=None
+    ) -> None:
+        # Small requests are staged in memory, larger ones go straight to disk
+        self.in_memory = content_length <= self.memory_bytes
+
+    def new_file(self, *args: typing.Any, **kwargs: typing.Any) -> None:
+        super().new_file(*args, **kwargs)
+
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.started_at = time.perf_counter()
+
+        if self.in_memory:
+            self.file: typing.Any = io.BytesIO()
+        else:
+            self.file = TemporaryUploadedFile(
+                self.file_name,
+                self.content_type,
+                0,
+                self.charset,
+                self.content_type_extra,
+            )
+
+    def reject(self, message: str) -> typing.NoReturn:
+        self.rejection = message
+        metrics.increment("uploads.rejected")
+
+        raise SkipFile(message)
+
+    def receive_data_chunk(self, raw_data: bytes, start: int) -> None:
+        if start == 0 and pdf_magic not in raw_data[:1024]:
+            self.reject("Invalid file type. Only PDF files are supported.")
+
+        self.size += len(raw_data)
+        if self.size > self.max_bytes:
+            self.reject(f"File is larger than {self.max_bytes} bytes")
+
+        self.digest.update(raw_data)
+        self.file.write(raw_data)
+
+        return None
+
+    def file_complete(self, file_size: int) -> UploadedFile:
+        self.file.seek(0)
+
+        uploaded_file: UploadedFile
+        if self.in_memory:
+            uploaded_file = InMemoryUploadedFile(
+                file=self.file,
+                field_name=self.field_name,
+                name=self.file_name,
+                content_type=self.content_type,
+                size=file_size,
+                charset=self.charset,
+                content_type_extra=self.content_type_extra,
+            )
+        else:
+            uploaded_file = self.file
+            uploaded_file.size = file_size
+
+        uploaded_file.sha256 = self.digest.hexdigest()  # type: ignore
+
+        metrics.increment("uploads.files")
+        metrics.observe("uploads.bytes", file_size)
+        metrics.observe(
+            "uploads.receive_seconds", time.perf_counter() - self.started_at
+        )
+
+        return uploaded_file
+
+
+def get_upload_handlers(request: typing.Any) -> typing.List[FileUploadHandler]:
+    return [StagingUploadHandler(request)]
+
+
+def get_rejection(request: typing.Any) -> typing.Optional[str]:
+    for handler in request.upload_handlers:
+        if getattr(handler, "rejection", None):
+            return handler.rejection
+
+    return None
+
+
+def get_jobs_dir() -> str:
+    jobs_dir = settings.SUMMARY_UPLOADS["JOBS_DIR"] or os.path.join(
+        tempfile.gettempdir(), "summarizzler-job-uploads"
+    )
+    # Staged documents can belong to private summaries
+    os.makedirs(jobs_dir, mode=0o700, exist_ok=True)
+
+    return jobs_dir
+
+
+def stage_for_job(file: UploadedFile, sha256: str) -> str:
+    # Async jobs outlive the request and its temporary file, so the staged upload
+    # is hard-linked into the jobs directory, or streamed there from memory
+    path = os.path.join(get_jobs_dir(), f"{sha256}-{uuid.uuid4().hex}.pdf")
+
+    if hasattr(file, "temporary_file_path"):
+        try:
+            os.link(file.temporary_file_path(), path)
+            return path
+        except OSError:
+            pass
+
+    file.seek(0)
+    with open(
+        os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "wb"
+    ) as staged:
+        shutil.copyfileobj(file, staged, 1024 * 1024)
+
+    return path
+
+
+def remove_staged(path: typing.Optional[str]) -> None:
+    if not path:
+        return
+
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
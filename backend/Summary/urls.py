@@ -5,13 +5,22 @@ from . import views
 
 urlpatterns: list[URLPattern] = [
     path("website/", views.WebsiteView.as_view(), name="website"),
+    path("website/crawl/", views.WebsiteCrawlView.as_view(), name="website_crawl"),
     path("text/", views.TextView.as_view(), name="text"),
     path("file/", views.FileView.as_view(), name="file_upload"),
     path("video/", views.VideoView.as_view(), name="video"),
+    path(
+        "website/stream/", views.WebsiteStreamView.as_view(), name="website_stream"
+    ),
+    path("text/stream/", views.TextStreamView.as_view(), name="text_stream"),
+    path("file/stream/", views.FileStreamView.as_view(), name="file_stream"),
     path("", views.SummaryList.as_view(), name="summary_list"),
     path("id/<int:id>/", views.SummaryDetail.as_view(), name="summary_detail"),
     path("search/", views.SearchView.as_view(), name="search"),
     path("like/<int:id>/", views.LikeView.as_view(), name="like"),
     path("dislike/<int:id>/", views.DislikeView.as_view(), name="dislike"),
     path("favorite/<int:id>/", views.FavoriteView.as_view(), name="favorite"),
+    path("batch/", views.BatchView.as_view(), name="batch"),
+    path("jobs/<int:id>/", views.JobDetail.as_view(), name="job_detail"),
+    path("stats/", views.StatsView.as_view(), name="stats"),
 ]
@@ -1,18 +1,34 @@
-import io
+import typing
 
 import Users.functions as users_functions
+from django.conf import settings
 from django.db.models import Q
 from django.db.models.manager import BaseManager
 from django.http import HttpRequest
-from PyPDF2 import PdfReader
 from rest_framework import status
 from rest_framework.parsers import FormParser, MultiPartParser
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
-from . import functions, models, serializers
+from . import (
+    batch,
+    cache,
+    crawl,
+    documents,
+    fetcher,
+    functions,
+    httpcache,
+    jobs,
+    metrics,
+    models,
+    pipeline,
+    scheduler,
+    serializers,
+    streaming,
+    uploads,
+)
 
 
 def with_required_fields(required_fields):
@@ -36,6 +52,44 @@ def with_required_fields(required_fields):
     return decorator
 
 
+def summary_response(
+    data: dict, user_data, is_private, report: typing.Optional[dict] = None
+) -> Response:
+    data["author"] = user_data
+    data["is_private"] = is_private
+
+    try:
+        summary = functions.create_summary(data)
+    except Exception as e:
+        return Response({"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if summary is None:
+        return Response(
+            {"message": "Failed to create summary"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    return Response(
+        {
+            "id": str(summary.id),  # type: ignore
+            **(report or {}),
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+def job_response(user_data, content_type: str, payload: dict) -> Response:
+    job = jobs.enqueue(user_data, content_type, payload)
+
+    return Response(
+        {
+            "job_id": str(job.id),
+            "status": job.status,
+        },
+        status=status.HTTP_202_ACCEPTED,
+    )
+
+
 class WebsiteView(APIView):
     permission_classes = [IsAuthenticated]
     authentication_classes = [JWTAuthentication]
@@ -45,6 +99,8 @@ class WebsiteView(APIView):
         request_data = request.data  # type: ignore
         url = request_data["url"]
         user_prompt = request_data["prompt"]
+        is_private = request_data.get("private", False)
+        extraction_mode = request_data.get("extraction", None)
 
         if (user_data := users_functions.find_user_data(user=request.user)) is None:  # type: ignore
             return Response(
@@ -52,51 +108,76 @@ class WebsiteView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        if (dom_content := functions.Website.get_dom_content(url)) is None:
+        if functions.parse_bool(request_data.get("async", False)):
+            payload = {
+                "url": url,
+                "prompt": user_prompt,
+                "private": is_private,
+                "extraction": extraction_mode,
+            }
+
+            return job_response(user_data, functions.Website.content_type, payload)
+
+        try:
+            data, report = pipeline.summarize_website(
+                url, user_prompt, extraction_mode=extraction_mode
+            )
+        except pipeline.PipelineError as e:
+            return Response({"message": e.message}, status=e.status_code)
+
+        return summary_response(data, user_data, is_private, report)
+
+
+class WebsiteCrawlView(APIView):
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [JWTAuthentication]
+
+    @with_required_fields(["url", "prompt"])
+    def post(self, request: HttpRequest) -> Response:
+        request_data = request.data  # type: ignore
+        url = request_data["url"]
+        user_prompt = request_data["prompt"]
+        is_private = request_data.get("private", False)
+        extraction_mode = request_data.get("extraction", None)
+
+        try:
+            depth, pages = crawl.parse_limits(
+                request_data.get("depth", None), request_data.get("pages", None)
+            )
+
+        except ValueError as e:
             return Response(
-                {"message": "Failed to scrape website"},
+                {"message": str(e)},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        if (body_content := functions.Website.get_body_content(dom_content)) is None:
+        if (user_data := users_functions.find_user_data(user=request.user)) is None:  # type: ignore
             return Response(
-                {"message": "Failed to get body content"},
+                {"message": "Failed to get user data"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        cleaned_content = functions.Website.clean_body_content(body_content)
-        bot_response = functions.Website.ask_bot(cleaned_content, user_prompt)
-        title = functions.Website.get_title_for_content(dom_content)
+        if functions.parse_bool(request_data.get("async", False)):
+            payload = {
+                "url": url,
+                "prompt": user_prompt,
+                "private": is_private,
+                "extraction": extraction_mode,
+                "crawl": True,
+                "depth": depth,
+                "pages": pages,
+            }
 
-        data = {
-            "url": url,
-            "title": title if title is not None else bot_response["title"],
-            "content_type": functions.Website.content_type,
-            "summary": bot_response["content"],
-            "author": user_data,
-            "user_prompt": user_prompt,
-            "is_private": request_data.get("private", False),
-            "tags": bot_response["tags"][:5],
-            "category": bot_response["category"],
-        }
+            return job_response(user_data, functions.Website.content_type, payload)
 
         try:
-            summary = functions.create_summary(data)
-        except Exception as e:
-            return Response({"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
-
-        if summary is None:
-            return Response(
-                {"message": "Failed to create summary"},
-                status=status.HTTP_400_BAD_REQUEST,
+            data, report = crawl.summarize_site(
+                url, user_prompt, depth, pages, extraction_mode
             )
+        except pipeline.PipelineError as e:
+            return Response({"message": e.message}, status=e.status_code)
 
-        return Response(
-            {
-                "id": str(summary.id),  # type: ignore
-            },
-            status=status.HTTP_200_OK,
-        )
+        return summary_response(data, user_data, is_private, report)
 
 
 class TextView(APIView):
@@ -108,6 +189,8 @@ class TextView(APIView):
         request_data = request.data  # type: ignore
         input_text = request_data["text"]
         user_prompt = request_data["prompt"]
+        is_private = request_data.get("private", False)
+        chunked = request_data.get("chunked", None)
 
         if (user_data := users_functions.find_user_data(user=request.user)) is None:  # type: ignore
             return Response(
@@ -115,40 +198,33 @@ class TextView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        bot_response = functions.Text.ask_bot(input_text, user_prompt)
+        if functions.parse_bool(request_data.get("async", False)):
+            payload = {
+                "text": input_text,
+                "prompt": user_prompt,
+                "private": is_private,
+                "chunked": chunked,
+            }
 
-        data = {
-            "title": bot_response["title"],
-            "content_type": functions.Text.content_type,
-            "summary": bot_response["content"],
-            "author": user_data,
-            "user_prompt": user_prompt,
-            "is_private": request_data.get("private", False),
-            "tags": bot_response["tags"],
-            "category": bot_response["category"],
-            "raw_text": input_text,
-        }
+            return job_response(user_data, functions.Text.content_type, payload)
 
         try:
-            summary = functions.create_summary(data)
-        except Exception as e:
-            return Response({"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            data, report = pipeline.summarize_text(input_text, user_prompt, chunked)
+        except pipeline.PipelineError as e:
+            return Response({"message": e.message}, status=e.status_code)
 
-        if summary is None:
-            return Response(
-                {"message": "Failed to create summary"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+        return summary_response(data, user_data, is_private, report)
 
-        return Response(
-            {
-                "id": str(summary.id),  # type: ignore
-            },
-            status=status.HTTP_200_OK,
-        )
+
+class StagedUploadMixin:
+    # Uploads are validated, hashed and staged while the body is still arriving
+    def initialize_request(self, request, *args, **kwargs):
+        request.upload_handlers = uploads.get_upload_handlers(request)
+
+        return super().initialize_request(request, *args, **kwargs)  # type: ignore
 
 
-class FileView(APIView):
+class FileView(StagedUploadMixin, APIView):
     parser_classes = [MultiPartParser, FormParser]
     permission_classes = [IsAuthenticated]
     authentication_classes = [JWTAuthentication]
@@ -156,14 +232,21 @@ class FileView(APIView):
     @with_required_fields(["prompt"])
     def post(self, request: HttpRequest) -> Response:
         request_data = request.data  # type: ignore
-        user = request.user  # type: ignore
         file = request.FILES.get("file")
         prompt = request_data.get("prompt")
         is_private = request_data.get("private", False)
+        chunked = request_data.get("chunked", None)
+        pages = request_data.get("pages", None)
+
+        if (user_data := users_functions.find_user_data(user=request.user)) is None:  # type: ignore
+            return Response(
+                {"message": "Failed to get user data"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
         if not file:
             return Response(
-                {"message": "No file uploaded"},
+                {"message": uploads.get_rejection(request) or "No file uploaded"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
@@ -173,52 +256,37 @@ class FileView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        try:
-            file_content = ""
-            pdf_reader = PdfReader(io.BytesIO(file.read()))
-            for page in pdf_reader.pages:
-                file_content += page.extract_text()
-
-            file_content = file_content.strip()
-
-            bot_response = functions.File.process_file_content(file_content, prompt)
-
-            data = {
-                "title": file.name.split(".pdf")[0],
-                "content_type": functions.File.content_type,
-                "summary": bot_response["content"],
-                "author": user,
-                "user_prompt": prompt,
-                "is_private": is_private,
-                "tags": bot_response["tags"],
-                "category": bot_response["category"],
-                "raw_text": file_content,
+        if functions.parse_bool(request_data.get("async", False)):
+            payload = {
+                "file_name": file.name,
+                "prompt": prompt,
+                "private": is_private,
+                "chunked": chunked,
+                "pages": pages,
             }
 
-            try:
-                summary = functions.create_summary(data)
-            except Exception as e:
-                return Response({"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            # The job gets the staged file, not a copy of its bytes
+            sha256 = getattr(file, "sha256", None) or documents.hash_file(file)
+            payload.update(sha256=sha256, path=uploads.stage_for_job(file, sha256))
 
-            if summary is None:
-                return Response(
-                    {"message": "Failed to create summary"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
+            return job_response(user_data, functions.File.content_type, payload)
 
-            return Response(
-                {
-                    "id": str(summary.id),  # type: ignore
-                },
-                status=status.HTTP_200_OK,
+        try:
+            data, report = pipeline.summarize_file(
+                file.name, file, prompt, chunked, pages=pages
             )
 
+        except pipeline.PipelineError as e:
+            return Response({"message": e.message}, status=e.status_code)
+
         except Exception as e:
             return Response(
                 {"message": f"Error processing file: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+        return summary_response(data, user_data, is_private, report)
+
 
 class VideoView(APIView):
     permission_classes = [IsAuthenticated]
@@ -229,6 +297,7 @@ class VideoView(APIView):
         request_data = request.data  # type: ignore
         url = request_data["url"]
         user_prompt = request_data["prompt"]
+        is_private = request_data.get("private", False)
 
         if (user_data := users_functions.find_user_data(user=request.user)) is None:  # type: ignore
             return Response(
@@ -243,39 +312,179 @@ class VideoView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        bot_response = functions.Video.ask_bot(url, user_prompt)
+        if functions.parse_bool(request_data.get("async", False)):
+            try:
+                pipeline.check_video_support()
+            except pipeline.PipelineError as e:
+                return Response({"message": e.message}, status=e.status_code)
+
+            payload = {"url": url, "prompt": user_prompt, "private": is_private}
 
-        data = {
-            "title": bot_response["title"],
-            "content_type": functions.Video.content_type,
-            "summary": bot_response["content"],
-            "author": user_data,
-            "user_prompt": user_prompt,
-            "is_private": request_data.get("private", False),
-            "tags": bot_response["tags"],
-            "category": bot_response["category"],
-            "url": url,
-        }
+            return job_response(user_data, functions.Video.content_type, payload)
 
         try:
-            summary = functions.create_summary(data)
-        except Exception as e:
-            return Response({"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            data, report = pipeline.summarize_video(url, user_prompt)
+        except pipeline.PipelineError as e:
+            return Response({"message": e.message}, status=e.status_code)
 
-        if summary is None:
+        return summary_response(data, user_data, is_private, report)
+
+
+class WebsiteStreamView(APIView):
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [JWTAuthentication]
+
+    @with_required_fields(["url", "prompt"])
+    def post(self, request: HttpRequest):
+        request_data = request.data  # type: ignore
+        url = request_data["url"]
+        user_prompt = request_data["prompt"]
+
+        if (user_data := users_functions.find_user_data(user=request.user)) is None:  # type: ignore
             return Response(
-                {"message": "Failed to create summary"},
+                {"message": "Failed to get user data"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        return Response(
-            {
-                "id": str(summary.id),  # type: ignore
-            },
-            status=status.HTTP_200_OK,
+        return streaming.streaming_response(
+            lambda progress, on_token: pipeline.summarize_website(
+                url,
+                user_prompt,
+                progress=progress,
+                on_token=on_token,
+                extraction_mode=request_data.get("extraction", None),
+            ),
+            user_data,
+            request_data.get("private", False),
         )
 
 
+class TextStreamView(APIView):
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [JWTAuthentication]
+
+    @with_required_fields(["text", "prompt"])
+    def post(self, request: HttpRequest):
+        request_data = request.data  # type: ignore
+        input_text = request_data["text"]
+        user_prompt = request_data["prompt"]
+        chunked = request_data.get("chunked", None)
+
+        if (user_data := users_functions.find_user_data(user=request.user)) is None:  # type: ignore
+            return Response(
+                {"message": "Failed to get user data"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return streaming.streaming_response(
+            lambda progress, on_token: pipeline.summarize_text(
+                input_text, user_prompt, chunked, progress=progress, on_token=on_token
+            ),
+            user_data,
+            request_data.get("private", False),
+        )
+
+
+class FileStreamView(StagedUploadMixin, APIView):
+    parser_classes = [MultiPartParser, FormParser]
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [JWTAuthentication]
+
+    @with_required_fields(["prompt"])
+    def post(self, request: HttpRequest):
+        request_data = request.data  # type: ignore
+        file = request.FILES.get("file")
+        prompt = request_data.get("prompt")
+        chunked = request_data.get("chunked", None)
+        pages = request_data.get("pages", None)
+
+        if (user_data := users_functions.find_user_data(user=request.user)) is None:  # type: ignore
+            return Response(
+                {"message": "Failed to get user data"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if not file or not file.name.endswith(".pdf"):
+            return Response(
+                {
+                    "message": uploads.get_rejection(request)
+                    or "Invalid file type. Only PDF files are supported."
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return streaming.streaming_response(
+            lambda progress, on_token: pipeline.summarize_file(
+                file.name,
+                file,
+                prompt,
+                chunked,
+                progress=progress,
+                on_token=on_token,
+                pages=pages,
+            ),
+            user_data,
+            request_data.get("private", False),
+        )
+
+
+class BatchView(APIView):
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [JWTAuthentication]
+
+    @with_required_fields(["items"])
+    def post(self, request: HttpRequest) -> Response:
+        request_data = request.data  # type: ignore
+        items = request_data["items"]
+
+        if (user_data := users_functions.find_user_data(user=request.user)) is None:  # type: ignore
+            return Response(
+                {"message": "Failed to get user data"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if not isinstance(items, list) or not items:
+            return Response(
+                {"message": "Items must be a non-empty list"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if len(items) > (max_items := settings.SUMMARY_BATCH["MAX_ITEMS"]):
+            return Response(
+                {"message": f"Too many items. The limit is {max_items}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        response_data = batch.run_batch(
+            items, user_data, request_data.get("private", False)
+        )
+
+        return Response(response_data, status=status.HTTP_200_OK)
+
+
+class JobDetail(APIView):
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [JWTAuthentication]
+
+    def get(self, request: HttpRequest, id: int) -> Response:
+        if (user_data := users_functions.find_user_data(user=request.user)) is None:  # type: ignore
+            return Response(
+                {"message": "Failed to get user data"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            job = models.SummaryJob.objects.get(id=id, author=user_data)
+        except models.SummaryJob.DoesNotExist:
+            return Response(
+                {"message": "Job not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        serializer = serializers.SummaryJobSerializer(job)
+
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
 class SummaryList(APIView):
     permission_classes = [AllowAny]
     authentication_classes = [JWTAuthentication]
@@ -545,3 +754,25 @@ class SearchView(APIView):
             item["id"] = str(item["id"])
 
         return Response(serializer_data, status=status.HTTP_200_OK)
+
+
+class StatsView(APIView):
+    permission_classes = [IsAdminUser]
+    authentication_classes = [JWTAuthentication]
+
+    def get(self, request: HttpRequest) -> Response:
+        return Response(
+            {
+                "cache": cache.get_stats(),
+                "documents": documents.get_store().get_stats(),
+                "fetcher": fetcher.get_fetcher().get_stats(),
+                "http_cache": httpcache.get_cache().get_stats(),
+                "jobs": jobs.get_stats(),
+                "scheduler": scheduler.get_scheduler().get_stats(),
+                "video_fallback_rate": metrics.ratio(
+                    "video.fallbacks", "video.requests"
+                ),
+                "metrics": metrics.snapshot(),
+            },
+            status=status.HTTP_200_OK,
+        )